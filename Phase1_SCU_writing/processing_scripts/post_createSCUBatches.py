@@ -0,0 +1,149 @@
+import csv
+import random
+
+'''
+This script creates several disjoint SCU batches from the SCUs file created by post_selectSCUsFromAMT.py, in a single pass.
+Each batch marks NUM_SCUS_PER_REF different SCUs of each reference summary (forUse=1), and no SCU is marked in more than one batch.
+The purpose is to evaluate system summaries (in phase 2) on more questions, split into batches of 16 (for 4 reference summaries).
+It replaces running post_useOtherSCUs.py once per additional batch.
+
+When a reference summary does not have enough SCUs for a batch, the missing SCUs are taken from other reference
+summaries of the same event that still have unused SCUs (the ones with the most unused SCUs first).
+All such cases are reported in the command line (and in the report file if given).
+'''
+
+'''
+The SCUs CSV of all the selected SCUs (the output of post_selectSCUsFromAMT.py). The forUse field is ignored, unless KEEP_INPUT_AS_FIRST_BATCH is set.
+The fields are:
+    eventId,questionId,questionText,answer,author,sourceSummaryId,forUse
+'''
+INPUT_QUESTIONS_CSV_PATH = '' # e.g. 'SCUs_all.csv'
+'''
+The SCUs CSVs to create, one per batch (the number of paths is the number of batches).
+The fields are:
+    eventId,questionId,questionText,answer,author,sourceSummaryId,forUse
+'''
+OUTPUT_QUESTIONS_CSV_PATHS = [] # e.g. ['SCUs_batch1.csv', 'SCUs_batch2.csv', 'SCUs_batch3.csv']
+'''
+The number of SCUs to use for each reference summary in each batch.
+'''
+NUM_SCUS_PER_REF = 4
+'''
+Whether the SCUs marked for use in the input file should be kept as the first batch (e.g. when it was already used on AMT),
+so that only the rest of the batches are sampled.
+'''
+KEEP_INPUT_AS_FIRST_BATCH = False
+'''
+An optional CSV file to write the report of the reference summaries that were short on SCUs.
+The fields are:
+    batch,eventId,sourceSummaryId,numMissing,numFilledFromOtherSummaries
+'''
+REPORT_CSV_PATH = '' # e.g. 'SCUs_batches_report.csv'
+
+
+QUESTIONS_CSV_FIELDS = ['eventId', 'questionId', 'questionText', 'answer', 'author', 'sourceSummaryId', 'forUse']
+
+def main(inputQuestionsFile, outputQuestionsFiles, reportFile):
+    # read in the SCUs pool (once):
+    rows, scusPerSummary, summariesPerEvent, inputBatch = readScusPool(inputQuestionsFile)
+
+    # choose the disjoint batches of question IDs:
+    batches, shortages = getDisjointBatches(scusPerSummary, summariesPerEvent, len(outputQuestionsFiles), NUM_SCUS_PER_REF,
+        firstBatch=inputBatch if KEEP_INPUT_AS_FIRST_BATCH else None)
+
+    # report the reference summaries that didn't have enough SCUs of their own:
+    for batchNum, eventId, summId, numMissing, numFilled in shortages:
+        print('WARNING: Batch {} summary {} is missing {} SCUs ({} taken from other summaries of event {})'.format(
+            batchNum + 1, summId, numMissing, numFilled, eventId))
+    if reportFile != '':
+        with open(reportFile, 'w') as outF:
+            csvWriter = csv.writer(outF, lineterminator='\n')
+            csvWriter.writerow(['batch', 'eventId', 'sourceSummaryId', 'numMissing', 'numFilledFromOtherSummaries'])
+            for batchNum, eventId, summId, numMissing, numFilled in shortages:
+                csvWriter.writerow([batchNum + 1, eventId, summId, numMissing, numFilled])
+
+    # write out the SCUs table for each batch:
+    for batchQuestionIds, outputQuestionsFile in zip(batches, outputQuestionsFiles):
+        with open(outputQuestionsFile, 'w') as outF:
+            csvWriter = csv.writer(outF, lineterminator='\n')
+            csvWriter.writerow(QUESTIONS_CSV_FIELDS)
+            for row in rows:
+                forUse = '1' if (row['eventId'], row['questionId']) in batchQuestionIds else '0'
+                csvWriter.writerow([row['eventId'], row['questionId'], row['questionText'], row['answer'], row['author'], row['sourceSummaryId'], forUse])
+
+def readScusPool(inputQuestionsFile):
+    # Read the SCUs file.
+    # Returns:
+    #   the list of rows (in the input order)
+    #   { summId -> [questionIds] }
+    #   { eventId -> [summIds] }
+    #   the set of (eventId, questionId) marked for use in the input file (question IDs are only unique within an event)
+    rows = []
+    scusPerSummary = {}
+    summariesPerEvent = {}
+    inputBatch = set()
+    with open(inputQuestionsFile, 'r') as inF:
+        csv_reader = csv.DictReader(inF)
+        for row in csv_reader:
+            eventId = row['eventId']
+            summId = row['sourceSummaryId']
+            questionId = row['questionId']
+            rows.append(row)
+            scusPerSummary.setdefault(summId, []).append(questionId)
+            if summId not in summariesPerEvent.setdefault(eventId, []):
+                summariesPerEvent[eventId].append(summId)
+            if row['forUse'] == '1':
+                inputBatch.add((eventId, questionId))
+    return rows, scusPerSummary, summariesPerEvent, inputBatch
+
+def getDisjointBatches(scusPerSummary, summariesPerEvent, numBatches, numScusPerRef, firstBatch=None):
+    # Split the SCUs of each event into numBatches disjoint batches, with numScusPerRef SCUs of each reference summary per batch.
+    # First every batch gets its share from each reference summary, and only then the missing SCUs are filled from
+    # the SCUs left over in the other reference summaries of the event, so that filling never takes another batch's share.
+    # Returns:
+    #   a list of sets of (eventId, questionId), one per batch
+    #   a list of (batchIndex, eventId, summId, numMissing, numFilledFromOtherSummaries) of the summaries short on SCUs
+    batches = [set() for _ in range(numBatches)]
+    shortages = []
+
+    for eventId in summariesPerEvent:
+        # the unused SCUs of each reference summary, in random order:
+        unusedScus = {}
+        for summId in summariesPerEvent[eventId]:
+            unusedScus[summId] = [(eventId, qId) for qId in scusPerSummary[summId] if firstBatch is None or (eventId, qId) not in firstBatch]
+            random.shuffle(unusedScus[summId])
+
+        # the batches to sample (the first one may be given already):
+        if firstBatch is not None:
+            batches[0].update((eventId, qId) for summId in summariesPerEvent[eventId] for qId in scusPerSummary[summId] if (eventId, qId) in firstBatch)
+            batchIndicesToSample = range(1, numBatches)
+        else:
+            batchIndicesToSample = range(numBatches)
+
+        # the share of each reference summary in each batch:
+        missingPerBatch = {} # { batchIdx -> [(summId, numMissing)] }
+        for batchIdx in batchIndicesToSample:
+            for summId in summariesPerEvent[eventId]:
+                numToTake = min(numScusPerRef, len(unusedScus[summId]))
+                batches[batchIdx].update(unusedScus[summId][:numToTake])
+                unusedScus[summId] = unusedScus[summId][numToTake:]
+                if numToTake < numScusPerRef:
+                    missingPerBatch.setdefault(batchIdx, []).append((summId, numScusPerRef - numToTake))
+
+        # fill the missing SCUs from the other reference summaries' left overs:
+        for batchIdx in batchIndicesToSample:
+            for summId, numMissing in missingPerBatch.get(batchIdx, []):
+                numFilled = 0
+                for _ in range(numMissing):
+                    otherSummIds = [otherId for otherId in summariesPerEvent[eventId] if otherId != summId and len(unusedScus[otherId]) > 0]
+                    if len(otherSummIds) == 0:
+                        break
+                    donorSummId = max(otherSummIds, key=lambda otherId: len(unusedScus[otherId]))
+                    batches[batchIdx].add(unusedScus[donorSummId].pop())
+                    numFilled += 1
+                shortages.append((batchIdx, eventId, summId, numMissing, numFilled))
+
+    return batches, shortages
+
+if __name__ == '__main__':
+    main(INPUT_QUESTIONS_CSV_PATH, OUTPUT_QUESTIONS_CSV_PATHS, REPORT_CSV_PATH)
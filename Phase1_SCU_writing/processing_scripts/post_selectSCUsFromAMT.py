@@ -1,8 +1,10 @@
 import sys
-import spacy
 import csv
 import random
-import nltk
+import itertools
+import heapq
+import tempfile
+import numpy as np
 
 '''
 The script is part of the first phase of the LitePyramids.
@@ -76,11 +78,46 @@ This is on a lemmatized, stop-words-removed, bag-of-words ratio based similarity
 I.e. percentage of the lemmas that overlap.
 '''
 SIMILARITY_SCORE_BAGOFWORDS = 0.95
+'''
+The method to use for finding similar statements generated for the same reference summary:
+    'bagofwords' - the lemma overlap ratio above (SIMILARITY_SCORE_BAGOFWORDS)
+    'embedding'  - the cosine similarity of the statement vectors (SIMILARITY_SCORE_EMBEDDING)
+The embedding method also catches paraphrases that do not share their words.
+'''
+SIMILARITY_TYPE = 'bagofwords'
+'''
+The cosine similarity score above which two statements are considered similar when SIMILARITY_TYPE is 'embedding'.
+'''
+SIMILARITY_SCORE_EMBEDDING = 0.9
+'''
+The path to a local static word embeddings file in the word2vec/GloVe text format (a word and then its vector values on each line).
+Used when SIMILARITY_TYPE is 'embedding'. If empty, the vectors of the SpaCy model are used instead
+(in that case it is better to load a model with real word vectors, like 'en_core_web_md').
+'''
+EMBEDDINGS_FILE = '' # e.g. 'glove.6B.300d.txt'
+'''
+The number of statement vectors to compare against all others in each matrix product (bounds the memory used).
+'''
+EMBEDDING_BLOCK_SIZE = 1024
+'''
+Whether to process the results file as a stream: the statements of each reference summary (eventId, summId) are grouped
+as they are read, and are processed and written out right away. Only one reference summary's statements are kept in memory,
+so this can be used on very large results files.
+'''
+STREAMING_MODE = False
+'''
+Whether the results file is already sorted (grouped) by eventId and summId, when STREAMING_MODE is used.
+If not, the rows are first grouped with an external sort, in temporary files of SORT_CHUNK_SIZE rows each.
+'''
+RESULTS_PRESORTED = False
+SORT_CHUNK_SIZE = 100000
 
 
 
 
-nlp = spacy.load('en_core_web_sm')
+nlp = None # the spaCy pipeline, loaded when first needed (spaCy is slow to import and load)
+staticEmbeddings = None # { word -> vector } loaded from EMBEDDINGS_FILE when first needed
+QUESTIONS_CSV_FIELDS = ['eventId', 'questionId', 'questionText', 'answer', 'author', 'sourceSummaryId', 'forUse']
 
 def main(scusCsvFile, outputCsvFile):
     # get the SCUs from the mechanical turk file:
@@ -95,6 +132,73 @@ def main(scusCsvFile, outputCsvFile):
         
     # output the final SCUs to a quetions CSV to be used in the evaluation database:
     outputQuestionsCSV(outputCsvFile, allScus, allScusAuthors, chosenScusIndices, finalScusIndices)
+    
+def mainStreaming(scusCsvFile, outputCsvFile):
+    # Same as main, but each reference summary is processed and written out as soon as its statements are read.
+    with open(outputCsvFile, 'w') as outF:
+        csvWriter = csv.writer(outF, lineterminator='\n')
+        csvWriter.writerow(QUESTIONS_CSV_FIELDS)
+        qId = 0
+        for (eventId, summId), rows in iterScusRowsBySummary(scusCsvFile, RESULTS_PRESORTED):
+            # the statements and authors of the current reference summary:
+            scus = []
+            scusAuthors = []
+            for row in rows:
+                statements = getStatementsFromRow(row)
+                scus.extend(statements)
+                scusAuthors.extend([row['WorkerId']] * len(statements))
+            
+            # get the relevant SCUs, and choose the ones to use for system summary evaluation:
+            scusForSummaryIndices = getScusForSummary(scus)
+            sampledScusForSummaryIndices = getSampleFromList(scusForSummaryIndices, NUM_SCUS_TO_SAMPLE)
+            
+            qId = writeSummaryQuestions(csvWriter, qId, eventId, summId, scus, scusAuthors, scusForSummaryIndices, sampledScusForSummaryIndices)
+            
+def iterScusRowsBySummary(scusCsvFile, isPresorted):
+    # Yields ((eventId, summId), [rows]) for each reference summary in the AMT results file, one summary at a time.
+    summaryKey = lambda row: (row['Input.eventId'], row['Input.summId'])
+    keysSeen = set()
+    with open(scusCsvFile, 'r') as inF:
+        csv_reader = csv.DictReader(inF)
+        if isPresorted:
+            rows = csv_reader
+        else:
+            rows = _externalSortRows(csv_reader, summaryKey, SORT_CHUNK_SIZE)
+            
+        for key, groupRows in itertools.groupby(rows, key=summaryKey):
+            # a summary showing up again means the file was not really grouped:
+            if key in keysSeen:
+                raise ValueError('The results file is not sorted by eventId and summId (seen {} again). Set RESULTS_PRESORTED = False.'.format(key))
+            keysSeen.add(key)
+            yield key, list(groupRows)
+            
+def _externalSortRows(csvReader, keyFunc, chunkSize):
+    # Sorts the rows of the CSV reader by the key, while keeping at most chunkSize rows in memory.
+    # Each sorted chunk is kept in a temporary file, and the chunks are then merged lazily.
+    # Rows with the same key keep their original order.
+    chunkFiles = []
+    for chunkRows in iter(lambda: list(itertools.islice(csvReader, chunkSize)), []):
+        chunkRows.sort(key=keyFunc)
+        # (the csv module needs files opened with newline='' in python 3, and in binary mode in python 2, and the default line
+        # terminator quotes the fields with any line breaks, so the rows are read back as they were):
+        chunkFile = tempfile.TemporaryFile(mode='w+', newline='') if sys.version_info[0] >= 3 else tempfile.TemporaryFile(mode='w+b')
+        csvWriter = csv.DictWriter(chunkFile, fieldnames=csvReader.fieldnames)
+        csvWriter.writeheader()
+        csvWriter.writerows(chunkRows)
+        chunkFile.seek(0)
+        chunkFiles.append(chunkFile)
+        
+    def decoratedRows(chunkIdx, chunkFile):
+        # the chunk and row indices are unique, so that the rows themselves are never compared:
+        for rowIdx, row in enumerate(csv.DictReader(chunkFile)):
+            yield keyFunc(row), chunkIdx, rowIdx, row
+            
+    try:
+        for _, _, _, row in heapq.merge(*[decoratedRows(chunkIdx, chunkFile) for chunkIdx, chunkFile in enumerate(chunkFiles)]):
+            yield row
+    finally:
+        for chunkFile in chunkFiles:
+            chunkFile.close()
 
 def getAllScus(scusCsvFile):
     # Get the statments generated by crowdworkers from the AMT batch file.
@@ -110,20 +214,16 @@ def getAllScus(scusCsvFile):
             eventId = row['Input.eventId']
             summId = row['Input.summId']
             workerId = row['WorkerId']
-            s1, s2, s3, s4, s5, s6, s7, s8 = \
-                row['Answer.s1'], \
-                row['Answer.s2'], \
-                row['Answer.s3'], \
-                row['Answer.s4'], \
-                row['Answer.s5'], \
-                row['Answer.s6'], \
-                row['Answer.s7'], \
-                row['Answer.s8']
+            statements = getStatementsFromRow(row)
                 
-            allScus.setdefault(eventId, {}).setdefault(summId, []).extend([s1, s2, s3, s4, s5, s6, s7, s8])
-            allScusAuthors.setdefault(eventId, {}).setdefault(summId, []).extend([workerId]*8)
+            allScus.setdefault(eventId, {}).setdefault(summId, []).extend(statements)
+            allScusAuthors.setdefault(eventId, {}).setdefault(summId, []).extend([workerId]*len(statements))
     
     return allScus, allScusAuthors
+    
+def getStatementsFromRow(row):
+    # the 8 statements written by the worker in an AMT results row: [s1,...,s8]
+    return [row['Answer.s{}'.format(sNum)] for sNum in range(1, 9)]
 
 def getFinalScus(allScus, eventId):
     # get the SCUs from allSCUs to be used in the questions CSV for the evaluation database
@@ -146,33 +246,41 @@ def getFinalScus(allScus, eventId):
     return chosenScusIndices, finalScusIndices
     
 def getSampleFromList(listToSampleFrom, sampleSize):
+    sampleSize = min(sampleSize, len(listToSampleFrom)) # there may be less available
     return [listToSampleFrom[i] for i in sorted(random.sample(xrange(len(listToSampleFrom)), sampleSize))]
     
 def outputQuestionsCSV(outputCsvPath, allScus, allScusAuthors, chosenScusIndices, finalScusIndices):
     # Write out the final CSV for the SCUs. Those to be used in the system summary evalaution phase are marked.
     with open(outputCsvPath, 'w') as outF:
+        csvWriter = csv.writer(outF, lineterminator='\n')
+        csvWriter.writerow(QUESTIONS_CSV_FIELDS)
         qId = 0
-        outF.write('eventId,questionId,questionText,answer,author,sourceSummaryId,forUse\n')
         for eventId in allScus:
             for summId in allScus[eventId]:
-                for ind in chosenScusIndices[eventId][summId]:
-                    outF.write('{},{},"{}",{},{},{},'.format(eventId, qId, allScus[eventId][summId][ind], 'Y', allScusAuthors[eventId][summId][ind], summId))
-                    if ind in finalScusIndices[eventId][summId]:
-                        outF.write('1\n')
-                        print(eventId, allScusAuthors[eventId][summId][ind], summId, allScus[eventId][summId][ind])
-                    else:
-                        outF.write('0\n')
-                    qId += 1
+                qId = writeSummaryQuestions(csvWriter, qId, eventId, summId, allScus[eventId][summId], allScusAuthors[eventId][summId],
+                    chosenScusIndices[eventId][summId], finalScusIndices[eventId][summId])
+    
+def writeSummaryQuestions(csvWriter, qId, eventId, summId, scus, scusAuthors, chosenIndices, finalIndices):
+    # Write out the chosen SCUs of one reference summary, starting from question ID qId. Returns the next question ID to use.
+    for ind in chosenIndices:
+        if ind in finalIndices:
+            forUse = '1'
+            print(eventId, scusAuthors[ind], summId, scus[ind])
+        else:
+            forUse = '0'
+        csvWriter.writerow([eventId, qId, scus[ind], 'Y', scusAuthors[ind], summId, forUse])
+        qId += 1
+    return qId
     
-
 
 def getScusForSummary(scusList):
     # initially, use all SCUs, and from here start removing irrelevant ones:
     chosenIndices = range(len(scusList))
+    nlp = _getNlp()
     # create SpaCy objects for all the SCUs (strip basic punctuation):
-    scuDocs = [nlp(unicode(scu.strip('.,!?'))) for scu in scusList]
+    scuDocs = list(nlp.pipe([unicode(scu.strip('.,!?')) for scu in scusList]))
     # create SpaCy objects for all the SCUs as tokens and without stop words:
-    scuDocsBase = [nlp(' '.join([token.lemma_ for token in scuDoc if not token.is_stop])) for scuDoc in scuDocs]
+    scuDocsBase = list(nlp.pipe([' '.join([token.lemma_ for token in scuDoc if not token.is_stop]) for scuDoc in scuDocs]))
     
     # remove SCUs with more than one sentence, or with more than 20 words, or with less than 4:
     for scuIdx, scuDoc in enumerate(scuDocs):
@@ -188,15 +296,23 @@ def getScusForSummary(scusList):
             chosenIndices.remove(scuIdx)
             print('Too short: ' + str(scuDoc))
         
+    # when using embeddings, get all the similar pairs at once from the vectors matrix ({ scuIdx1 -> [similar scuIdx2 > scuIdx1] }):
+    if SIMILARITY_TYPE == 'embedding':
+        similarScus = getSimilarPairsEmbedding(getScuVectors(scuDocs), chosenIndices, SIMILARITY_SCORE_EMBEDDING, EMBEDDING_BLOCK_SIZE)
+    else:
+        similarScus = None
+        
     # compute the similarities between all tokenized SCU pairs, and remove SCUs that are the similar previous ones:
     removeList = []
     for scuIdx1 in chosenIndices:
         if scuIdx1 not in removeList:
             scuDoc1 = scuDocsBase[scuIdx1]
-            for scuIdx2 in chosenIndices:
+            # only the precomputed similar SCUs need to be checked when using embeddings:
+            candidateIndices = chosenIndices if similarScus is None else similarScus.get(scuIdx1, [])
+            for scuIdx2 in candidateIndices:
                 if scuIdx1 < scuIdx2 and scuIdx2 not in removeList:
                     scuDoc2 = scuDocsBase[scuIdx2]
-                    if isSimilarOverlap(scuDoc1, scuDoc2):
+                    if similarScus is not None or isSimilarOverlap(scuDoc1, scuDoc2):
                         # if the scus are similar, remove the longer one:
                         if len(scuDoc1) < len(scuDoc2) and scuIdx2 not in removeList:
                             removeList.append(scuIdx2)
@@ -213,6 +329,64 @@ def getScusForSummary(scusList):
     
     return chosenIndices
 
+def getScuVectors(scuDocs):
+    # Get the vectors of all the given SCUs in one matrix (row i is the vector of scuDocs[i]).
+    # The rows are L2-normalized, so that a dot product of two rows is their cosine similarity.
+    if EMBEDDINGS_FILE != '':
+        embeddings = _getStaticEmbeddings()
+        dim = len(next(iter(embeddings.values())))
+        scuVectors = np.zeros((len(scuDocs), dim), dtype=np.float32)
+        for scuIdx, scuDoc in enumerate(scuDocs):
+            # the SCU vector is the average of its content word vectors:
+            wordVectors = [embeddings[token.lower_] for token in scuDoc if not token.is_stop and not token.is_punct and token.lower_ in embeddings]
+            if len(wordVectors) > 0:
+                scuVectors[scuIdx] = np.mean(wordVectors, axis=0)
+    else:
+        scuVectors = np.array([scuDoc.vector for scuDoc in scuDocs], dtype=np.float32)
+    
+    norms = np.linalg.norm(scuVectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0 # SCUs without any known word keep a zero vector (similar to nothing)
+    return scuVectors / norms
+    
+def getSimilarPairsEmbedding(scuVectors, scuIndices, similarityThreshold, blockSize):
+    # Get the pairs of SCUs (out of scuIndices) with a cosine similarity above the threshold.
+    # The similarities are computed with matrix products on blocks of rows, to avoid the full pairwise Python loop.
+    # Returns { scuIdx1 -> [scuIdx2, ...] } with scuIdx1 < scuIdx2, where the lists are sorted.
+    scuIndices = np.array(sorted(scuIndices), dtype=np.int64)
+    vectors = scuVectors[scuIndices]
+    similarPairs = {}
+    for blockStart in range(0, len(scuIndices), blockSize):
+        similarities = vectors[blockStart:blockStart + blockSize].dot(vectors.T)
+        rows, cols = np.nonzero(similarities > similarityThreshold)
+        rows += blockStart
+        # only keep each pair once (and not the SCU with itself):
+        upperMask = rows < cols
+        for row, col in zip(rows[upperMask], cols[upperMask]):
+            similarPairs.setdefault(int(scuIndices[row]), []).append(int(scuIndices[col]))
+    return similarPairs
+    
+def _getStaticEmbeddings():
+    # Load the word vectors of EMBEDDINGS_FILE (only once).
+    global staticEmbeddings
+    if staticEmbeddings is None:
+        staticEmbeddings = {}
+        with open(EMBEDDINGS_FILE, 'r') as inF:
+            for line in inF:
+                parts = line.rstrip().split(' ')
+                # skip the header line of word2vec files (<numWords> <dimension>):
+                if len(parts) <= 2:
+                    continue
+                staticEmbeddings[parts[0]] = np.array(parts[1:], dtype=np.float32)
+    return staticEmbeddings
+
+def _getNlp():
+    # Load the spaCy pipeline (only once).
+    global nlp
+    if nlp is None:
+        import spacy
+        nlp = spacy.load('en_core_web_sm')
+    return nlp
+
 def isSimilarW2V(scuDoc1, scuDoc2):
     retVal = False
     sim = scuDoc1.similarity(scuDoc2)
@@ -221,6 +395,7 @@ def isSimilarW2V(scuDoc1, scuDoc2):
     return retVal
     
 def isSimilarOverlap(scuDoc1, scuDoc2):
+    import nltk
     retVal = False
     set1 = set([n for n in nltk.ngrams([str(token) for token in scuDoc1], 1)])
     set2 = set([n for n in nltk.ngrams([str(token) for token in scuDoc2], 1)])
@@ -231,4 +406,7 @@ def isSimilarOverlap(scuDoc1, scuDoc2):
     return retVal
     
 if __name__ == '__main__':
-    main(SCUS_RESULTS_CSV, OUTPUT_CSV_PATH)
\ No newline at end of file
+    if STREAMING_MODE:
+        mainStreaming(SCUS_RESULTS_CSV, OUTPUT_CSV_PATH)
+    else:
+        main(SCUS_RESULTS_CSV, OUTPUT_CSV_PATH)
\ No newline at end of file
@@ -1,5 +1,8 @@
 import os
+import sys
 import random
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+from summaryCorpus import SummaryCorpus
 
 '''
 Creates the input for the MTurk assignment of writing SCUs for summaries.
@@ -30,31 +33,35 @@ NUM_REFS_PER_EVENT = 4
 
 
 
-lines = {}
-
-for filename in os.listdir(REF_SUMM_FOLDER):
-    for eventId in EVENT_IDS:
-        if not eventId in lines:
-            lines[eventId] = []
+def main(refSummFolder, eventIds, outputFile, numRefsPerEvent):
+    # index the reference summaries folder (scanned once):
+    corpus = SummaryCorpus(refSummFolder)
+    
+    lines = {}
+    for eventId in eventIds:
+        lines[eventId] = []
         fullEventId = eventId #'D' + eventId # NOTE: in 2005, the folder name event IDs are D###
-        if filename.startswith(fullEventId):
+        filenames = corpus.getFilenames(fullEventId)
+        texts = corpus.readTexts(filenames)
+        for filename in filenames:
             # get the text of the reference summary with a proper eventId:
-            filepath = os.path.join(REF_SUMM_FOLDER, filename)
-            with open(filepath, 'r') as refSumFile:
-                summText = refSumFile.read()
+            summText = texts[filename]
             # remove newlines, and replace " with '
             summText = summText.replace('\n', ' ').strip().replace('"', '\'')
             lines[eventId].append('{},{},"{}"\n'.format(eventId, filename, summText))
 
-# choose a sample of ref summs for each event:
-allLinesToUse = []
-for eventId in EVENT_IDS:
-    linesToUse = random.sample(lines[eventId], NUM_REFS_PER_EVENT)
-    allLinesToUse.extend(linesToUse)
-        
-# write the lines out shuffled:
-random.shuffle(allLinesToUse)
-with open(OUTPUT_FILE, 'w') as outF:
-    outF.write('eventId,summId,summary_text\n')
-    for line in allLinesToUse:
-        outF.write(line)
\ No newline at end of file
+    # choose a sample of ref summs for each event:
+    allLinesToUse = []
+    for eventId in eventIds:
+        linesToUse = random.sample(lines[eventId], numRefsPerEvent)
+        allLinesToUse.extend(linesToUse)
+            
+    # write the lines out shuffled:
+    random.shuffle(allLinesToUse)
+    with open(outputFile, 'w') as outF:
+        outF.write('eventId,summId,summary_text\n')
+        for line in allLinesToUse:
+            outF.write(line)
+            
+if __name__ == '__main__':
+    main(REF_SUMM_FOLDER, EVENT_IDS, OUTPUT_FILE, NUM_REFS_PER_EVENT)
\ No newline at end of file
@@ -0,0 +1,121 @@
+import os
+import sys
+import csv
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+from summaryCorpus import SummaryCorpus
+from scuBank import ScuBank
+
+'''
+Reuses existing SCUs for new reference summaries, before commissioning new ones on AMT.
+The SCUs of the bank (by default all the DUC 2005 and 2006 SCUs) that a new reference summary entails are retrieved
+(see common/scuBank.py), and only the reference summaries that are not covered by enough retrieved SCUs are written
+to the AMT input file of the SCU writing task (as pre_createInputForAMT.py does for all of them).
+
+The retrieved SCUs are written in the format of post_selectSCUsFromAMT.py (eventId,questionId,questionText,answer,author,sourceSummaryId,forUse),
+with the new event and reference summary IDs, so the file can be concatenated to the SCUs selected from the AMT results of the
+uncovered summaries, and split into batches with post_createSCUBatches.py. The question IDs of the retrieved SCUs are
+'bank_<eventId>_<questionId>' of the bank SCU, so they do not collide with the question IDs of new SCUs.
+The best NUM_SCUS_PER_REF retrieved SCUs of each covered reference summary are marked for use. The retrieved SCUs of an uncovered
+reference summary are written unmarked (forUse=0), since the SCUs selected for it from the AMT results are marked for use instead,
+so after concatenating the files each reference summary has NUM_SCUS_PER_REF SCUs marked for use. Only the SCUs marked for use are
+taken from the later reference summaries of the event, and an SCU is written once per event (marked if any reference summary uses it).
+'''
+
+'''
+The SCU files of the bank.
+'''
+BANK_QUESTIONS_FILES = [os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dataset', ducYear, batchFile)
+                        for ducYear in ['DUC2005', 'DUC2006'] for batchFile in ['batch1.csv', 'batch2.csv']]
+'''
+The path to the folder of the new reference summaries (as in pre_createInputForAMT.py), and the event IDs to use (all if empty).
+'''
+REF_SUMM_FOLDER = '' # e.g. '../../DUC_data/2007/models'
+EVENT_IDS = [] # e.g. ['D0701', 'D0702']
+'''
+The path of the SCUs file to write the retrieved SCUs to.
+'''
+OUTPUT_QUESTIONS_FILE = '' # e.g. 'SCUs_fromBank.csv'
+'''
+The path of the AMT input file of the SCU writing task to write the uncovered reference summaries to.
+'''
+OUTPUT_AMT_INPUT_FILE = '' # e.g. 'AMT_input_uncovered.csv'
+'''
+An optional CSV file to write each retrieval to, for checking the retrieved SCUs:
+    eventId,summId,bankEventId,bankQuestionId,bankSourceSummaryId,questionText,lemmaOverlap,ngramContainment,cosine
+'''
+OUTPUT_REPORT_FILE = '' # e.g. 'SCUs_fromBank_report.csv'
+'''
+The number of retrieved SCUs a reference summary needs to be covered (the number of SCUs used per reference summary in a batch).
+'''
+NUM_SCUS_PER_REF = 4
+
+### Retrieval options:
+# The lemmatizer ('spacy' or 'simple', see common/lexicalOverlap.py) and the size of the n-grams:
+LEMMATIZER = 'spacy'
+NGRAM_SIZE = 2
+# The minimal fraction of an SCU's content lemmas, and of its lemma n-grams, found in the reference summary:
+MIN_LEMMA_OVERLAP = 0.8
+MIN_NGRAM_CONTAINMENT = 0.5
+# An optional static word embeddings file (word2vec/GloVe text format), and the minimal cosine similarity of an SCU to a sentence of the summary:
+EMBEDDINGS_FILE = '' # e.g. 'glove.6B.300d.txt'
+MIN_COSINE = 0.8
+
+
+def main(bankQuestionsFiles, refSummFolder, eventIds, outputQuestionsFile, outputAmtInputFile, outputReportFile=''):
+    bank = ScuBank(bankQuestionsFiles, LEMMATIZER, NGRAM_SIZE, EMBEDDINGS_FILE)
+    print('SCUs in the bank: {}'.format(len(bank.scus)))
+
+    # the new reference summaries (texts in one line, as in pre_createInputForAMT.py):
+    corpus = SummaryCorpus(refSummFolder)
+    filenames = [filename for eventId in eventIds for filename in corpus.getFilenames(eventId)] if len(eventIds) > 0 else corpus.filenames
+    texts = corpus.readTexts(filenames)
+    summTexts = [texts[filename].replace('\n', ' ').strip() for filename in filenames]
+    allRetrieved = bank.retrieveAll(summTexts, MIN_LEMMA_OVERLAP, MIN_NGRAM_CONTAINMENT, MIN_COSINE)
+
+    questionRows = []
+    questionRowIndices = {} # { (new eventId, SCU index) -> index in questionRows }: an SCU is written once per event
+    reportRows = []
+    uncoveredRows = []
+    usedScus = set() # (new eventId, SCU index): an SCU is used (marked) once per event, even if several reference summaries entail it
+    for filename, summText, retrieved in zip(filenames, summTexts, allRetrieved):
+        eventId = filename.split('.')[0]
+        retrieved = [scuMatch for scuMatch in retrieved if (eventId, scuMatch[0]) not in usedScus]
+        isCovered = len(retrieved) >= NUM_SCUS_PER_REF
+        for rank, (scuIdx, lemmaOverlap, ngramContainment, cosine) in enumerate(retrieved):
+            forUse = isCovered and rank < NUM_SCUS_PER_REF
+            if forUse:
+                usedScus.add((eventId, scuIdx))
+            scu = bank.scus[scuIdx]
+            questionRow = [eventId, 'bank_{}_{}'.format(scu['eventId'], scu['questionId']), scu['questionText'], 'Y', scu['author'], filename,
+                           '1' if forUse else '0']
+            # an SCU already written unmarked for another reference summary of the event is written once, marked if used here:
+            if (eventId, scuIdx) not in questionRowIndices:
+                questionRowIndices[(eventId, scuIdx)] = len(questionRows)
+                questionRows.append(questionRow)
+            elif forUse:
+                questionRows[questionRowIndices[(eventId, scuIdx)]] = questionRow
+            reportRows.append([eventId, filename, scu['eventId'], scu['questionId'], scu['sourceSummaryId'], scu['questionText'],
+                               round(lemmaOverlap, 4), round(ngramContainment, 4), '' if cosine is None else round(cosine, 4)])
+        if not isCovered:
+            uncoveredRows.append([eventId, filename, summText.replace('"', '\'')])
+
+    with open(outputQuestionsFile, 'w') as outF:
+        csvWriter = csv.writer(outF, lineterminator='\n')
+        csvWriter.writerow(['eventId', 'questionId', 'questionText', 'answer', 'author', 'sourceSummaryId', 'forUse'])
+        csvWriter.writerows(questionRows)
+    with open(outputAmtInputFile, 'w') as outF:
+        csvWriter = csv.writer(outF, lineterminator='\n')
+        csvWriter.writerow(['eventId', 'summId', 'summary_text'])
+        csvWriter.writerows(uncoveredRows)
+    if outputReportFile != '':
+        with open(outputReportFile, 'w') as outF:
+            csvWriter = csv.writer(outF, lineterminator='\n')
+            csvWriter.writerow(['eventId', 'summId', 'bankEventId', 'bankQuestionId', 'bankSourceSummaryId', 'questionText', 'lemmaOverlap', 'ngramContainment', 'cosine'])
+            csvWriter.writerows(reportRows)
+
+    print('Reference summaries: {}, covered by the bank: {}, to write SCUs for on AMT: {}'.format(
+        len(filenames), len(filenames) - len(uncoveredRows), len(uncoveredRows)))
+    print('Retrieved SCUs: {}'.format(len(questionRows)))
+
+if __name__ == '__main__':
+    main(BANK_QUESTIONS_FILES, REF_SUMM_FOLDER, EVENT_IDS, OUTPUT_QUESTIONS_FILE, OUTPUT_AMT_INPUT_FILE, OUTPUT_REPORT_FILE)
@@ -0,0 +1,105 @@
+import os
+import re
+import csv
+import math
+
+'''
+Packs the SCUs (statements) of the system summary evaluation task into HITs with a configurable number of statements.
+Used by the pre_createInputForAMT*.py scripts.
+
+The SCUs of an event (possibly combined from several SCU batch files) are split into HITs of exactly statementsPerHit
+statements. When the number of SCUs is not a multiple of statementsPerHit, the last HIT of each summary is completed
+with SCUs from the beginning of the event's list (those few SCUs get more judgments), so that there are no empty slots.
+An event with fewer SCUs than statementsPerHit gets a single short HIT with all its SCUs (the remaining statement columns
+are left out of the row, as the AMT input files always had for such events).
+Each HIT row keeps the qIdList of its statements in order, which is how post_calculateScores.py (getRawData) maps the
+Answer.S<i>Answer columns back to the question IDs.
+'''
+
+# the design layout of the task with 16 statements, used as a template for other HIT sizes:
+TEMPLATE_LAYOUT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'AMT_task', 'task_designLayout.html')
+TEMPLATE_STATEMENTS_PER_HIT = 16
+
+
+def getEventQuestions(questionsFiles):
+    # Get the SCUs to use for all events from the given SCU batch files (combined, in order, without repetitions).
+    # Returns { eventId -> { scuID -> SCUtext } } and { eventId -> [ scuIDs ] }.
+    eventQuestions = {} # { eventId -> { scuID -> SCUtext } }
+    eventQuestionsLists = {} # { eventId -> [ scuIDs ] }
+    for questionsFile in questionsFiles:
+        with open(questionsFile, 'r') as inF:
+            csv_reader = csv.DictReader(inF)
+            for row in csv_reader:
+                if row['forUse'] == '1':
+                    eventId = row['eventId']
+                    qId = row['questionId']
+                    qText = row['questionText']
+                    if qId not in eventQuestions.setdefault(eventId, {}):
+                        eventQuestions[eventId][qId] = qText
+                        eventQuestionsLists.setdefault(eventId, []).append(qId)
+    return eventQuestions, eventQuestionsLists
+
+def packQuestionIds(questionIds, statementsPerHit):
+    # Split the question IDs into lists of exactly statementsPerHit question IDs (one list per HIT).
+    # The last list is completed with question IDs from the beginning of the list (not already in that last list).
+    # With fewer question IDs than statementsPerHit, there is a single short list of all of them.
+    if len(questionIds) <= statementsPerHit:
+        return [list(questionIds)]
+
+    hitsQuestionIds = [list(questionIds[i:i + statementsPerHit]) for i in range(0, len(questionIds), statementsPerHit)]
+    lastHit = hitsQuestionIds[-1]
+    for qId in questionIds:
+        if len(lastHit) == statementsPerHit:
+            break
+        if qId not in lastHit:
+            lastHit.append(qId)
+    return hitsQuestionIds
+
+def getPrioritizedQuestionIds(priorityQuestionIds, otherQuestionIds, statementsPerHit):
+    # The question IDs for HITs that should only ask about priorityQuestionIds: those, completed to a multiple of
+    # statementsPerHit with the first of otherQuestionIds (an empty list if there are no priority question IDs).
+    numStatements = int(math.ceil(float(len(priorityQuestionIds)) / statementsPerHit)) * statementsPerHit
+    return (list(priorityQuestionIds) + list(otherQuestionIds))[:numStatements]
+
+def getHitRows(eventId, summaryId, summText, eventQuestions, eventQuestionsList, statementsPerHit):
+    # Get the HIT rows of a summary: [eventId, summaryId, qIdList, summary_text, statement_1, ..., statement_<statementsPerHit>]
+    hitRows = []
+    for hitQuestionIds in packQuestionIds(eventQuestionsList, statementsPerHit):
+        statements = [cleanText(eventQuestions[qId]) for qId in hitQuestionIds]
+        hitRows.append([eventId, summaryId, str(hitQuestionIds), summText] + statements)
+    return hitRows
+
+def getHitCsvHeader(statementsPerHit):
+    return ['eventId', 'summaryId', 'qIdList', 'summary_text'] + ['statement_{}'.format(sNum) for sNum in range(1, statementsPerHit + 1)]
+
+def writeHitsCsv(outCsvFile, hitRows, statementsPerHit):
+    # Write out the AMT input file with a header matching the number of statements per HIT.
+    with open(outCsvFile, 'w') as fOut:
+        csvWriter = csv.writer(fOut, quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
+        csvWriter.writerow(getHitCsvHeader(statementsPerHit))
+        csvWriter.writerows(hitRows)
+
+def cleanText(text):
+    # replace newlines and problematic quotation characters:
+    return text.replace('\n', ' ').replace('``', '\'\'').replace('"', '\'\'').strip()
+
+def createTaskLayout(statementsPerHit, outLayoutFile, templateLayoutFile=TEMPLATE_LAYOUT_FILE):
+    # Write a task design layout for AMT with statementsPerHit statements, based on the 16-statement layout.
+    with open(templateLayoutFile, 'r') as inF:
+        layout = inF.read()
+
+    # the fieldsets of the statements in the template:
+    statementBlockPattern = re.compile(r'<fieldset>\s*<p><strong>(\d+)\. </strong>\$\{statement_\d+\}</p>.*?</fieldset>\s*', re.DOTALL)
+    statementBlocks = list(statementBlockPattern.finditer(layout))
+    firstBlock = statementBlocks[0].group(0)
+
+    # create the fieldsets for the needed number of statements from the first one:
+    newBlocks = ''.join(firstBlock.replace('<strong>1. </strong>', '<strong>{}. </strong>'.format(sNum))
+                                  .replace('${statement_1}', '${{statement_{}}}'.format(sNum))
+                                  .replace('name="S1Answer"', 'name="S{}Answer"'.format(sNum))
+                        for sNum in range(1, statementsPerHit + 1))
+    layout = layout[:statementBlocks[0].start()] + newBlocks + layout[statementBlocks[-1].end():]
+    layout = layout.replace('whether {}&nbsp;sentences'.format(TEMPLATE_STATEMENTS_PER_HIT), 'whether {}&nbsp;sentences'.format(statementsPerHit))
+
+    with open(outLayoutFile, 'w') as outF:
+        outF.write(layout)
@@ -0,0 +1,832 @@
+import sys
+import csv
+import ast
+from collections import Counter
+from functools import reduce
+import copy
+import difflib
+import random
+import time
+import operator
+import threading
+import math
+import numpy as np
+
+'''
+The Lite-Pyramid scoring of system summaries from crowdsourced SCU judgments, shared by post_calculateScores.py and
+post_calculateScores_newSystem.py, and usable in-process by other code:
+
+    from litePyramidScoring import scoreJudgments
+    scores = scoreJudgments(judgments, {'NUM_ITERATION_ON_CONFIGURATION': 10})
+    scores.systemScores # { systemId -> score }
+    scores.summaryScores # { eventId -> { summId -> score } }
+
+The judgments are given in memory as rows of (eventId, summaryId, assignmentId, workerId, questionId, answer), or as a
+pandas DataFrame with these columns (see JUDGMENT_FIELDS). The answer is 'p'/'n' (or 1/0, True/False) and ''/None/NaN for
+no answer. The AMT results file of the summary evaluation task (see post_calculateScores.py) can be scored with scoreResultsFile.
+
+The configuration is a dictionary of the configuration parameters (see DEFAULT_CONFIGURATION), and missing parameters
+get their default values.
+'''
+
+# The default configuration parameters (see the configuration options in post_calculateScores.py):
+DEFAULT_CONFIGURATION = {
+    'ANSWER_AGGREGATION_TYPE' : 1, # 0=average 1=majority 2=atleast1present
+    'ANSWER_TIE_BREAKER' : 0.0, # 0.0=NotPresent, 1.0=Present, 0.5=Gives half a point
+    'NO_ANSWER_DEFAULT' : 1.0, # 0.0=NotPresent, 1.0=Present, 0.5=Ignore
+    'NUM_TURKERS_PER_SUMMARY' : 5,
+    'NUM_QUESTIONS_PER_SUMMARY' : 32,
+    'NUM_EVENTS_TO_USE' : 20,
+    'WORKER_AGREEMENT_THRESHOLD' : 0.5,
+    'AGREEMENT_FILTERING_ITERATIONS' : 1,
+    'NUM_ITERATION_ON_CONFIGURATION' : 70,
+    'EVENT_FILTER_PERCENT' : 0.0
+}
+# The fields of an in-memory judgment (a row, or the columns of a DataFrame):
+JUDGMENT_FIELDS = ['eventId', 'summaryId', 'assignmentId', 'workerId', 'questionId', 'answer']
+
+
+class LitePyramidScores(object):
+    # The Lite-Pyramid scores of a configuration, averaged over its iterations.
+    
+    def __init__(self, summaryScores, systemScores, configuration):
+        self.summaryScores = summaryScores # { eventId -> { summId -> score } }
+        self.systemScores = systemScores # { systemId -> score }
+        self.configuration = configuration
+    
+    def getSystemEventScores(self):
+        # The summary scores by system: { systemId -> { eventId -> score } }
+        systemEventScores = {}
+        for eventId in self.summaryScores:
+            for summId in self.summaryScores[eventId]:
+                systemId = summId.split('.')[-1] # the last part of the summary name is the system ID (e.g. D0601.M.250.A.4)
+                systemEventScores.setdefault(systemId, {})[eventId] = self.summaryScores[eventId][summId]
+        return systemEventScores
+    
+    def getEventScores(self):
+        # The average summary score on each event: { eventId -> score }
+        return {eventId : reduce(lambda x, y: x + y, self.summaryScores[eventId].values()) / len(self.summaryScores[eventId])
+            for eventId in self.summaryScores}
+
+
+def scoreJudgments(judgments, configuration=None, rng=random):
+    # Score the in-memory judgments (see JUDGMENT_FIELDS) with the configuration. Returns a LitePyramidScores.
+    rawDataValues, questionIdsPerEvent = getRawDataFromJudgments(judgments)
+    return computeScores(rawDataValues, questionIdsPerEvent, configuration, rng=rng)
+
+def scoreResultsFile(inputBatchFile, configuration=None, rng=random):
+    # Score the judgments in the AMT results file with the configuration. Returns a LitePyramidScores.
+    rawDataValues, questionIdsPerEvent = getRawData(inputBatchFile)
+    return computeScores(rawDataValues, questionIdsPerEvent, configuration, rng=rng)
+
+def getConfiguration(configuration=None):
+    # The full configuration: the given parameters over the default ones.
+    fullConfiguration = dict(DEFAULT_CONFIGURATION)
+    fullConfiguration.update(configuration or {})
+    return fullConfiguration
+
+def computeScores(rawDataValues, questionIdsPerEvent, configuration=None, stages=None, rng=random, showProgress=False):
+    # Get the scores of the summaries and the systems, averaged over the iterations of the configuration.
+    # The stages before the iterations are taken from the given ScoringStages (shared over configurations), if any, and
+    # the random samples are drawn with rng (the random module, or a SubsetSampler).
+    configuration = getConfiguration(configuration)
+    numIterations = configuration['NUM_ITERATION_ON_CONFIGURATION']
+    
+    if stages is None:
+        stages = ScoringStages(rawDataValues, questionIdsPerEvent)
+    
+    # get the data in a mapped-value format (dependent on some configuration parameters):
+    dataValues = stages.get('dataValues', configuration)
+    
+    # get a list of workers to disregard during scoring:
+    workersToFilter = stages.get('workersToFilter', configuration)
+    
+    # get the event agreement scores only if events are filtered by agreement:
+    eventAgreements = stages.get('eventAgreements', configuration) if configuration['EVENT_FILTER_PERCENT'] > 0 else None
+    
+    # run several iterations on the configuration to get an average (since there's randomization):
+    startTime = time.time()
+    if showProgress:
+        _printProgressBar(0, numIterations, prefix = 'Progress:', suffix = '', length = 50)
+    summaryScoresAll = {} # { eventId -> { summId -> [scores over iterations] } }
+    systemScoresAll = {} # { systemId -> [scores over iterations] }
+    for i in range(numIterations):
+        if rng is not random:
+            rng.startIteration(i)
+    
+        # get the scores of each system summary (per event):
+        summaryScores = getSystemSummaryScores(
+            dataValues,
+            workersToFilter,
+            questionIdsPerEvent,
+            configuration['ANSWER_AGGREGATION_TYPE'],
+            configuration['ANSWER_TIE_BREAKER'],
+            configuration['NUM_QUESTIONS_PER_SUMMARY'],
+            configuration['NUM_TURKERS_PER_SUMMARY'],
+            configuration['NUM_EVENTS_TO_USE'],
+            eventAgreements,
+            configuration['EVENT_FILTER_PERCENT'],
+            rng)
+        for eventId in summaryScores:
+            for summId in summaryScores[eventId]:
+                summaryScoresAll.setdefault(eventId, {}).setdefault(summId, []).append(summaryScores[eventId][summId])
+    
+        # get the system scores according to their summary scores (average over events):
+        systemScores, _ = getSystemScores(summaryScores)
+        for systemId in systemScores:
+            systemScoresAll.setdefault(systemId, []).append(systemScores[systemId])
+    
+        # show the progress and time after the iteration:
+        if showProgress:
+            curTime = time.time() - startTime
+            _printProgressBar(i + 1, numIterations, prefix = 'Progress:', suffix = round(curTime/60,2), length = 50)
+    
+    # now that we've finished running many iterations, calculate the average scores over the iterations:
+    summaryScoresFinal = {eventId : {summId : reduce(lambda x, y: x + y, scoresList) / len(scoresList)
+        for summId, scoresList in summaryScoresAll[eventId].items()} for eventId in summaryScoresAll}
+    systemScoresFinal = {systemId : reduce(lambda x, y: x + y, scoresList) / len(scoresList)
+        for systemId, scoresList in systemScoresAll.items()}
+    
+    return LitePyramidScores(summaryScoresFinal, systemScoresFinal, configuration)
+
+
+def printAverageEventScores(summaryScores):
+    # FOR DEBUGGING
+    
+    # list the summary scores in each topic:
+    scoresByEvent = {eventId : [summaryScores[eventId][summId] for summId in summaryScores[eventId]] for eventId in summaryScores}
+    # average the scores in each topic:
+    avgScoreByEvent = {eventId : reduce(lambda x, y: x + y, scoresByEvent[eventId]) / len(scoresByEvent[eventId]) \
+        for eventId in scoresByEvent}
+    # print the average score of each topic:
+    for eventId in avgScoreByEvent:
+        print(eventId, avgScoreByEvent[eventId], len(scoresByEvent[eventId]))
+    
+    
+    
+def getSystemScores(summaryScores):
+    # Gets the scores of the systems according to the separate summary scores of each system.
+    # Returns a dictionary of scores per system and lists of eventIDs for which each system has a summary.
+    
+    # keep all the scores of each system:
+    systemScoresAll = {} # the list of scores for each system.  { systemId -> [ <scores> ] }
+    eventIdsUsedPerSystem = {} # the eventIds that each system has summaries for.  { systemId -> [ <event_ids> ] }
+    for eventId in summaryScores:
+        for summId in summaryScores[eventId]:
+            systemId = summId.split('.')[-1] # the last part of the summary name is the system ID (e.g. D0601.M.250.A.4)
+            systemScoresAll.setdefault(systemId, []).append(summaryScores[eventId][summId])
+            
+            # keep track of the eventIds used by the system:
+            if not systemId in eventIdsUsedPerSystem:
+                eventIdsUsedPerSystem[systemId] = [eventId]
+            elif not eventId in eventIdsUsedPerSystem[systemId]:
+                eventIdsUsedPerSystem[systemId].append(eventId)
+            
+    # get the system scores with the average of summary scores ({ systemId -> score }):
+    systemScores = {systemId : reduce(lambda x, y: x + y, systemScoresAll[systemId]) / len(systemScoresAll[systemId]) \
+        for systemId in systemScoresAll}
+        
+    return systemScores, eventIdsUsedPerSystem
+    
+    
+def getSystemSummaryScores(dataValues, workersToFilter, questionIdsPerEvent, answerAggregationType, answerTieBreaker, numQuestionsPerSummary, numTurkersPerSummary, numEventsToUse, eventAgreements, percentEventsToFilter, rng=random):
+    # Get the score of each summary according to our lite-Pyramid method.
+    # The random samples are drawn with rng.sample (the random module, or a SubsetSampler).
+    # Returns a dictionary of { eventId -> { summId -> score } }.
+    
+    # first get the list of eventIds to use, according to the number specified:
+    possibleEventIdsToUse = [eventId for eventId in dataValues.keys()]# if eventId not in eventsToFilter]
+    if len(possibleEventIdsToUse) <= numEventsToUse:
+        eventIdsToUse = possibleEventIdsToUse
+    else:
+        eventIdsToUse = rng.sample(possibleEventIdsToUse, numEventsToUse)
+    
+    # if we need to filter out a certain percent of bad events, take them out of the eventIdsToUse:
+    if percentEventsToFilter > 0:
+        eventsToFilter = _filterEventsByAgreement(eventAgreements, percentEventsToFilter, baseEventIds=eventIdsToUse)
+        eventIdsToUse = [eventId for eventId in eventIdsToUse if not eventId in eventsToFilter]
+    
+    #if len(dataValues.keys()) <= numEventsToUse:
+    #    eventIdsToUse = dataValues.keys()
+    #else:
+    #    eventIdsToUse = random.sample(dataValues.keys(), numEventsToUse)
+    
+    # get a list of answers for each question in each summary:
+    allSolutionsPerSummary = {} # { eventId -> { summaryId -> { questionId -> [ <full list of answers> ] } } }
+    questionIdsToUse = {} # { eventId -> [ <questionIds> ] }
+    for eventId in eventIdsToUse:
+        questionIdsToUse[eventId] = []
+        for summId in dataValues[eventId]:
+            for solution in dataValues[eventId][summId]:
+                # ignore this solution if this is a filtered worker:
+                workerId = solution['workerId']
+                if workerId in workersToFilter:
+                    continue
+                # add the questionId/answer to this summary:
+                for questionId, answer in solution['answers'].items():
+                    allSolutionsPerSummary.setdefault(eventId, {}).setdefault(summId, {}).setdefault(questionId, []).append(answer)
+                    # keep the questionId for the event:
+                    if questionId not in questionIdsToUse[eventId]:
+                        questionIdsToUse[eventId].append(questionId)
+                        
+    # for each event, choose the sample of question IDs to use:
+    for eventId in questionIdsToUse:
+        if len(questionIdsToUse[eventId]) > numQuestionsPerSummary:
+            questionIdsToUse[eventId] = rng.sample(questionIdsToUse[eventId], numQuestionsPerSummary)
+                
+    # for each question to use, from the list of answers, choose a number of answers:
+    summaryScores = {} # { eventId -> { summId -> score } }
+    for eventId in allSolutionsPerSummary:
+        summaryScores[eventId] = {}
+        for summId in allSolutionsPerSummary[eventId]:
+            summScore = 0.0 # the score is the sum of the questions' scores
+            numQuestions = 0
+            for questionId in allSolutionsPerSummary[eventId][summId]:
+                # only look at the questions that should be used:
+                if questionId in questionIdsToUse[eventId]:
+                    # get a sample of answers for the question:
+                    if len(allSolutionsPerSummary[eventId][summId][questionId]) <= numTurkersPerSummary:
+                        answerSample = allSolutionsPerSummary[eventId][summId][questionId]
+                    else:
+                        answerSample = rng.sample(allSolutionsPerSummary[eventId][summId][questionId], numTurkersPerSummary)
+                    
+                    # get the current question's score according to the several answers provided by the turkers:
+                    questionFinalAnswerScore = getFinalAnswerScoreFromList(answerSample, answerAggregationType, answerTieBreaker)
+                    summScore += questionFinalAnswerScore
+                    numQuestions += 1
+            
+            # set the final score for the current summary as the percentage of positive answers:
+            summaryScores[eventId][summId] = summScore / numQuestions
+        
+    return summaryScores
+    
+
+def getFinalAnswerScoreFromList(answerList, answerAggregationType, answerTieBreaker):
+    # gets a score from the list of answers given (list of 0.0 or 1.0)
+    # the score is a number between 0 and 1
+    
+    # use the average of the answers:
+    if answerAggregationType == 0:
+        result = reduce(lambda x, y: x + y, answerList) / len(answerList)
+    # use the majority of the answers:
+    elif answerAggregationType == 1:
+        answersCount = Counter(answerList)
+        if answersCount[0.0] > answersCount[1.0]:
+            result = 0.0
+        elif answersCount[0.0] < answersCount[1.0]:
+            result = 1.0
+        else:
+            result = answerTieBreaker
+    # return 1 iff atleast one 1, otherwise 0:
+    elif answerAggregationType == 2:
+        answersCount = Counter(answerList)
+        if answersCount[1.0] > 0:
+            result = 1.0
+        else:
+            result = 0.0
+    else:
+        result = -999
+        
+    return result
+    
+def getAnswerScoreDistributions(presentRates, notPresentRates, numDraws, answerAggregationType, answerTieBreaker, otherValue, numUsed=None):
+    # Gets the distribution of the aggregated score (see getFinalAnswerScoreFromList) of numDraws answers drawn with replacement from
+    # answers that are present (1.0), not present (0.0) or other (otherValue, i.e. the NO_ANSWER_DEFAULT) at the given rates, for each
+    # element of the arrays (of any shape). The distributions are exact, from the multinomial probabilities of the counts of the three
+    # kinds of answers (e.g. the binomial probability of a majority when there are no other answers).
+    # If numUsed (an array like numDraws) is given, the score of the drawn answers is instead the expected aggregated score of numUsed
+    # of them sampled without replacement (see _getSubsampleScoreMoments), i.e. the score averaged over many such samples.
+    # Returns the possible scores [score] and their probabilities [..., score] (all 0 where numDraws is 0).
+    otherRates = np.maximum(1.0 - presentRates - notPresentRates, 0.0)
+    if numUsed is None:
+        numUsed = numDraws
+    probsPerScore = {} # { score -> probabilities array }
+    for draws in range(1, int(np.max(numDraws)) + 1 if np.size(numDraws) > 0 else 1):
+        for used in range(1, draws + 1):
+            drawsMask = (numDraws == draws) & (numUsed == used)
+            if not drawsMask.any():
+                continue
+            for numPresent in range(draws + 1):
+                for numNotPresent in range(draws - numPresent + 1):
+                    numOther = draws - numPresent - numNotPresent
+                    score = _getSubsampleScoreMoments(numPresent, numNotPresent, numOther, used, answerAggregationType, answerTieBreaker, otherValue)[0]
+                    coefficient = math.factorial(draws) / float(math.factorial(numPresent) * math.factorial(numNotPresent) * math.factorial(numOther))
+                    probs = coefficient * presentRates ** numPresent * notPresentRates ** numNotPresent * otherRates ** numOther
+                    probsPerScore[score] = probsPerScore.get(score, 0.0) + np.where(drawsMask, probs, 0.0)
+    
+    if len(probsPerScore) == 0:
+        return np.array([0.0]), np.zeros(np.shape(numDraws) + (1,))
+    scores = np.array(sorted(probsPerScore))
+    return scores, np.stack([probsPerScore[score] for score in scores], axis=-1)
+    
+def _getSubsampleScoreMoments(numPresent, numNotPresent, numOther, numUsed, answerAggregationType, answerTieBreaker, otherValue):
+    # Gets the mean and the mean of the squares of the aggregated score of numUsed answers sampled without replacement from the given
+    # counts of answers (as rng.sample does in getSystemSummaryScores), from the hypergeometric probabilities of the sampled counts.
+    numAnswers = numPresent + numNotPresent + numOther
+    numSamples = float(_numCombinations(numAnswers, numUsed))
+    scoreMean = 0.0
+    scoreSquaresMean = 0.0
+    for usedPresent in range(min(numPresent, numUsed) + 1):
+        for usedNotPresent in range(min(numNotPresent, numUsed - usedPresent) + 1):
+            usedOther = numUsed - usedPresent - usedNotPresent
+            if usedOther > numOther:
+                continue
+            prob = _numCombinations(numPresent, usedPresent) * _numCombinations(numNotPresent, usedNotPresent) * _numCombinations(numOther, usedOther) / numSamples
+            if answerAggregationType == 0:
+                score = (usedPresent + usedOther * otherValue) / float(numUsed)
+            elif answerAggregationType == 1:
+                score = 1.0 if usedPresent > usedNotPresent else (0.0 if usedPresent < usedNotPresent else answerTieBreaker)
+            else:
+                score = 1.0 if usedPresent > 0 else 0.0
+            scoreMean += prob * score
+            scoreSquaresMean += prob * score ** 2
+    return scoreMean, scoreSquaresMean
+    
+def _numCombinations(n, k):
+    return math.factorial(n) // (math.factorial(k) * math.factorial(n - k))
+    
+def getSummaryScoreVariances(dataValues, workersToFilter, answerAggregationType, answerTieBreaker, noAnswerDefaultValue, numQuestionsPerSummary, numTurkersPerSummary, numIterations):
+    # Gets the variance of the score of each summary analytically, for the score computeScores gives: the average over numIterations
+    # iterations of getSystemSummaryScores, each using a sample (without replacement) of q out of the N questions of the summary, and for
+    # each question the aggregated answers of min(numTurkersPerSummary, n) of its n answers (all of them if n <= numTurkersPerSummary).
+    # The variance is over two independent sources:
+    #   - the crowd: had other turkers answered (the same number n of answers for each question, drawn at the question's observed rates
+    #     of answers), the average over infinitely many iterations would be the mean over the N questions of the questions' expected
+    #     aggregated scores over the turker samples (see getAnswerScoreDistributions with numUsed), with the variance:
+    #       sum(question crowd variances) / N^2
+    #   - the iterations: given the answers, the random sampling of each iteration varies the summary score by
+    #       (1 - q / N) * var(question expected scores) / q  +  mean(question turker sampling variances) / q
+    #     which the average over the iterations divides by numIterations
+    # The answers of different questions are taken as independent.
+    # Returns { eventId -> { summId -> variance } }.
+    summaryVariances = {} # { eventId -> { summId -> variance } }
+    for eventId in dataValues:
+        for summId in dataValues[eventId]:
+            # the answers to each question of the summary (without the filtered workers):
+            answersPerQuestion = {} # { questionId -> [answers] }
+            for solution in dataValues[eventId][summId]:
+                if solution['workerId'] in workersToFilter:
+                    continue
+                for questionId, answer in solution['answers'].items():
+                    answersPerQuestion.setdefault(questionId, []).append(answer)
+            if len(answersPerQuestion) == 0:
+                continue
+            
+            answerLists = list(answersPerQuestion.values())
+            numAnswers = np.array([len(answers) for answers in answerLists])
+            numAnswersUsed = np.minimum(numAnswers, numTurkersPerSummary)
+            presentCounts = np.array([answers.count(1.0) for answers in answerLists])
+            notPresentCounts = np.array([answers.count(0.0) for answers in answerLists])
+            
+            # the variance over the crowd of the questions' scores averaged over the iterations:
+            scores, scoreProbs = getAnswerScoreDistributions(presentCounts / numAnswers.astype(float), notPresentCounts / numAnswers.astype(float),
+                numAnswers, answerAggregationType, answerTieBreaker, noAnswerDefaultValue, numUsed=numAnswersUsed)
+            crowdVariances = np.maximum(scoreProbs.dot(scores ** 2) - scoreProbs.dot(scores) ** 2, 0.0)
+            
+            # the variance of a single iteration over its sampling of the questions and the turkers, given the answers:
+            questionMoments = np.array([_getSubsampleScoreMoments(presentCounts[i], notPresentCounts[i], numAnswers[i] - presentCounts[i] - notPresentCounts[i],
+                numAnswersUsed[i], answerAggregationType, answerTieBreaker, noAnswerDefaultValue) for i in range(len(answerLists))])
+            questionMeans = questionMoments[:, 0]
+            questionVariances = np.maximum(questionMoments[:, 1] - questionMeans ** 2, 0.0)
+            numQuestions = len(answerLists)
+            numQuestionsUsed = min(numQuestionsPerSummary, numQuestions)
+            questionSamplingVariance = (1.0 - numQuestionsUsed / float(numQuestions)) * np.var(questionMeans, ddof=1) / numQuestionsUsed if numQuestions > 1 else 0.0
+            iterationVariance = questionSamplingVariance + questionVariances.mean() / numQuestionsUsed
+            
+            summaryVariances.setdefault(eventId, {})[summId] = crowdVariances.sum() / numQuestions ** 2 + iterationVariance / max(numIterations, 1)
+    return summaryVariances
+    
+    
+
+def getRawData(inputBatchFile):
+    # get all the results from the MTurk batch results file:
+    questionIdsPerEvent = {} # { eventId -> [questionIds] }
+    rawDataValues = {} # { eventId -> { summId -> [{'workerId':<val> , 'answers':{questionId:<'p'/'n'/''>}}] } }
+    with open(inputBatchFile, mode='r') as inF:
+        csv_reader = csv.DictReader(inF)
+        for row in csv_reader:
+            questionIdList = ast.literal_eval(row['Input.qIdList'])
+    
+            # get the answers into a list, in order of the questionIdList (incremental index in the columns):
+            answers = {qId:row['Answer.S{}Answer'.format(qInd+1)] for qInd, qId in enumerate(questionIdList)}
+    
+            _addSolution(rawDataValues, questionIdsPerEvent, row['Input.eventId'], row['Input.summaryId'], row['WorkerId'], questionIdList, answers)
+    
+    return rawDataValues, questionIdsPerEvent
+
+def getRawDataFromJudgments(judgments):
+    # get all the results from in-memory judgments: rows of (eventId, summaryId, assignmentId, workerId, questionId, answer),
+    # or a DataFrame with the JUDGMENT_FIELDS columns (the answers of an assignment make up one solution, as a row of the AMT results file)
+    if hasattr(judgments, 'itertuples'):
+        judgments = judgments[JUDGMENT_FIELDS].itertuples(index=False)
+    
+    assignments = {} # { assignmentId -> (eventId, summId, workerId, [questionIds], {questionId:<'p'/'n'/''>}) }
+    assignmentIds = [] # in order of appearance
+    for eventId, summId, assignmentId, workerId, questionId, answer in judgments:
+        if assignmentId not in assignments:
+            assignments[assignmentId] = (eventId, summId, workerId, [], {})
+            assignmentIds.append(assignmentId)
+        assignments[assignmentId][3].append(questionId)
+        assignments[assignmentId][4][questionId] = _getRawAnswer(answer)
+    
+    questionIdsPerEvent = {} # { eventId -> [questionIds] }
+    rawDataValues = {} # { eventId -> { summId -> [{'workerId':<val> , 'answers':{questionId:<'p'/'n'/''>}}] } }
+    for assignmentId in assignmentIds:
+        eventId, summId, workerId, questionIdList, answers = assignments[assignmentId]
+        _addSolution(rawDataValues, questionIdsPerEvent, eventId, summId, workerId, questionIdList, answers)
+    
+    return rawDataValues, questionIdsPerEvent
+
+def _addSolution(rawDataValues, questionIdsPerEvent, eventId, summId, workerId, questionIdList, answers):
+    # if there was no questions list added for this event yet:
+    if not eventId in questionIdsPerEvent:
+        questionIdsPerEvent[eventId] = questionIdList
+    
+    # if there's already a questions list for this event, and it doesn't contain the current list:
+    elif not set(questionIdList) <= set(questionIdsPerEvent[eventId]):
+        questionIdsPerEvent[eventId].extend(questionIdList) # extend the new list of questions
+    
+    rawDataValues.setdefault(eventId, {}).setdefault(summId, []).append({'workerId':workerId, 'answers':answers})
+
+def _getRawAnswer(answer):
+    # the raw value ('p'/'n'/'') of an in-memory answer:
+    if answer is None or answer == '' or (isinstance(answer, float) and answer != answer): # None, '' or NaN
+        return ''
+    if answer in ('p', 'n'):
+        return answer
+    return 'p' if float(answer) == 1.0 else 'n'
+
+
+def mapValues(rawDataValues, noAnswerDefaultValue):
+    # Maps the raw data to values for use, also according to the configuration given.
+    # Returns { eventId -> { summId -> [{'workerId':<val> , 'answers':{qId:<0/1>}}] } }.
+    
+    # the inner function to map a raw value to a processable value:
+    def mapFunc(sourceVal):
+        if sourceVal == 'p':
+            return 1.0
+        elif sourceVal == 'n':
+            return 0.0
+        elif sourceVal == '':
+            return noAnswerDefaultValue
+    
+    # fully copy the raw data:
+    mappedValues = copy.deepcopy(rawDataValues) # { eventId -> { summId -> [{'workerId':<val> , 'answers':{qId:<0/1>}}] } }
+    for eventId in mappedValues:
+        for summId in mappedValues[eventId]:
+            for solution in mappedValues[eventId][summId]:
+                for qId in solution['answers']:
+                    # replace the raw value to the new value:
+                    solution['answers'][qId] = mapFunc(solution['answers'][qId])
+    
+    return mappedValues
+    
+def getWorkersToFilter(dataValues, questionIdsPerEvent, workerAgreementThreshold, numFilteringIteration, printToScreen=False):
+    # Gets a list of workerIDs to ignore due to low agreement with others.
+    
+    workersToFilter = []
+    
+    for iter in range(numFilteringIteration):
+        # measure the worker agreements:
+        workerAgreements, workerAssignmentsCount = _measureWorkerAgreement(dataValues, questionIdsPerEvent, workersToFilter)
+        if printToScreen:
+            for workerId in workerAgreements:
+                print('{}\t{}\t{}'.format(workerId, workerAgreements[workerId], workerAssignmentsCount[workerId]))
+            
+        # get the workers to filter due to low agreement scores:
+        workersToFilter = _filterWorkersByAgreement(workerAgreements, workerAssignmentsCount, workerAgreementThreshold)
+        if printToScreen:
+            for workerId in workersToFilter:
+                print('Filtered: {}\t{}\t{}'.format(workerId, workerAgreements[workerId], workerAssignmentsCount[workerId]))
+        
+    return workersToFilter
+                    
+def _measureWorkerAgreement(dataValues, questionIdsPerEvent, workerIgnoreList):
+    # Gets the agreement scores of each worker.
+    # Returns workerAgreements {workerId -> overall agreement score} and workerAssignmentsCount {workerId -> # of assignments done}.
+        
+    def calculateAgreement(list1, list2):
+        # get the percentage agreement between the two answer lists:
+        seqenceObj = difflib.SequenceMatcher(None, answers_i, answers_j)
+        agreementScore = seqenceObj.ratio()
+        return agreementScore
+    
+    workerAgreementDict = {} # workerId -> [<agreement values>]
+    workerAssignmentsCount = {} # workerId -> # of assignments done
+    
+    for eventId in dataValues:
+        for summId in dataValues[eventId]:
+            
+            # in the summary, there are several solutions, so go over each pair of solutions (questionnaires) and measure agreement:
+            for i in range(len(dataValues[eventId][summId])):
+                
+                solution_i = dataValues[eventId][summId][i] # i_th solution of the current summary
+                workerId_i = solution_i['workerId']
+                
+                # check whether to ignore this worker:
+                if workerId_i in workerIgnoreList:
+                    continue
+                
+                questionIds = solution_i['answers'].keys()
+                answers_i = [solution_i['answers'][qId] for qId in questionIds]
+                
+                for j in range(i+1, len(dataValues[eventId][summId])):
+                    solution_j = dataValues[eventId][summId][j] # j_th solution of the current summary
+                    workerId_j = solution_j['workerId']
+                    
+                    # check whether to ignore this worker:
+                    if workerId_j in workerIgnoreList:
+                        continue
+                        
+                    # if the two solutions (assignments) have the same question ID sets, 
+                    #   measure the agreement between the two annotators:
+                    if set(solution_i['answers'].keys()) == set(solution_j['answers'].keys()):
+                        answers_j = [solution_j['answers'][qId] for qId in questionIds]
+                        
+                        agreementScore = calculateAgreement(answers_i, answers_j)
+                
+                        # add the agreement score to each of the workers:
+                        workerAgreementDict.setdefault(workerId_i, []).append(agreementScore)
+                        workerAgreementDict.setdefault(workerId_j, []).append(agreementScore)
+                        
+                # keep count of the number of assignments done by the worker:
+                workerAssignmentsCount[workerId_i] = workerAssignmentsCount.get(workerId_i, 0) + 1
+    
+    # calculate the average agreement accuracy for each worker:
+    workerAgreements = {} # workerId -> overall agreement score
+    for workerId in workerAgreementDict:
+        workerAgreements[workerId] = round(reduce(lambda x, y: x + y, workerAgreementDict[workerId]) / len(workerAgreementDict[workerId]), 3)
+        
+    return workerAgreements, workerAssignmentsCount
+    
+    
+def _filterWorkersByAgreement(workerAgreements, workerAssignmentsCount, workerAgreementThreshold):
+    return [workerId for workerId in workerAgreements if workerAgreements[workerId] < workerAgreementThreshold]
+    
+
+def getEventsToFilter(dataValues, workersToFilter, percentEventsToFilter, printToScreen=False):
+    # Gets a list of events to filter (percentEventsToFilter), ordered from highest disagreeing to least.
+    
+    # measure the event agreements:
+    eventAgreements = _measureEventAgreement(dataValues, workersToFilter)
+    if printToScreen:
+        for eventId in eventAgreements:
+            print('{}\t{}'.format(eventId, eventAgreements[eventId]))
+        
+    # get the events to filter due to low agreement scores:
+    eventsToFilter = _filterEventsByAgreement(eventAgreements, percentEventsToFilter)
+    if printToScreen:
+        for eventId in eventsToFilter:
+            print('Filtered: {}\t{}'.format(eventId, eventAgreements[eventId]))
+    
+    return eventsToFilter
+    
+def _measureEventAgreement(dataValues, workersToFilter):
+    MISSING_VALUE_CHAR = '*' # the character signaling an ungiven answer
+    
+    def calculateAgreement(list2d):
+        return krippendorff_alpha(list2d, convert_items=str, missing_items=[MISSING_VALUE_CHAR])
+    
+    eventAgreementDict = {} # eventId -> [<agreement values over systems summaries>]
+    
+    for eventId in dataValues:
+        currentEventAgreementScores = []
+        for summId in dataValues[eventId]:
+            allAnswers = {} # { questionSet -> [<list of q/a dictionaries>] }
+            # in the summary, there are several solutions, so go over each pair of solutions (questionnaires) and measure agreement:
+            for i in range(len(dataValues[eventId][summId])):
+                solution_i = dataValues[eventId][summId][i] # i_th solution of the current summary
+                worker_i = solution_i['workerId']
+                if worker_i in workersToFilter:
+                    continue
+                questionIdsStr = str(solution_i['answers'].keys()) # a string to represent the question set (2 per summary)
+                qaDictCopy = {qId : answer if answer != '' else MISSING_VALUE_CHAR for qId, answer in solution_i['answers'].items()} # replace '' with '*'
+                allAnswers.setdefault(questionIdsStr, []).append(qaDictCopy)
+                
+            # for each question set of this summary, get the agreement score (only if there are at least two workers to compare,
+            # e.g. not for the question sets of the single pseudo-worker of pre_filterByLexicalOverlap.py):
+            for qSet in allAnswers:
+                if len(allAnswers[qSet]) < 2:
+                    continue
+                agreementScore = calculateAgreement(allAnswers[qSet])
+                currentEventAgreementScores.append(agreementScore)
+        
+        # keep the average agreement score (events without any question set to compare are not measured, so never filtered):
+        if len(currentEventAgreementScores) > 0:
+            eventAgreementDict[eventId] = reduce(lambda x,y:x+y, currentEventAgreementScores) / len(currentEventAgreementScores)
+                
+    
+    ## calculate the average agreement accuracy for each event:
+    #eventAgreements = {} # eventId -> overall agreement score
+    #for eventId in eventAgreementDict:
+    #    eventAgreements[eventId] = round(reduce(lambda x, y: x + y, eventAgreementDict[eventId]) / len(eventAgreementDict[eventId]), 3)
+        
+    return eventAgreementDict
+
+def _filterEventsByAgreement(eventAgreements, percentEventsToFilter, baseEventIds=None):
+    # if needed, prepare a list of eventIds to use according to the base list given:
+    if baseEventIds == None:
+        baseEventAgreements = eventAgreements
+    else:
+        baseEventAgreements = {evId:agr for evId, agr in eventAgreements.items() if evId in baseEventIds}
+        
+    # sort the events by agreement:
+    sortedByAgreement = sorted(baseEventAgreements.items(), key=operator.itemgetter(1))
+    # get the number of events to leave out:
+    numEventsToFilter = int(float(len(baseEventAgreements)) * percentEventsToFilter)
+    # get the evemts to leave out (lowest agreement scores):
+    eventIdsToFilter = [eventId for eventId, _ in sortedByAgreement[0:numEventsToFilter]]
+    
+    return eventIdsToFilter
+    
+
+class ScoringStages(object):
+    # The stages of the scoring that come before the iterations, each declared with the stages (or base inputs) and the configuration
+    # parameters it needs. A stage is computed only when it is requested (by the caller or by a stage that needs it), and is memoized for
+    # its configuration parameters (and those of the stages it needs), so configurations that share them reuse it.
+    # The stages can be requested from several threads (e.g. by scoringServer.py).
+    # { stageName -> (function, [input stage / base input names], [configuration parameter names]) }
+    STAGES = {
+        'dataValues': (mapValues, ['rawDataValues'], ['NO_ANSWER_DEFAULT']),
+        'workersToFilter': (getWorkersToFilter, ['dataValues', 'questionIdsPerEvent'], ['WORKER_AGREEMENT_THRESHOLD', 'AGREEMENT_FILTERING_ITERATIONS']),
+        'eventAgreements': (_measureEventAgreement, ['rawDataValues', 'workersToFilter'], []),
+    }
+    
+    def __init__(self, rawDataValues, questionIdsPerEvent):
+        self.baseInputs = {'rawDataValues': rawDataValues, 'questionIdsPerEvent': questionIdsPerEvent}
+        self.values = {} # { (stageName, <configuration key>) -> value }
+        self.lock = threading.RLock()
+        
+    def get(self, stageName, configuration):
+        # Get the value of the stage for the configuration (computed now if needed).
+        key = (stageName, self._getConfigurationKey(stageName, configuration))
+        with self.lock:
+            if key not in self.values:
+                function, inputNames, parameterNames = self.STAGES[stageName]
+                inputs = [self.get(inputName, configuration) if inputName in self.STAGES else self.baseInputs[inputName] for inputName in inputNames]
+                self.values[key] = function(*(inputs + [configuration[parameterName] for parameterName in parameterNames]))
+            return self.values[key]
+        
+    def _getConfigurationKey(self, stageName, configuration):
+        # the values of the configuration parameters the stage depends on (directly or through its input stages):
+        _, inputNames, parameterNames = self.STAGES[stageName]
+        return tuple(configuration[parameterName] for parameterName in parameterNames) + \
+            tuple(self._getConfigurationKey(inputName, configuration) for inputName in inputNames if inputName in self.STAGES)
+    
+    
+class SubsetSampler(object):
+    # A replacement of the random module's sample function for getSystemSummaryScores, that reseeds at the start of each
+    # iteration (for common random numbers over configurations) and/or mirrors the draws of paired iterations (antithetic sampling).
+    
+    def __init__(self, seed=None, antithetic=False):
+        self.seed = seed
+        self.antithetic = antithetic
+        self.random = random.Random(seed)
+        self.mirrored = False
+        
+    def startIteration(self, iterationNum):
+        if self.antithetic and iterationNum % 2 == 1:
+            # the second iteration of an antithetic pair replays the random stream of the first one, mirrored:
+            self.random.setstate(self.pairState)
+            self.mirrored = True
+            return
+        if self.seed is not None:
+            self.random.seed(hash((self.seed, iterationNum)))
+        else:
+            self.random.seed(random.getrandbits(64))
+        self.pairState = self.random.getstate()
+        self.mirrored = False
+        
+    def sample(self, population, k):
+        population = list(population)
+        if not self.antithetic:
+            return self.random.sample(population, k)
+        # take the k items with the smallest random keys (u), or with the smallest mirrored keys (1-u) in the mirrored iteration:
+        keys = [self.random.random() for _ in population]
+        if self.mirrored:
+            keys = [1.0 - key for key in keys]
+        order = sorted(range(len(population)), key=keys.__getitem__)
+        return [population[i] for i in order[:k]]
+    
+    
+# Print iterations progress
+def _printProgressBar (iteration, total, prefix = '', suffix = '', decimals = 1, length = 100, fill = '$'):
+    """
+    Call in a loop to create terminal progress bar
+    @params:
+        iteration   - Required  : current iteration (Int)
+        total       - Required  : total iterations (Int)
+        prefix      - Optional  : prefix string (Str)
+        suffix      - Optional  : suffix string (Str)
+        decimals    - Optional  : positive number of decimals in percent complete (Int)
+        length      - Optional  : character length of bar (Int)
+        fill        - Optional  : bar fill character (Str)
+    """
+    percent = ("{0:." + str(decimals) + "f}").format(100 * (iteration / float(total)))
+    filledLength = int(length * iteration // total)
+    bar = fill * filledLength + '-' * (length - filledLength)
+    sys.stdout.write('\r{} |{}| {}% {}'.format(prefix, bar, percent, suffix))
+    # Print New Line on Complete
+    if iteration == total: 
+        print()
+
+### krippendorff_alpha START ###
+
+def nominal_metric(a, b):
+    return a != b
+
+
+def interval_metric(a, b):
+    return (a-b)**2
+
+
+def ratio_metric(a, b):
+    return ((a-b)/(a+b))**2
+
+
+def krippendorff_alpha(data, metric=nominal_metric, force_vecmath=False, convert_items=float, missing_items=None):
+    '''
+    From: https://github.com/grrrr/krippendorff-alpha
+    Calculate Krippendorff's alpha (inter-rater reliability):
+    
+    data is in the format
+    [
+        {unit1:value, unit2:value, ...},  # coder 1
+        {unit1:value, unit3:value, ...},   # coder 2
+        ...                            # more coders
+    ]
+    or 
+    it is a sequence of (masked) sequences (list, numpy.array, numpy.ma.array, e.g.) with rows corresponding to coders and columns to items
+    
+    metric: function calculating the pairwise distance
+    force_vecmath: force vector math for custom metrics (numpy required)
+    convert_items: function for the type conversion of items (default: float)
+    missing_items: indicator for missing items (default: None)
+    '''
+    
+    # number of coders
+    m = len(data)
+    
+    # set of constants identifying missing values
+    if missing_items is None:
+        maskitems = []
+    else:
+        maskitems = list(missing_items)
+    if np is not None:
+        maskitems.append(np.ma.masked_singleton)
+    
+    # convert input data to a dict of items
+    units = {}
+    for d in data:
+        try:
+            # try if d behaves as a dict
+            diter = d.items()
+        except AttributeError:
+            # sequence assumed for d
+            diter = enumerate(d)
+            
+        for it, g in diter:
+            if g not in maskitems:
+                try:
+                    its = units[it]
+                except KeyError:
+                    its = []
+                    units[it] = its
+                its.append(convert_items(g))
+
+
+    units = dict((it, d) for it, d in units.items() if len(d) > 1)  # units with pairable values
+    n = sum(len(pv) for pv in units.values())  # number of pairable values
+    
+    if n == 0:
+        raise ValueError("No items to compare.")
+    
+    np_metric = (np is not None) and ((metric in (interval_metric, nominal_metric, ratio_metric)) or force_vecmath)
+    
+    Do = 0.
+    for grades in units.values():
+        if np_metric:
+            gr = np.asarray(grades)
+            Du = sum(np.sum(metric(gr, gri)) for gri in gr)
+        else:
+            Du = sum(metric(gi, gj) for gi in grades for gj in grades)
+        Do += Du/float(len(grades)-1)
+    Do /= float(n)
+    
+    if Do == 0:
+        return 1.
+    
+    De = 0.
+    for g1 in units.values():
+        if np_metric:
+            d1 = np.asarray(g1)
+            for g2 in units.values():
+                De += sum(np.sum(metric(d1, gj)) for gj in g2)
+        else:
+            for g2 in units.values():
+                De += sum(metric(gi, gj) for gi in g1 for gj in g2)
+    De /= float(n*(n-1))
+    
+    return 1.-Do/De if (Do and De) else 1.
+    
+### krippendorff_alpha END ###
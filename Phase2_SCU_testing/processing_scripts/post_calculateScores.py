@@ -1,28 +1,39 @@
 import sys
 import csv
-import ast
-from collections import Counter
-import copy
-import difflib
 from scipy.stats import pearsonr
 from scipy.stats import spearmanr
+from scipy.stats import rankdata
+from scipy.stats import t as tDistribution
 import random
 import time
-import operator
 import numpy as np
+import os
+import itertools
+from functools import reduce
+from litePyramidScoring import getRawData, getSystemSummaryScores, getSystemScores, ScoringStages, SubsetSampler, getAnswerScoreDistributions, _printProgressBar
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'score_extraction'))
+from computeRougeScores import computeRougeScores
+from scoreStore import ScoreStore
 
 '''
 This script get scores and correlations of systems according to the Lite-Pyramid evaluation method, based on
 crowdsourced SCU judgments.
-Run: python post_calculateScores.py [-scores|-corr]
-    -scores outputs only the scores to the output file
-    -corr   also outputs the correlation of the scores to original Pyramid, as well as Responsiveness and ROUGE to Pyramid
+Run: python post_calculateScores.py [-scores|-corr|-stability|-budget|-signif]
+    -scores     outputs only the scores to the output file
+    -corr       also outputs the correlation of the scores to original Pyramid, as well as Responsiveness and ROUGE to Pyramid
+    -stability  outputs how stable the system rankings are as a function of the number of events (see the stability options below)
+    -budget     outputs the expected correlation to Pyramid and the crowdsourcing cost for each number of turkers, questions
+                and events (see the budget options below)
+    -signif     outputs which systems are significantly better than which, with a paired bootstrap test over events, SCUs and
+                workers, and a ranking of the systems into clusters of not significantly different systems (see the significance options below)
     default is scores
     
 Provide the input and output files, and the configuration in the variables below.
 
 Since this task is run twice (one for each 16-SCU batch), combine the two AMT downloaded results files, and run
 this script on the combined AMT file (don't copy the header line from one file to the other).
+
+The scoring itself is in litePyramidScoring.py (shared with post_calculateScores_newSystem.py).
 '''
 
 
@@ -130,6 +141,30 @@ When getting correlations, the fields are:
     pPvalRL
     sCorrRL
     sPvalRL
+    pWilliamsResp               the p-value of Williams' test for the difference between the Pearson correlation of our scores to Pyramid
+                                and that of Responsiveness (both on the system scores averaged over the iterations)
+    pPermResp                   the p-value of a permutation test for the same difference
+    sPermResp                   the p-value of a permutation test for the difference between the Spearman correlations
+    pWilliamsR1                 (and so on for ROUGE-1, ROUGE-2 and ROUGE-L)
+    pPermR1
+    sPermR1
+    pWilliamsR2
+    pPermR2
+    sPermR2
+    pWilliamsRL
+    pPermRL
+    sPermRL
+    kendallTau                  the mean (and std) over the iterations of the Kendall tau-b correlation of our system scores to Pyramid
+    kendallTauStd
+    pairwiseAcc                 the mean over the iterations of the portion of the system pairs (not tied in Pyramid) that our scores order as Pyramid does
+    kCorrResp                   the mean Kendall tau-b correlation of Responsiveness to Pyramid
+    pairAccResp                 the mean pairwise accuracy of Responsiveness to Pyramid
+    kCorrR1                     (and so on for ROUGE-1, ROUGE-2 and ROUGE-L)
+    pairAccR1
+    kCorrR2
+    pairAccR2
+    kCorrRL
+    pairAccRL
 When getting just scores, the fields are:
     ANSWER_AGGREGATION_TYPE
     ANSWER_TIE_BREAKER
@@ -141,6 +176,47 @@ When getting just scores, the fields are:
     AGREEMENT_FILTERING_ITERATIONS
     rankOrig
     rankOurs
+When getting the ranking stability, the fields are (one line per configuration and number of events):
+    ANSWER_AGGREGATION_TYPE
+    ANSWER_TIE_BREAKER
+    NO_ANSWER_DEFAULT
+    NUM_TURKERS_PER_SUMMARY
+    NUM_QUESTIONS_PER_SUMMARY
+    WORKER_AGREEMENT_THRESHOLD
+    AGREEMENT_FILTERING_ITERATIONS
+    EVENT_FILTER_PERCENT
+    numEvents                   the number of events in each subset
+    numSubsets
+    pearsonCorr                 the mean (and std) over the subsets of the correlation of our system scores to Pyramid on the same events
+    pearsonCorrStd
+    spearmanCorr
+    spearmanCorrStd
+    spearmanToAllEventsOurs     the mean Spearman correlation of our system scores on the subset to our scores on all events
+    spearmanToAllEventsOrig     the same for the original Pyramid scores
+    pairFlipsToAllEventsOurs    the mean portion of system pairs ranked in the opposite order than on all events
+    pairFlipsToAllEventsOrig    the same for the original Pyramid scores
+    pairFlipsToOrig             the mean portion of system pairs ranked in the opposite order by our scores and Pyramid on the subset
+When planning the budget, the fields are (one line per configuration and number of turkers, questions and events):
+    ANSWER_AGGREGATION_TYPE
+    ANSWER_TIE_BREAKER
+    NO_ANSWER_DEFAULT
+    WORKER_AGREEMENT_THRESHOLD
+    AGREEMENT_FILTERING_ITERATIONS
+    numTurkers
+    numQuestions
+    numEvents
+    pearsonCorr                 the mean (and variance) over the resamples of the correlation of our system scores to Pyramid
+    pearsonCorrVar
+    spearmanCorr
+    spearmanCorrVar
+    costPerSystem               the crowdsourcing cost in dollars of evaluating one system this way
+    totalCost                   the cost of evaluating all the systems in the results file this way
+When testing significance, the fields are (one line per system, from the best score to the worst, for the first value of each configuration option):
+    systemId
+    score                       the Lite-Pyramid score of the system (expected over the sampling of the workers)
+    cluster                     the significance cluster of the system (1 for the best systems)
+    rankRange                   the best and worst ranks the system can have given the significant differences (e.g. 2-4)
+    <systemId>                  a column per system, with the p-value of the difference between the scores of the two systems
 '''
 OUTPUT_FILE = '' # e.g. 'results.csv'
 '''
@@ -151,6 +227,20 @@ MANUAL_SCORES_FILE = '' # e.g. '../score_extraction/2006ManualScoresAvg.csv'
 The path to the CSV file with the original automatic scores as created by the getRougeScores.py script.
 '''
 ROUGE_SCORES_FILE = '' # e.g. '../score_extraction/2006RougeScoresAvg.csv'
+'''
+Instead of the ROUGE_SCORES_FILE, the ROUGE scores can be computed in-package (with computeRougeScores.py) from the
+system summaries and reference summaries folders. Leave empty to use the ROUGE_SCORES_FILE.
+'''
+ROUGE_PEERS_FOLDER = '' # e.g. '../../../DUC_data/2006/NISTeval/ROUGE/peers'
+ROUGE_MODELS_FOLDER = '' # e.g. '../../../DUC_data/2006/NISTeval/ROUGE/models'
+'''
+Instead of the MANUAL_SCORES_FILE and ROUGE_SCORES_FILE, the original scores can be read from a score store file created with
+scoreStore.py, with the name of the dataset in it. Leave empty to use the scores files. The score store file is only read (ROUGE scores
+computed from the ROUGE_PEERS_FOLDER and ROUGE_MODELS_FOLDER are used instead of its ROUGE scores, without adding them to it; to keep
+them in the store file, load them with scoreStore.py).
+'''
+SCORE_STORE_FILE = '' # e.g. '../score_extraction/scores.db'
+SCORE_STORE_DATASET = '' # e.g. '2006'
 
 
 ### Configuration options:
@@ -175,9 +265,52 @@ AGREEMENT_FILTERING_ITERATIONS = [1] #[1, 2, 3]
 EVENT_FILTER_PERCENT = [0.0] # [0.0, 0.2]
 # How many times should each configuration be tested and then averaged:
 NUM_ITERATION_ON_CONFIGURATION = 70
+# Whether to use the same random draws (of events, questions and workers) in iteration i of every configuration (common random numbers),
+# so that the differences between configurations that differ only in ANSWER_AGGREGATION_TYPE, ANSWER_TIE_BREAKER or NO_ANSWER_DEFAULT
+# are not hidden by sampling noise. The draws are the same as long as the same workers are filtered in both configurations.
+COMMON_RANDOM_NUMBERS = False
+RANDOM_SEED = 0 # the seed of the common random numbers
+# Whether to pair the iterations with antithetic draws: every odd iteration takes the subsets "opposite" to those of the iteration
+# before it (sampled by 1-u instead of u), which reduces the variance of the averages over the iterations (use an even number of iterations).
+ANTITHETIC_SAMPLING = False
+
+### Correlation comparison options (for -corr):
+# The number of permutations in the tests of the difference between our correlation to Pyramid and that of each original method:
+CORRELATION_TEST_NUM_PERMUTATIONS = 10000
+
+### Stability analysis options (for -stability, where NUM_EVENTS_TO_USE is not used):
+# The numbers of events in the subsets of events on which to compare system rankings:
+STABILITY_SUBSET_SIZES = [] # e.g. [2, 4, 6, 8, 10, 15, 20] (empty for all sizes from 2 to the number of events)
+# The number of random event subsets to draw for each subset size:
+STABILITY_NUM_SUBSETS = 1000
 
+### Budget planning options (for -budget, instead of NUM_TURKERS_PER_SUMMARY, NUM_QUESTIONS_PER_SUMMARY, NUM_EVENTS_TO_USE and EVENT_FILTER_PERCENT):
+# The numbers of turkers per summary, questions per summary and events to evaluate on (all their combinations are evaluated):
+BUDGET_NUM_TURKERS = [1, 3, 5]
+BUDGET_NUM_QUESTIONS = [16, 24, 32]
+BUDGET_NUM_EVENTS = [16, 18, 20]
+# The number of resamples of the judgments (all the grid points are evaluated on each resample):
+BUDGET_NUM_RESAMPLES = 200
+# The payment of an assignment (HIT) on AMT, the number of statements in a HIT, and the AMT fee on top of the payment:
+BUDGET_REWARD_PER_ASSIGNMENT = 0.45
+BUDGET_STATEMENTS_PER_HIT = 16
+BUDGET_AMT_FEE = 0.2
 
-def computeScoresAndCorrelations(rawDataValues, questionIdsPerEvent, systemScoresAllOrig, configuration, onlyScores=True):
+### Significance testing options (for -signif, instead of NUM_QUESTIONS_PER_SUMMARY, NUM_EVENTS_TO_USE and EVENT_FILTER_PERCENT):
+# The number of bootstrap resamples (each resamples the events, the SCUs of each event and the workers of each question, with replacement):
+SIGNIFICANCE_NUM_RESAMPLES = 10000
+# The p-value below which the difference between two systems is significant:
+SIGNIFICANCE_LEVEL = 0.05
+# The maximal number of array values (8 bytes each) kept at once for the resamples computed together in one block (bounds the memory used):
+SIGNIFICANCE_MAX_BLOCK_VALUES = 50000000
+
+
+# the score store metric of each type of original score:
+ORIGINAL_SCORE_METRICS = {'pyr': 'pyramid', 'resp': 'responsiveness', 'r1': 'ROUGE-1 recall', 'r2': 'ROUGE-2 recall', 'rL': 'ROUGE-L recall'}
+
+
+def computeScoresAndCorrelations(rawDataValues, questionIdsPerEvent, systemScoresAllOrig, configuration, onlyScores=True, stages=None):
+    # The stages before the iterations are taken from the given ScoringStages (shared over configurations), if any.
     # correlations between pyramid and our method (lists over iterations)
     pearsonCorrsAll = [] # [pCorr to pyr] for our method
     pearsonPValuesAll = [] # [pPval to pyr] for our method
@@ -186,6 +319,9 @@ def computeScoresAndCorrelations(rawDataValues, questionIdsPerEvent, systemScore
     # the actual scores using our method (lists over events used)
     systemScoresOursAll = {} # { systemId -> [our scores over events] }
     systemScoresOriginalAll = {} # { systemId -> [pyramid scores over events] }
+    systemScoresOtherOrigAll = {'resp':{},'r1':{},'r2':{},'rL':{}} # { <'resp'/'r1'/'r2'/'rL'> -> { systemId -> [scores over iterations] } }
+    # the system scores of each iteration, for the rank correlations (computed for all the iterations at once):
+    systemScoresPerIteration = [] # [(our scores, { <'pyr'/'resp'/'r1'/'r2'/'rL'> -> original scores })]
     
     # correlations between pyramid and other original methods (lists over iterations):
     pearsonCorrsOrigAll = {'resp':[],'r1':[],'r2':[],'rL':[]} # { <'resp'/'r1'/'r2'/'rL'> -> [pCorr to pyr] }
@@ -194,24 +330,26 @@ def computeScoresAndCorrelations(rawDataValues, questionIdsPerEvent, systemScore
     spearmanPValuesOrigAll = {'resp':[],'r1':[],'r2':[],'rL':[]} # { <'resp'/'r1'/'r2'/'rL'> -> [sPval to pyr] }
     
     
+    if stages is None:
+        stages = ScoringStages(rawDataValues, questionIdsPerEvent)
+    
     # get the data in a mapped-value format (dependent on some configuration parameters):
-    dataValues = mapValues(
-        rawDataValues,
-        configuration['NO_ANSWER_DEFAULT'])
+    dataValues = stages.get('dataValues', configuration)
     
     # get a list of workers to disregard during scoring:
-    workersToFilter = getWorkersToFilter(
-        dataValues,
-        questionIdsPerEvent,
-        configuration['WORKER_AGREEMENT_THRESHOLD'],
-        configuration['AGREEMENT_FILTERING_ITERATIONS'])
+    workersToFilter = stages.get('workersToFilter', configuration)
         
-    # get the event agreement scores list in case needed:
-    eventAgreements = _measureEventAgreement(rawDataValues, workersToFilter)
+    # get the event agreement scores only if events are filtered by agreement:
+    eventAgreements = stages.get('eventAgreements', configuration) if configuration['EVENT_FILTER_PERCENT'] > 0 else None
+    
     
+    # the random draws of the iterations (shared with the other configurations and/or antithetic if needed):
+    rng = getIterationSampler()
     
     # run several iterations on the current configuration to get an average (since there's randomization):
     for i in range(configuration['NUM_ITERATION_ON_CONFIGURATION']):
+        if rng is not random:
+            rng.startIteration(i)
         
         # get a list of events to disregard during scoring:
         #eventsToFilter = getEventsToFilter(
@@ -232,7 +370,8 @@ def computeScoresAndCorrelations(rawDataValues, questionIdsPerEvent, systemScore
             configuration['NUM_TURKERS_PER_SUMMARY'],
             configuration['NUM_EVENTS_TO_USE'],
             eventAgreements,
-            configuration['EVENT_FILTER_PERCENT'])
+            configuration['EVENT_FILTER_PERCENT'],
+            rng)
             
         # for debugging - print the scores per topic:
         #printAverageEventScores(summaryScores)
@@ -246,6 +385,9 @@ def computeScoresAndCorrelations(rawDataValues, questionIdsPerEvent, systemScore
         systemScoresOrig = getOriginalScores(systemScoresAllOrig, eventIdsUsedPerSystem)
         for systemId in systemScoresOrig['pyr']:
             systemScoresOriginalAll.setdefault(systemId, []).append(systemScoresOrig['pyr'][systemId])
+            if not onlyScores:
+                for method in ['resp', 'r1', 'r2', 'rL']:
+                    systemScoresOtherOrigAll[method].setdefault(systemId, []).append(systemScoresOrig[method][systemId])
         
         # if we also need to get correlations:
         if not onlyScores:
@@ -256,6 +398,8 @@ def computeScoresAndCorrelations(rawDataValues, questionIdsPerEvent, systemScore
             # also get the correlations between the pyramid method and the other original evaluation methods:
             correlationsBetweenOriginals = getCorrelationsBetweenOriginalScores(systemScoresOrig)
             
+            systemScoresPerIteration.append((systemScoresOurs, systemScoresOrig))
+            
             # append our correlations for the current iteration:
             pearsonCorrsAll.append(pearsonCorrOurs)
             pearsonPValuesAll.append(pearsonPValueOurs)
@@ -298,13 +442,574 @@ def computeScoresAndCorrelations(rawDataValues, questionIdsPerEvent, systemScore
             pearsonPValueOrigFinal[method] = reduce(lambda x, y: x + y, pearsonPValuesOrigAll[method]) / len(pearsonPValuesOrigAll[method])
             spearmanCorrOrigFinal[method] = reduce(lambda x, y: x + y, spearmanCorrsOrigAll[method]) / len(spearmanCorrsOrigAll[method])
             spearmanPValueOrigFinal[method] = reduce(lambda x, y: x + y, spearmanPValuesOrigAll[method]) / len(spearmanPValuesOrigAll[method])
+        
+        # test the differences between our correlation to Pyramid and those of the original methods, on the averaged system scores
+        # (with common random numbers, the same permutations for all the configurations):
+        systemIds = sorted(systemScoresOursFinal)
+        correlationTests = getCorrelationDifferenceTests(
+            np.array([systemScoresOriginalFinal[systemId] for systemId in systemIds]),
+            np.array([systemScoresOursFinal[systemId] for systemId in systemIds]),
+            np.array([[np.mean(systemScoresOtherOrigAll[method][systemId]) for systemId in systemIds] for method in ['resp', 'r1', 'r2', 'rL']]),
+            CORRELATION_TEST_NUM_PERMUTATIONS, getArrayRandomState())
+        correlationTestsFinal = {method: {testName: testPValues[methodIdx] for testName, testPValues in correlationTests.items()}
+            for methodIdx, method in enumerate(['resp', 'r1', 'r2', 'rL'])}
+        
+        # the Kendall tau and pairwise accuracy to Pyramid of our scores and the original methods' scores, in all the iterations at once
+        # (on the systems scored in all the iterations):
+        methods = ['ours', 'resp', 'r1', 'r2', 'rL']
+        systemIds = sorted(reduce(lambda x, y: x & y, [set(systemScoresOurs) for systemScoresOurs, _ in systemScoresPerIteration]))
+        pyrMatrix = np.array([[systemScoresOrig['pyr'][systemId] for systemId in systemIds] for _, systemScoresOrig in systemScoresPerIteration])
+        methodMatrices = [np.array([[(systemScoresOurs if method == 'ours' else systemScoresOrig[method])[systemId] for systemId in systemIds]
+            for systemScoresOurs, systemScoresOrig in systemScoresPerIteration]) for method in methods]
+        kendallTaus, pairwiseAccuracies = getKendallTauAndPairwiseAccuracy(np.tile(pyrMatrix, (len(methods), 1)), np.concatenate(methodMatrices))
+        kendallTaus = kendallTaus.reshape(len(methods), -1)
+        pairwiseAccuracies = pairwiseAccuracies.reshape(len(methods), -1)
+        rankCorrelationsFinal = {method: {'kendallTau': np.nanmean(kendallTaus[methodIdx]), 'kendallTauStd': np.nanstd(kendallTaus[methodIdx]),
+            'pairwiseAccuracy': np.nanmean(pairwiseAccuracies[methodIdx])} for methodIdx, method in enumerate(methods)}
     
         return pearsonCorrFinal, pearsonCorrFinalStd, pearsonPValueFinal, spearmanCorrFinal, spearmanCorrFinalStd, spearmanPValueFinal, \
             systemScoresOursFinal, systemScoresOriginalFinal, \
-            pearsonCorrOrigFinal, pearsonPValueOrigFinal, spearmanCorrOrigFinal, spearmanPValueOrigFinal
+            pearsonCorrOrigFinal, pearsonPValueOrigFinal, spearmanCorrOrigFinal, spearmanPValueOrigFinal, correlationTestsFinal, rankCorrelationsFinal
             
     else:
-        return None, None, None, None, None, None, systemScoresOursFinal, systemScoresOriginalFinal, None, None, None, None
+        return None, None, None, None, None, None, systemScoresOursFinal, systemScoresOriginalFinal, None, None, None, None, None, None
+    
+def getScoreMatrices(rawDataValues, questionIdsPerEvent, systemScoresAllOrig, configuration, stages=None):
+    # Get the matrices of our summary scores (averaged over the configuration's iterations) and the original Pyramid scores,
+    # with the systems as rows and the events as columns. Only the systems with scores on all the events are kept.
+    # Returns the systemIds, eventIds, our scores matrix and the original scores matrix.
+    
+    if stages is None:
+        stages = ScoringStages(rawDataValues, questionIdsPerEvent)
+    
+    # get the data in a mapped-value format (dependent on some configuration parameters):
+    dataValues = stages.get('dataValues', configuration)
+    
+    # get a list of workers to disregard during scoring:
+    workersToFilter = stages.get('workersToFilter', configuration)
+        
+    # get the event agreement scores only if events are filtered by agreement:
+    eventAgreements = stages.get('eventAgreements', configuration) if configuration['EVENT_FILTER_PERCENT'] > 0 else None
+    
+    # average the scores of each summary over the iterations, each time on all the events:
+    summaryScoresAll = {} # { systemId -> { eventId -> [scores over iterations] } }
+    rng = getIterationSampler()
+    for i in range(configuration['NUM_ITERATION_ON_CONFIGURATION']):
+        if rng is not random:
+            rng.startIteration(i)
+        summaryScores = getSystemSummaryScores(
+            dataValues,
+            workersToFilter,
+            questionIdsPerEvent,
+            configuration['ANSWER_AGGREGATION_TYPE'],
+            configuration['ANSWER_TIE_BREAKER'],
+            configuration['NUM_QUESTIONS_PER_SUMMARY'],
+            configuration['NUM_TURKERS_PER_SUMMARY'],
+            len(dataValues),
+            eventAgreements,
+            configuration['EVENT_FILTER_PERCENT'],
+            rng)
+        for eventId in summaryScores:
+            for summId in summaryScores[eventId]:
+                systemId = summId.split('.')[-1] # the last part of the summary name is the system ID (e.g. D0601.M.250.A.4)
+                summaryScoresAll.setdefault(systemId, {}).setdefault(eventId, []).append(summaryScores[eventId][summId])
+    
+    # keep the systems that have our and original scores on all the events:
+    eventIds = sorted(set(eventId for systemId in summaryScoresAll for eventId in summaryScoresAll[systemId]))
+    systemIds = sorted(systemId for systemId in summaryScoresAll
+        if all(eventId in summaryScoresAll[systemId] and eventId in systemScoresAllOrig['pyr'].get(systemId, {}) for eventId in eventIds))
+    if len(systemIds) < len(summaryScoresAll):
+        print('WARNING: Systems without scores on all events are left out: {}'.format(sorted(set(summaryScoresAll) - set(systemIds))))
+    
+    oursMatrix = np.array([[np.mean(summaryScoresAll[systemId][eventId]) for eventId in eventIds] for systemId in systemIds])
+    origMatrix = np.array([[systemScoresAllOrig['pyr'][systemId][eventId] for eventId in eventIds] for systemId in systemIds])
+    return systemIds, eventIds, oursMatrix, origMatrix
+    
+def getRankingStability(oursMatrix, origMatrix, subsetSizes, numSubsets, rng=np.random):
+    # Compare the system rankings on random subsets of events, of each size, to each other and to the rankings on all events.
+    # The subsets of a size are drawn together as an index matrix (numSubsets x size), and all the subsets' system scores,
+    # correlations and ranking flips are computed with array operations.
+    # Returns a list of { <field> -> value } per subset size (see the stability fields of the OUTPUT_FILE).
+    numEvents = oursMatrix.shape[1]
+    oursAllEvents = oursMatrix.mean(axis=1)
+    origAllEvents = origMatrix.mean(axis=1)
+    
+    stabilityPerSize = []
+    for subsetSize in subsetSizes:
+        # random subsets of event indices without repetition (the first columns of random permutations):
+        subsetIndices = np.argsort(rng.rand(numSubsets, numEvents), axis=1)[:, :subsetSize]
+        # the system scores on each subset (numSubsets x numSystems):
+        oursSubsets = oursMatrix[:, subsetIndices].mean(axis=2).T
+        origSubsets = origMatrix[:, subsetIndices].mean(axis=2).T
+        
+        pearsonCorrs = _rowPearson(oursSubsets, origSubsets)
+        spearmanCorrs = _rowPearson(_rowRanks(oursSubsets), _rowRanks(origSubsets))
+        stabilityPerSize.append({
+            'numEvents': subsetSize,
+            'numSubsets': numSubsets,
+            'pearsonCorr': np.nanmean(pearsonCorrs),
+            'pearsonCorrStd': np.nanstd(pearsonCorrs),
+            'spearmanCorr': np.nanmean(spearmanCorrs),
+            'spearmanCorrStd': np.nanstd(spearmanCorrs),
+            'spearmanToAllEventsOurs': np.nanmean(_rowPearson(_rowRanks(oursSubsets), _rowRanks(oursAllEvents[np.newaxis, :]))),
+            'spearmanToAllEventsOrig': np.nanmean(_rowPearson(_rowRanks(origSubsets), _rowRanks(origAllEvents[np.newaxis, :]))),
+            'pairFlipsToAllEventsOurs': np.mean(_pairFlips(oursSubsets, oursAllEvents[np.newaxis, :])),
+            'pairFlipsToAllEventsOrig': np.mean(_pairFlips(origSubsets, origAllEvents[np.newaxis, :])),
+            'pairFlipsToOrig': np.mean(_pairFlips(oursSubsets, origSubsets))})
+    return stabilityPerSize
+    
+def _rowPearson(scoresA, scoresB):
+    # the Pearson correlation between each row of scoresA and the corresponding row of scoresB (broadcast if one row):
+    centeredA = scoresA - scoresA.mean(axis=1, keepdims=True)
+    centeredB = scoresB - scoresB.mean(axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (centeredA * centeredB).sum(axis=1) / np.sqrt((centeredA ** 2).sum(axis=1) * (centeredB ** 2).sum(axis=1))
+    
+def _rowRanks(scores):
+    # the rank of each value within its row, with tied values getting the average of their ranks (as rankdata):
+    numRows, numColumns = scores.shape
+    order = np.argsort(scores, axis=1)
+    sortedScores = scores[np.arange(numRows)[:, np.newaxis], order]
+    # the first and last sorted positions of each position's run of tied values:
+    positions = np.tile(np.arange(numColumns), (numRows, 1))
+    isRunStart = np.ones((numRows, numColumns), dtype=bool)
+    isRunStart[:, 1:] = sortedScores[:, 1:] != sortedScores[:, :-1]
+    isRunEnd = np.ones((numRows, numColumns), dtype=bool)
+    isRunEnd[:, :-1] = isRunStart[:, 1:]
+    runStarts = np.maximum.accumulate(np.where(isRunStart, positions, 0), axis=1)
+    runEnds = np.minimum.accumulate(np.where(isRunEnd, positions, numColumns)[:, ::-1], axis=1)[:, ::-1]
+    ranks = np.empty((numRows, numColumns))
+    ranks[np.arange(numRows)[:, np.newaxis], order] = (runStarts + runEnds) / 2.0 + 1
+    return ranks
+    
+def _pairFlips(scoresA, scoresB):
+    # the portion of system pairs (not tied in scoresB) ordered differently in each row of scoresA than in scoresB (broadcast if one row):
+    signsA = np.sign(scoresA[:, :, np.newaxis] - scoresA[:, np.newaxis, :])
+    signsB = np.sign(scoresB[:, :, np.newaxis] - scoresB[:, np.newaxis, :])
+    upperPairs = np.triu(np.ones(signsA.shape[1:], dtype=bool), k=1)
+    comparedPairs = (signsB != 0) & upperPairs
+    numCompared = np.maximum(comparedPairs.sum(axis=(1, 2)), 1)
+    return ((signsA != signsB) & comparedPairs).sum(axis=(1, 2)) / numCompared.astype(float)
+    
+def getCorrelationDifferenceTests(pyrScores, oursScores, otherScores, numPermutations, rng=np.random):
+    # Test whether our system scores correlate to the Pyramid scores differently than each of the other methods' scores do
+    # (the two correlations are dependent: they share the Pyramid scores and are on the same systems).
+    # pyrScores and oursScores are [system] arrays and otherScores is a [method, system] array, all of the same systems.
+    # Returns { <'pWilliams'/'pPerm'/'sPerm'> -> [p-value per method] }, all two-sided:
+    #   pWilliams   Williams' t-test for the difference between the Pearson correlations
+    #   pPerm       a permutation test for the same difference: under the null hypothesis the (standardized) scores of our method
+    #               and of the other method are exchangeable for each system, so each permutation swaps them on a random subset
+    #               of the systems. All the permutations of all the methods are correlated at once as [method x permutation, system] rows.
+    #   sPerm       the same permutation test on the ranks, for the difference between the Spearman correlations
+    numMethods, numSystems = otherScores.shape
+    oursScores = oursScores[np.newaxis, :]
+    pyrScores = pyrScores[np.newaxis, :]
+    
+    # Williams' test:
+    corrOursPyr = _rowPearson(oursScores, pyrScores)
+    corrOtherPyr = _rowPearson(otherScores, pyrScores)
+    corrOursOther = _rowPearson(otherScores, oursScores)
+    determinant = 1 - corrOursPyr ** 2 - corrOtherPyr ** 2 - corrOursOther ** 2 + 2 * corrOursPyr * corrOtherPyr * corrOursOther
+    with np.errstate(invalid='ignore', divide='ignore'):
+        williamsT = (corrOursPyr - corrOtherPyr) * np.sqrt((numSystems - 1) * (1 + corrOursOther)) / \
+            np.sqrt(2 * determinant * (numSystems - 1) / float(numSystems - 3) + ((corrOursPyr + corrOtherPyr) ** 2 / 4) * (1 - corrOursOther) ** 3)
+    pValues = {'pWilliams': 2 * tDistribution.sf(np.abs(williamsT), numSystems - 3)}
+    
+    # the permutation tests (the same swaps for the Pearson and Spearman correlations, and for all the methods):
+    swaps = rng.rand(numPermutations, numSystems) < 0.5
+    rank = lambda scores: np.array([rankdata(row) for row in scores])
+    for testName, ours, other, pyr in [('pPerm', _standardizeRows(oursScores), _standardizeRows(otherScores), pyrScores),
+                                       ('sPerm', rank(oursScores), rank(otherScores), rank(pyrScores))]:
+        observedDiffs = _rowPearson(ours, pyr) - _rowPearson(other, pyr)
+        permutedOurs = np.where(swaps, other[:, np.newaxis, :], ours[:, np.newaxis, :]).reshape(-1, numSystems)
+        permutedOther = np.where(swaps, ours[:, np.newaxis, :], other[:, np.newaxis, :]).reshape(-1, numSystems)
+        permutedDiffs = (_rowPearson(permutedOurs, pyr) - _rowPearson(permutedOther, pyr)).reshape(numMethods, numPermutations)
+        numExtreme = (np.abs(permutedDiffs) >= np.abs(observedDiffs)[:, np.newaxis] - 1e-12).sum(axis=1)
+        pValues[testName] = (numExtreme + 1) / float(numPermutations + 1)
+    return pValues
+    
+def _standardizeRows(scores):
+    # the scores of each row with mean 0 and standard deviation 1 (only centered if constant):
+    stds = scores.std(axis=1, keepdims=True)
+    return (scores - scores.mean(axis=1, keepdims=True)) / np.where(stds > 0, stds, 1.0)
+    
+def getKendallTauAndPairwiseAccuracy(referenceScores, scores):
+    # The Kendall tau-b correlation and the pairwise accuracy between each row of scores and the same row of referenceScores
+    # (e.g. [iteration, system] matrices), all the rows at once. The pairwise accuracy is the portion of the pairs not tied in
+    # the reference that are ordered the same (pairs tied only in the scores count as wrong).
+    # The discordant pairs are counted with a merge sort of the scores in the order of the reference (Knight's algorithm),
+    # done on all the rows together, so it takes O(n log n) per row instead of comparing all the pairs.
+    numRows, numItems = scores.shape
+    rows = np.arange(numRows)[:, np.newaxis]
+    referenceRanks = _rowDenseRanks(referenceScores)
+    scoreRanks = _rowDenseRanks(scores)
+    jointRanks = referenceRanks * numItems + scoreRanks
+    
+    # the discordant pairs are the inversions of the score ranks when ordered by the reference (and then by the scores):
+    numDiscordant = _rowInversions(scoreRanks[rows, np.argsort(jointRanks, axis=1, kind='mergesort')])
+    numPairs = numItems * (numItems - 1) / 2.0
+    numTiedReference = _rowTiedPairs(referenceRanks)
+    numTiedScores = _rowTiedPairs(scoreRanks)
+    numConcordant = numPairs - numTiedReference - numTiedScores + _rowTiedPairs(jointRanks) - numDiscordant
+    with np.errstate(invalid='ignore', divide='ignore'):
+        kendallTaus = (numConcordant - numDiscordant) / np.sqrt((numPairs - numTiedReference) * (numPairs - numTiedScores))
+        pairwiseAccuracies = numConcordant / (numPairs - numTiedReference)
+    return kendallTaus, pairwiseAccuracies
+    
+def _rowDenseRanks(scores):
+    # the rank of each value within its row, from 0 (equal values get the same rank, with no gaps):
+    order = np.argsort(scores, axis=1, kind='mergesort')
+    rows = np.arange(scores.shape[0])[:, np.newaxis]
+    sortedScores = scores[rows, order]
+    sortedRanks = np.cumsum(np.concatenate([np.zeros((scores.shape[0], 1), dtype=np.int64), sortedScores[:, 1:] != sortedScores[:, :-1]], axis=1), axis=1)
+    ranks = np.empty_like(sortedRanks)
+    ranks[rows, order] = sortedRanks
+    return ranks
+    
+def _rowTiedPairs(ranks):
+    # the number of pairs with equal ranks in each row, from the sorted rows: each value is tied with the equal values before it
+    # in its run, so the pairs are the sum of the positions of the values in their runs (O(n log n) per row, for any range of ranks):
+    sortedRanks = np.sort(ranks, axis=1)
+    positions = np.tile(np.arange(ranks.shape[1]), (ranks.shape[0], 1))
+    isRunStart = np.ones(ranks.shape, dtype=bool)
+    isRunStart[:, 1:] = sortedRanks[:, 1:] != sortedRanks[:, :-1]
+    runStarts = np.maximum.accumulate(np.where(isRunStart, positions, 0), axis=1)
+    return (positions - runStarts).sum(axis=1).astype(float)
+    
+def _rowInversions(ranks):
+    # the number of pairs (i < j) with ranks[i] > ranks[j] in each row (ranks are integers from 0), with a bottom-up merge sort of all
+    # the rows together: in each pass, the runs of all the rows are merged by the positions of their elements in the merged runs,
+    # found with one binary search over all the left (or right) runs, which are made a single sorted array by offsetting each run.
+    numRows, numItems = ranks.shape
+    paddedLength = 1 << max(0, int(numItems - 1).bit_length())
+    runs = np.full((numRows, paddedLength), numItems, dtype=np.int64) # padded with a value above all the ranks
+    runs[:, :numItems] = ranks
+    inversions = np.zeros(numRows)
+    width = 1
+    while width < paddedLength:
+        numBlocks = paddedLength // (2 * width)
+        blocks = runs.reshape(numRows, numBlocks, 2, width)
+        left = blocks[:, :, 0, :]
+        right = blocks[:, :, 1, :]
+        blockIdx = np.arange(numRows * numBlocks).reshape(numRows, numBlocks, 1)
+        offsets = blockIdx * (numItems + 1)
+        # the number of elements of the left run not greater than each element of the right run, and smaller than each element of the left run in the right run:
+        leftNotGreater = np.searchsorted((left + offsets).ravel(), (right + offsets).ravel(), side='right').reshape(right.shape) - blockIdx * width
+        rightSmaller = np.searchsorted((right + offsets).ravel(), (left + offsets).ravel(), side='left').reshape(left.shape) - blockIdx * width
+        inversions += (width - leftNotGreater).sum(axis=(1, 2))
+        # merge each pair of runs:
+        merged = np.empty(numRows * paddedLength, dtype=np.int64)
+        positionsInRun = np.arange(width)
+        merged[(blockIdx * 2 * width + positionsInRun + rightSmaller).ravel()] = left.ravel()
+        merged[(blockIdx * 2 * width + positionsInRun + leftNotGreater).ravel()] = right.ravel()
+        runs = merged.reshape(numRows, paddedLength)
+        width *= 2
+    return inversions
+    
+def getJudgmentTensor(dataValues, workersToFilter, systemScoresAllOrig=None):
+    # Put the judgments in an array of [event, system, question, worker slot] (NaN where there is no judgment),
+    # for the systems that have summaries and original scores (if given) on all the events.
+    # Returns the systemIds, eventIds, the judgments array, and the original Pyramid scores matrix [system, event] (None without original scores).
+    
+    # the answers of each summary per question (without the filtered workers):
+    answersPerSummary = {} # { (eventId, systemId) -> { questionId -> [answers] } }
+    for eventId in dataValues:
+        for summId in dataValues[eventId]:
+            systemId = summId.split('.')[-1] # the last part of the summary name is the system ID (e.g. D0601.M.250.A.4)
+            for solution in dataValues[eventId][summId]:
+                if solution['workerId'] in workersToFilter:
+                    continue
+                for questionId, answer in solution['answers'].items():
+                    answersPerSummary.setdefault((eventId, systemId), {}).setdefault(questionId, []).append(answer)
+    
+    # keep the systems that have our and original scores on all the events:
+    eventIds = sorted(set(eventId for eventId, _ in answersPerSummary))
+    allSystemIds = set(systemId for _, systemId in answersPerSummary)
+    systemIds = sorted(systemId for systemId in allSystemIds
+        if all((eventId, systemId) in answersPerSummary and (systemScoresAllOrig is None or eventId in systemScoresAllOrig['pyr'].get(systemId, {}))
+               for eventId in eventIds))
+    if len(systemIds) < len(allSystemIds):
+        print('WARNING: Systems without scores on all events are left out: {}'.format(sorted(allSystemIds - set(systemIds))))
+    
+    # the question indices of each event:
+    questionIdxPerEvent = [{} for _ in eventIds] # [ { questionId -> index } ]
+    for (eventId, systemId), answersPerQuestion in answersPerSummary.items():
+        if systemId in systemIds:
+            questionIdx = questionIdxPerEvent[eventIds.index(eventId)]
+            for questionId in answersPerQuestion:
+                questionIdx.setdefault(questionId, len(questionIdx))
+    
+    maxQuestions = max(len(questionIdx) for questionIdx in questionIdxPerEvent)
+    maxWorkers = max(len(answers) for (_, systemId), answersPerQuestion in answersPerSummary.items() if systemId in systemIds for answers in answersPerQuestion.values())
+    judgments = np.full((len(eventIds), len(systemIds), maxQuestions, maxWorkers), np.nan)
+    for eventIdx, eventId in enumerate(eventIds):
+        for systemIdx, systemId in enumerate(systemIds):
+            for questionId, answers in answersPerSummary[(eventId, systemId)].items():
+                judgments[eventIdx, systemIdx, questionIdxPerEvent[eventIdx][questionId], :len(answers)] = answers
+    
+    if systemScoresAllOrig is None:
+        return systemIds, eventIds, judgments, None
+    origMatrix = np.array([[systemScoresAllOrig['pyr'][systemId][eventId] for eventId in eventIds] for systemId in systemIds])
+    return systemIds, eventIds, judgments, origMatrix
+    
+def getBudgetGrid(judgments, origMatrix, answerAggregationType, answerTieBreaker, numTurkersList, numQuestionsList, numEventsList, numResamples, rng=np.random):
+    # Get the correlations of our system scores to Pyramid for all (numTurkers, numQuestions, numEvents) combinations.
+    # Each resample draws one random order of the events, one random order of the questions of each event and one random order
+    # of the workers of each question in each summary, and every grid point uses the first items of these orders (nested subsamples),
+    # so that the draws are shared by all the grid points.
+    # Returns { (numTurkers, numQuestions, numEvents) -> (pearsonCorrs, spearmanCorrs) } with arrays over the resamples
+    # (the Spearman correlations give tied system scores, common with few turkers, questions or events, their average rank).
+    numEvents, numSystems, numQuestions, numWorkers = judgments.shape
+    hasJudgment = ~np.isnan(judgments)
+    hasQuestion = hasJudgment.any(axis=3) # [event, system, question]
+    questionInEvent = hasQuestion.any(axis=1) # [event, question]
+    
+    systemScoresPerPoint = {} # { (numTurkers, numQuestions, numEvents) -> ([ours system scores per resample], [orig system scores per resample]) }
+    for _ in range(numResamples):
+        # random orders of the workers (missing judgments last), questions (per event) and events:
+        workerOrder = np.argsort(np.where(hasJudgment, rng.rand(*judgments.shape), np.inf), axis=3)
+        orderedJudgments = np.take_along_axis(judgments, workerOrder, axis=3)
+        questionRanks = np.argsort(np.argsort(np.where(questionInEvent, rng.rand(numEvents, numQuestions), np.inf), axis=1), axis=1)
+        eventRanks = np.argsort(np.argsort(rng.rand(numEvents)))
+        
+        for numTurkers in numTurkersList:
+            # the question answers from the first numTurkers workers:
+            questionScores = _aggregateAnswers(orderedJudgments[:, :, :, :numTurkers], answerAggregationType, answerTieBreaker) # [event, system, question]
+            for numQuestionsToUse in numQuestionsList:
+                # the summary scores over the first numQuestionsToUse questions of each event:
+                questionsUsed = hasQuestion & (questionRanks < numQuestionsToUse)[:, np.newaxis, :]
+                summaryScores = np.where(questionsUsed, questionScores, 0.0).sum(axis=2) / np.maximum(questionsUsed.sum(axis=2), 1) # [event, system]
+                for numEventsToUse in numEventsList:
+                    # the system scores over the first numEventsToUse events:
+                    eventsUsed = eventRanks < numEventsToUse
+                    scoresLists = systemScoresPerPoint.setdefault((numTurkers, numQuestionsToUse, numEventsToUse), ([], []))
+                    scoresLists[0].append(summaryScores[eventsUsed].mean(axis=0))
+                    scoresLists[1].append(origMatrix[:, eventsUsed].mean(axis=1))
+    
+    # the correlations of all the resamples of each grid point together:
+    correlationsPerPoint = {}
+    for gridPoint, (oursScores, origScores) in systemScoresPerPoint.items():
+        oursScores = np.array(oursScores)
+        origScores = np.array(origScores)
+        correlationsPerPoint[gridPoint] = (_rowPearson(oursScores, origScores), _rowPearson(_rowRanks(oursScores), _rowRanks(origScores)))
+    return correlationsPerPoint
+    
+def _aggregateAnswers(answers, answerAggregationType, answerTieBreaker):
+    # The vectorized getFinalAnswerScoreFromList over the last axis of the answers array (NaN where there's no answer).
+    hasAnswer = ~np.isnan(answers)
+    if answerAggregationType == 0:
+        # use the average of the answers:
+        return np.where(hasAnswer, answers, 0.0).sum(axis=-1) / np.maximum(hasAnswer.sum(axis=-1), 1)
+    numPositive = (answers == 1.0).sum(axis=-1)
+    numNegative = (answers == 0.0).sum(axis=-1)
+    if answerAggregationType == 1:
+        # use the majority of the answers:
+        return np.where(numPositive > numNegative, 1.0, np.where(numPositive < numNegative, 0.0, answerTieBreaker))
+    elif answerAggregationType == 2:
+        # 1 iff atleast one 1, otherwise 0:
+        return (numPositive > 0).astype(float)
+    else:
+        return np.full(numPositive.shape, -999.0)
+    
+def getBudgetCost(numTurkers, numQuestions, numEvents):
+    # The cost in dollars of evaluating one system: a HIT per BUDGET_STATEMENTS_PER_HIT questions of each event, with numTurkers assignments each.
+    numHitsPerSummary = (numQuestions + BUDGET_STATEMENTS_PER_HIT - 1) // BUDGET_STATEMENTS_PER_HIT
+    return numEvents * numHitsPerSummary * numTurkers * BUDGET_REWARD_PER_ASSIGNMENT * (1 + BUDGET_AMT_FEE)
+    
+def outputBudgetGrid(rawDataValues, questionIdsPerEvent, systemScoresAllOrig, outputFile):
+    # Write the expected correlations and costs of the budget grid for each configuration (see the budget fields of the OUTPUT_FILE).
+    configurationFields = ['ANSWER_AGGREGATION_TYPE', 'ANSWER_TIE_BREAKER', 'NO_ANSWER_DEFAULT', 'WORKER_AGREEMENT_THRESHOLD', 'AGREEMENT_FILTERING_ITERATIONS']
+    budgetFields = ['numTurkers', 'numQuestions', 'numEvents', 'pearsonCorr', 'pearsonCorrVar', 'spearmanCorr', 'spearmanCorrVar', 'costPerSystem', 'totalCost']
+    configurations = list(itertools.product(ANSWER_AGGREGATION_TYPE, ANSWER_TIE_BREAKER, NO_ANSWER_DEFAULT, WORKER_AGREEMENT_THRESHOLD, AGREEMENT_FILTERING_ITERATIONS))
+    
+    # the stages before the iterations, shared by all the configurations:
+    stages = ScoringStages(rawDataValues, questionIdsPerEvent)
+    
+    startTime = time.time()
+    _printProgressBar(0, len(configurations), prefix = 'Progress:', suffix = '', length = 50)
+    with open(outputFile, 'w') as outF:
+        csvWriter = csv.writer(outF, lineterminator='\n')
+        csvWriter.writerow(configurationFields + budgetFields)
+        for configurationNum, configurationValues in enumerate(configurations):
+            configuration = dict(zip(configurationFields, configurationValues))
+            
+            # the judgments array is built once per configuration, and the grid is computed from it:
+            dataValues = stages.get('dataValues', configuration)
+            workersToFilter = stages.get('workersToFilter', configuration)
+            systemIds, eventIds, judgments, origMatrix = getJudgmentTensor(dataValues, workersToFilter, systemScoresAllOrig)
+            # the numbers of events can't exceed the events of the dataset (the ones above it are reported and left out of the grid):
+            budgetNumEvents = [numEvents for numEvents in BUDGET_NUM_EVENTS if numEvents <= len(eventIds)]
+            if len(budgetNumEvents) < len(BUDGET_NUM_EVENTS):
+                print('WARNING: Budget numbers of events above the {} events of the dataset are left out: {}'.format(
+                    len(eventIds), [numEvents for numEvents in BUDGET_NUM_EVENTS if numEvents > len(eventIds)]))
+            # (with common random numbers, the same resamples for all the configurations:)
+            correlationsPerPoint = getBudgetGrid(judgments, origMatrix, configuration['ANSWER_AGGREGATION_TYPE'], configuration['ANSWER_TIE_BREAKER'],
+                BUDGET_NUM_TURKERS, BUDGET_NUM_QUESTIONS, budgetNumEvents, BUDGET_NUM_RESAMPLES,
+                getArrayRandomState())
+            
+            for (numTurkers, numQuestions, numEvents), (pearsonCorrs, spearmanCorrs) in sorted(correlationsPerPoint.items()):
+                costPerSystem = getBudgetCost(numTurkers, numQuestions, numEvents)
+                csvWriter.writerow(list(configurationValues) + [numTurkers, numQuestions, numEvents,
+                    np.nanmean(pearsonCorrs), np.nanvar(pearsonCorrs), np.nanmean(spearmanCorrs), np.nanvar(spearmanCorrs),
+                    round(costPerSystem, 2), round(costPerSystem * len(systemIds), 2)])
+            
+            curTime = time.time() - startTime
+            _printProgressBar(configurationNum + 1, len(configurations), prefix = 'Progress:', suffix = round(curTime/60,2), length = 50)
+    
+def outputRankingStability(rawDataValues, questionIdsPerEvent, systemScoresAllOrig, outputFile):
+    # Write the ranking stability per number of events for each configuration (see the stability fields of the OUTPUT_FILE).
+    configurationFields = ['ANSWER_AGGREGATION_TYPE', 'ANSWER_TIE_BREAKER', 'NO_ANSWER_DEFAULT', 'NUM_TURKERS_PER_SUMMARY', 'NUM_QUESTIONS_PER_SUMMARY',
+        'WORKER_AGREEMENT_THRESHOLD', 'AGREEMENT_FILTERING_ITERATIONS', 'EVENT_FILTER_PERCENT']
+    stabilityFields = ['numEvents', 'numSubsets', 'pearsonCorr', 'pearsonCorrStd', 'spearmanCorr', 'spearmanCorrStd', 'spearmanToAllEventsOurs',
+        'spearmanToAllEventsOrig', 'pairFlipsToAllEventsOurs', 'pairFlipsToAllEventsOrig', 'pairFlipsToOrig']
+    configurations = list(itertools.product(ANSWER_AGGREGATION_TYPE, ANSWER_TIE_BREAKER, NO_ANSWER_DEFAULT, NUM_TURKERS_PER_SUMMARY, NUM_QUESTIONS_PER_SUMMARY,
+        WORKER_AGREEMENT_THRESHOLD, AGREEMENT_FILTERING_ITERATIONS, EVENT_FILTER_PERCENT))
+    
+    # the stages before the iterations, shared by all the configurations:
+    stages = ScoringStages(rawDataValues, questionIdsPerEvent)
+    
+    startTime = time.time()
+    _printProgressBar(0, len(configurations), prefix = 'Progress:', suffix = '', length = 50)
+    with open(outputFile, 'w') as outF:
+        csvWriter = csv.writer(outF, lineterminator='\n')
+        csvWriter.writerow(configurationFields + stabilityFields)
+        for configurationNum, configurationValues in enumerate(configurations):
+            configuration = dict(zip(configurationFields, configurationValues))
+            configuration['NUM_ITERATION_ON_CONFIGURATION'] = NUM_ITERATION_ON_CONFIGURATION
+            
+            # the summary scores are computed once, and then the event subsets are sampled from them:
+            systemIds, eventIds, oursMatrix, origMatrix = getScoreMatrices(rawDataValues, questionIdsPerEvent, systemScoresAllOrig, configuration, stages)
+            subsetSizes = [size for size in STABILITY_SUBSET_SIZES if size <= len(eventIds)] if len(STABILITY_SUBSET_SIZES) > 0 else range(2, len(eventIds) + 1)
+            # (with common random numbers, the same event subsets for all the configurations:)
+            for stability in getRankingStability(oursMatrix, origMatrix, subsetSizes, STABILITY_NUM_SUBSETS, getArrayRandomState()):
+                csvWriter.writerow(list(configurationValues) + [stability[field] for field in stabilityFields])
+            
+            curTime = time.time() - startTime
+            _printProgressBar(configurationNum + 1, len(configurations), prefix = 'Progress:', suffix = round(curTime/60,2), length = 50)
+    
+def getQuestionScoreDistributions(judgments, numTurkers, answerAggregationType, answerTieBreaker, noAnswerDefaultValue):
+    # Get the distribution of the score of each question in each summary when its answers are resampled with replacement
+    # (min(numTurkers, number of answers) of them, aggregated as in getFinalAnswerScoreFromList, see getAnswerScoreDistributions).
+    # Returns the possible scores [score] and their probabilities [event, system, question, score].
+    numAnswers = (~np.isnan(judgments)).sum(axis=3)
+    safeNumAnswers = np.maximum(numAnswers, 1).astype(float)
+    return getAnswerScoreDistributions((judgments == 1.0).sum(axis=3) / safeNumAnswers, (judgments == 0.0).sum(axis=3) / safeNumAnswers,
+        np.minimum(numAnswers, numTurkers), answerAggregationType, answerTieBreaker, noAnswerDefaultValue)
+    
+def getBootstrapSystemScores(scores, scoreProbs, hasQuestion, numResamples, maxBlockValues, rng=np.random):
+    # Get the system scores of each bootstrap resample [resample, system]. Each resample draws the events (with replacement),
+    # the questions of each event (with replacement), and a score for each question of each summary from its distribution, and all
+    # the systems are scored on the same events and questions (paired). The resamples are computed in blocks, as many at once
+    # as fit in maxBlockValues array values.
+    numEvents, numSystems, numQuestions, numScores = scoreProbs.shape
+    # the largest arrays have a value per question of each summary in each resample, and at most about 3 of them (the uniforms,
+    # the drawn score indices and the drawn scores) are kept at once:
+    blockSize = max(1, int(maxBlockValues // (numEvents * numSystems * numQuestions * 3)))
+    questionInEvent = hasQuestion.any(axis=1) # [event, question]
+    cumulativeProbs = np.cumsum(scoreProbs, axis=3)[:, :, :, :-1]
+    systemScores = np.zeros((numResamples, numSystems))
+    for blockStart in range(0, numResamples, blockSize):
+        numBlockResamples = min(blockSize, numResamples - blockStart)
+        
+        # the number of times each event, and each question of each event, is drawn in each resample:
+        eventCounts = np.bincount((np.arange(numBlockResamples)[:, np.newaxis] * numEvents + rng.randint(0, numEvents, (numBlockResamples, numEvents))).ravel(),
+            minlength=numBlockResamples * numEvents).reshape(numBlockResamples, numEvents)
+        questionCounts = np.zeros((numBlockResamples, numEvents, numQuestions))
+        for eventIdx in range(numEvents):
+            eventQuestions = np.nonzero(questionInEvent[eventIdx])[0]
+            draws = eventQuestions[rng.randint(0, len(eventQuestions), (numBlockResamples, len(eventQuestions)))]
+            questionCounts[:, eventIdx, :] = np.bincount((np.arange(numBlockResamples)[:, np.newaxis] * numQuestions + draws).ravel(),
+                minlength=numBlockResamples * numQuestions).reshape(numBlockResamples, numQuestions)
+        
+        # the question scores drawn from their distributions (by the inverse of the cumulative probabilities):
+        uniforms = rng.rand(numBlockResamples, numEvents, numSystems, numQuestions)
+        scoreIndices = np.zeros(uniforms.shape, dtype=int)
+        for scoreIdx in range(numScores - 1):
+            scoreIndices += uniforms > cumulativeProbs[:, :, :, scoreIdx]
+        del uniforms
+        questionScores = scores[scoreIndices] # [resample, event, system, question]
+        del scoreIndices
+        
+        # the summary scores over the drawn questions (each weighted by the times it's drawn), and the system scores over the drawn events:
+        questionScores *= hasQuestion
+        questionWeights = questionCounts[:, :, :, np.newaxis] # [resample, event, question, 1]
+        summaryScores = np.matmul(questionScores, questionWeights)[:, :, :, 0] / np.maximum(np.matmul(hasQuestion.astype(float), questionWeights)[:, :, :, 0], 1e-12)
+        del questionScores # (before the next block's arrays)
+        systemScores[blockStart:blockStart + numBlockResamples] = (eventCounts[:, :, np.newaxis] * summaryScores).sum(axis=1) / float(numEvents)
+    return systemScores
+    
+def getPairedBootstrapPValues(bootstrapScores):
+    # The two-sided p-values of the differences between all the pairs of systems [system, system]: twice the portion of
+    # the resamples where the difference is on the other side of zero (with a +1 correction, so no p-value is 0).
+    numResamples = bootstrapScores.shape[0]
+    differences = bootstrapScores[:, :, np.newaxis] - bootstrapScores[:, np.newaxis, :] # [resample, system, system]
+    numNotGreater = (differences <= 0).sum(axis=0)
+    numNotLess = (differences >= 0).sum(axis=0)
+    pValues = np.minimum(1.0, 2.0 * (np.minimum(numNotGreater, numNotLess) + 1) / float(numResamples + 1))
+    np.fill_diagonal(pValues, 1.0)
+    return pValues
+    
+def getSignificanceRanking(systemScores, pValues, significanceLevel):
+    # Rank the systems by their scores into clusters: a new cluster starts at the first system that is significantly worse
+    # than the best system of the current cluster. The rank range of a system is from 1 + the number of systems significantly
+    # better than it, to the number of systems minus the number of systems significantly worse than it.
+    # Returns the system indices from best to worst, and the cluster and (best rank, worst rank) of each of them.
+    order = list(np.argsort(-systemScores, kind='mergesort'))
+    isSignificant = pValues < significanceLevel
+    clusters = []
+    rankRanges = []
+    cluster = 1
+    clusterTop = order[0]
+    for systemIdx in order:
+        if isSignificant[clusterTop, systemIdx]:
+            cluster += 1
+            clusterTop = systemIdx
+        clusters.append(cluster)
+        isBetter = isSignificant[systemIdx] & (systemScores > systemScores[systemIdx])
+        isWorse = isSignificant[systemIdx] & (systemScores < systemScores[systemIdx])
+        rankRanges.append((1 + int(isBetter.sum()), len(order) - int(isWorse.sum())))
+    return order, clusters, rankRanges
+    
+def outputSignificance(rawDataValues, questionIdsPerEvent, outputFile):
+    # Write the significance of the differences between the systems, and their clustered ranking (see the significance fields of the OUTPUT_FILE).
+    configuration = {'ANSWER_AGGREGATION_TYPE': ANSWER_AGGREGATION_TYPE[0], 'ANSWER_TIE_BREAKER': ANSWER_TIE_BREAKER[0], 'NO_ANSWER_DEFAULT': NO_ANSWER_DEFAULT[0],
+        'WORKER_AGREEMENT_THRESHOLD': WORKER_AGREEMENT_THRESHOLD[0], 'AGREEMENT_FILTERING_ITERATIONS': AGREEMENT_FILTERING_ITERATIONS[0]}
+    stages = ScoringStages(rawDataValues, questionIdsPerEvent)
+    dataValues = stages.get('dataValues', configuration)
+    workersToFilter = stages.get('workersToFilter', configuration)
+    systemIds, eventIds, judgments, _ = getJudgmentTensor(dataValues, workersToFilter)
+    
+    # the exact score distribution of each question, the expected system scores, and the bootstrap resamples:
+    startTime = time.time()
+    scores, scoreProbs = getQuestionScoreDistributions(judgments, NUM_TURKERS_PER_SUMMARY[0], configuration['ANSWER_AGGREGATION_TYPE'],
+        configuration['ANSWER_TIE_BREAKER'], configuration['NO_ANSWER_DEFAULT'])
+    hasQuestion = (~np.isnan(judgments)).any(axis=3)
+    expectedQuestionScores = (scoreProbs * scores).sum(axis=3)
+    systemScores = ((expectedQuestionScores * hasQuestion).sum(axis=2) / np.maximum(hasQuestion.sum(axis=2), 1)).mean(axis=0)
+    bootstrapScores = getBootstrapSystemScores(scores, scoreProbs, hasQuestion, SIGNIFICANCE_NUM_RESAMPLES, SIGNIFICANCE_MAX_BLOCK_VALUES, getArrayRandomState())
+    pValues = getPairedBootstrapPValues(bootstrapScores)
+    order, clusters, rankRanges = getSignificanceRanking(systemScores, pValues, SIGNIFICANCE_LEVEL)
+    print('{} systems on {} events, {} resamples in {} seconds'.format(len(systemIds), len(eventIds), SIGNIFICANCE_NUM_RESAMPLES, round(time.time() - startTime, 2)))
+    
+    with open(outputFile, 'w') as outF:
+        csvWriter = csv.writer(outF, lineterminator='\n')
+        csvWriter.writerow(['systemId', 'score', 'cluster', 'rankRange'] + [systemIds[systemIdx] for systemIdx in order])
+        for systemIdx, cluster, (bestRank, worstRank) in zip(order, clusters, rankRanges):
+            rankRange = str(bestRank) if bestRank == worstRank else '{}-{}'.format(bestRank, worstRank)
+            csvWriter.writerow([systemIds[systemIdx], systemScores[systemIdx], cluster, rankRange] + [pValues[systemIdx, otherIdx] for otherIdx in order])
+            print('{}\t{}\t{}\t{}'.format(cluster, rankRange, systemIds[systemIdx], round(systemScores[systemIdx], 4)))
+    
+def getArrayRandomState():
+    # The random numbers of the array computations (permutations, event subsets and resamples): a new RandomState of RANDOM_SEED
+    # if common random numbers are used (so each configuration gets the same numbers, without reseeding numpy's global state,
+    # which the scoring server's threads share), or numpy's global random numbers.
+    return np.random.RandomState(RANDOM_SEED) if COMMON_RANDOM_NUMBERS else np.random
+    
+def getIterationSampler():
+    # The sampler of the iterations on a configuration: the random module, or a SubsetSampler if common random numbers or antithetic sampling is used.
+    if COMMON_RANDOM_NUMBERS or ANTITHETIC_SAMPLING:
+        return SubsetSampler(RANDOM_SEED if COMMON_RANDOM_NUMBERS else None, ANTITHETIC_SAMPLING)
+    return random
     
 def getCorrelationsBetweenOriginalScores(systemScoresOriginal):
     # get the correlations between the different original evaluation methods to pyramids:
@@ -344,57 +1049,29 @@ def getSystemScoreCorrelations(systemScoresOriginal, systemScoresNew):
     
     
     
-def readOriginalScoresData(originalManualScoresFile, originalRougeScoresFile):
-    # read the original scores from the scores files as output by the getManualScores.py and getRougeScores.py scripts
-    
-    systemScoresAll = {'pyr':{}, 'resp':{}, 'r1':{}, 'r2':{}, 'rL':{}} # { <'pyr'/'resp'/'r1'/'r2'/'rL'> -> { systemId -> { eventId -> manualScore } } }
-    
-    with open(originalManualScoresFile, 'r') as inF:
-        readValues = False
-        for line in inF:
-            line = line.strip()
-            # start reading the data after this line (headers of the score data):
-            if line == 'systemId, eventId, pyramid, responsiveness':
-                readValues = True
-            elif readValues == True:
-                # split the comma delimited lines and get the values:
-                values = [val.strip() for val in line.split(',')]
-                if len(values) != 4:
-                    continue
-                systemId = values[0]
-                eventId = values[1]
-                pyramidScore = float(values[2])
-                responsivenessScore = float(values[3])
-                
-                systemScoresAll['pyr'].setdefault(systemId, {})[eventId] = pyramidScore
-                systemScoresAll['resp'].setdefault(systemId, {})[eventId] = responsivenessScore
-                
-    with open(originalRougeScoresFile, 'r') as inF:
-        readValues = False
-        for line in inF:
-            line = line.strip()
-            # start reading the data after this line (headers of the score data):
-            if line == 'systemId, eventId , ROUGE-1 recall, ROUGE-1 precision, ROUGE-1 f1, ROUGE-2 recall, ROUGE-2 precision, ROUGE-2 f1, ROUGE-3 recall, ROUGE-3 precision, ROUGE-3 f1, ROUGE-4 recall, ROUGE-4 precision, ROUGE-4 f1, ROUGE-L recall, ROUGE-L precision, ROUGE-L f1, ROUGE-W-1.2 recall, ROUGE-W-1.2 precision, ROUGE-W-1.2 f1, ROUGE-SU4 recall, ROUGE-SU4 precision, ROUGE-SU4 f1':
-                readValues = True
-            elif readValues == True:
-                # split the comma delimited lines and get the values:
-                values = [val.strip() for val in line.split(',')]
-                if len(values) != 23:
-                    continue
-                systemId = values[0]
-                eventId = values[1]
-                try:
-                    rouge1Score = float(values[2])
-                    rouge2Score = float(values[5])
-                    rougeLScore = float(values[14])
-                    
-                    systemScoresAll['r1'].setdefault(systemId, {})[eventId] = rouge1Score
-                    systemScoresAll['r2'].setdefault(systemId, {})[eventId] = rouge2Score
-                    systemScoresAll['rL'].setdefault(systemId, {})[eventId] = rougeLScore
-                except:
-                    # in case the scores cannot be read well (means they are probably missing)
-                    pass
+def readOriginalScoresData(originalManualScoresFile, originalRougeScoresFile, rougeScores=None, scoreStoreFile='', scoreStoreDataset=''):
+    # read the original scores from the score store file (see scoreStore.py), or from the scores files as output by the getManualScores.py
+    # and getRougeScores.py scripts (loaded into an in-memory score store)
+    # (the ROUGE scores can also be given as computed by computeRougeScores.py: { systemId -> { eventId -> { rougeVariant -> (R, P, F) } } },
+    # and are then kept in an in-memory score store, since the score store file is only read here)
     
+    if scoreStoreFile != '':
+        store = ScoreStore(scoreStoreFile)
+    else:
+        store = ScoreStore()
+        store.loadManualScoresFile(scoreStoreDataset, originalManualScoresFile)
+        if rougeScores is None:
+            store.loadRougeScoresFile(scoreStoreDataset, originalRougeScoresFile)
+    rougeStore = store
+    if rougeScores is not None:
+        rougeStore = ScoreStore()
+        rougeStore.loadRougeScores(scoreStoreDataset, rougeScores)
+    
+    # { <'pyr'/'resp'/'r1'/'r2'/'rL'> -> { systemId -> { eventId -> manualScore } } }
+    systemScoresAll = {scoreType : (rougeStore if scoreType in ['r1', 'r2', 'rL'] else store).getScores(scoreStoreDataset, metric)
+                       for scoreType, metric in ORIGINAL_SCORE_METRICS.items()}
+    store.close()
+    rougeStore.close()
     
     return systemScoresAll
     
@@ -425,496 +1102,42 @@ def getOriginalScores(systemScoresAllOrig, eventIdsPerSystem):
     return systemScoresToUse
     
     
-def printAverageEventScores(summaryScores):
-    # FOR DEBUGGING
-    
-    # list the summary scores in each topic:
-    scoresByEvent = {eventId : [summaryScores[eventId][summId] for summId in summaryScores[eventId]] for eventId in summaryScores}
-    # average the scores in each topic:
-    avgScoreByEvent = {eventId : reduce(lambda x, y: x + y, scoresByEvent[eventId]) / len(scoresByEvent[eventId]) \
-        for eventId in scoresByEvent}
-    # print the average score of each topic:
-    for eventId in avgScoreByEvent:
-        print(eventId, avgScoreByEvent[eventId], len(scoresByEvent[eventId]))
-    
-    
-    
-def getSystemScores(summaryScores):
-    # Gets the scores of the systems according to the separate summary scores of each system.
-    # Returns a dictionary of scores per system and lists of eventIDs for which each system has a summary.
-    
-    # keep all the scores of each system:
-    systemScoresAll = {} # the list of scores for each system.  { systemId -> [ <scores> ] }
-    eventIdsUsedPerSystem = {} # the eventIds that each system has summaries for.  { systemId -> [ <event_ids> ] }
-    for eventId in summaryScores:
-        for summId in summaryScores[eventId]:
-            systemId = summId.split('.')[-1] # the last part of the summary name is the system ID (e.g. D0601.M.250.A.4)
-            systemScoresAll.setdefault(systemId, []).append(summaryScores[eventId][summId])
-            
-            # keep track of the eventIds used by the system:
-            if not systemId in eventIdsUsedPerSystem:
-                eventIdsUsedPerSystem[systemId] = [eventId]
-            elif not eventId in eventIdsUsedPerSystem[systemId]:
-                eventIdsUsedPerSystem[systemId].append(eventId)
-            
-    # get the system scores with the average of summary scores ({ systemId -> score }):
-    systemScores = {systemId : reduce(lambda x, y: x + y, systemScoresAll[systemId]) / len(systemScoresAll[systemId]) \
-        for systemId in systemScoresAll}
-        
-    return systemScores, eventIdsUsedPerSystem
-    
-    
-def getSystemSummaryScores(dataValues, workersToFilter, questionIdsPerEvent, answerAggregationType, answerTieBreaker, numQuestionsPerSummary, numTurkersPerSummary, numEventsToUse, eventAgreements, percentEventsToFilter):
-    # Get the score of each summary according to our lite-Pyramid method.
-    # Returns a dictionary of { eventId -> { summId -> score } }.
-    
-    # first get the list of eventIds to use, according to the number specified:
-    possibleEventIdsToUse = [eventId for eventId in dataValues.keys()]# if eventId not in eventsToFilter]
-    if len(possibleEventIdsToUse) <= numEventsToUse:
-        eventIdsToUse = possibleEventIdsToUse
-    else:
-        eventIdsToUse = random.sample(possibleEventIdsToUse, numEventsToUse)
-    
-    # if we need to filter out a certain percent of bad events, take them out of the eventIdsToUse:
-    if percentEventsToFilter > 0:
-        eventsToFilter = _filterEventsByAgreement(eventAgreements, percentEventsToFilter, baseEventIds=eventIdsToUse)
-        eventIdsToUse = [eventId for eventId in eventIdsToUse if not eventId in eventsToFilter]
-    
-    #if len(dataValues.keys()) <= numEventsToUse:
-    #    eventIdsToUse = dataValues.keys()
-    #else:
-    #    eventIdsToUse = random.sample(dataValues.keys(), numEventsToUse)
-    
-    # get a list of answers for each question in each summary:
-    allSolutionsPerSummary = {} # { eventId -> { summaryId -> { questionId -> [ <full list of answers> ] } } }
-    questionIdsToUse = {} # { eventId -> [ <questionIds> ] }
-    for eventId in eventIdsToUse:
-        questionIdsToUse[eventId] = []
-        for summId in dataValues[eventId]:
-            for solution in dataValues[eventId][summId]:
-                # ignore this solution if this is a filtered worker:
-                workerId = solution['workerId']
-                if workerId in workersToFilter:
-                    continue
-                # add the questionId/answer to this summary:
-                for questionId, answer in solution['answers'].items():
-                    allSolutionsPerSummary.setdefault(eventId, {}).setdefault(summId, {}).setdefault(questionId, []).append(answer)
-                    # keep the questionId for the event:
-                    if questionId not in questionIdsToUse[eventId]:
-                        questionIdsToUse[eventId].append(questionId)
-                        
-    # for each event, choose the sample of question IDs to use:
-    for eventId in questionIdsToUse:
-        if len(questionIdsToUse[eventId]) > numQuestionsPerSummary:
-            questionIdsToUse[eventId] = random.sample(questionIdsToUse[eventId], numQuestionsPerSummary)
-                
-    # for each question to use, from the list of answers, choose a number of answers:
-    summaryScores = {} # { eventId -> { summId -> score } }
-    for eventId in allSolutionsPerSummary:
-        summaryScores[eventId] = {}
-        for summId in allSolutionsPerSummary[eventId]:
-            summScore = 0.0 # the score is the sum of the questions' scores
-            numQuestions = 0
-            for questionId in allSolutionsPerSummary[eventId][summId]:
-                # only look at the questions that should be used:
-                if questionId in questionIdsToUse[eventId]:
-                    # get a sample of answers for the question:
-                    if len(allSolutionsPerSummary[eventId][summId][questionId]) <= numTurkersPerSummary:
-                        answerSample = allSolutionsPerSummary[eventId][summId][questionId]
-                    else:
-                        answerSample = random.sample(allSolutionsPerSummary[eventId][summId][questionId], numTurkersPerSummary)
-                    
-                    # get the current question's score according to the several answers provided by the turkers:
-                    questionFinalAnswerScore = getFinalAnswerScoreFromList(answerSample, answerAggregationType, answerTieBreaker)
-                    summScore += questionFinalAnswerScore
-                    numQuestions += 1
-            
-            # set the final score for the current summary as the percentage of positive answers:
-            summaryScores[eventId][summId] = summScore / numQuestions
-        
-    return summaryScores
-    
-
-def getFinalAnswerScoreFromList(answerList, answerAggregationType, answerTieBreaker):
-    # gets a score from the list of answers given (list of 0.0 or 1.0)
-    # the score is a number between 0 and 1
-    
-    # use the average of the answers:
-    if answerAggregationType == 0:
-        result = reduce(lambda x, y: x + y, answerList) / len(answerList)
-    # use the majority of the answers:
-    elif answerAggregationType == 1:
-        answersCount = Counter(answerList)
-        if answersCount[0.0] > answersCount[1.0]:
-            result = 0.0
-        elif answersCount[0.0] < answersCount[1.0]:
-            result = 1.0
-        else:
-            result = answerTieBreaker
-    # return 1 iff atleast one 1, otherwise 0:
-    elif answerAggregationType == 2:
-        answersCount = Counter(answerList)
-        if answersCount[1.0] > 0:
-            result = 1.0
-        else:
-            result = 0.0
-    else:
-        result = -999
-        
-    return result
-
-    
-
-def getRawData(inputBatchFile):
-    # get all the results from the MTurk batch results file:
-    questionIdsPerEvent = {} # { eventId -> [questionIds] }
-    rawDataValues = {} # { eventId -> { summId -> [{'workerId':<val> , 'answers':{questionId:<'p'/'n'/''>}}] } }
-    with open(inputBatchFile, mode='r') as inF:
-        csv_reader = csv.DictReader(inF)
-        for row in csv_reader:
-            eventId = row['Input.eventId']
-            summId = row['Input.summaryId']
-            workerId = row['WorkerId']
-            questionIdList = ast.literal_eval(row['Input.qIdList'])
-            
-            # get the answers into a list, in order of the questionIdList (incremental index in the columns):
-            answers = {qId:row['Answer.S{}Answer'.format(qInd+1)] for qInd, qId in enumerate(questionIdList)}
-            
-            # if there was no questions list added for this event yet:
-            if not eventId in questionIdsPerEvent:
-                questionIdsPerEvent[eventId] = questionIdList
-                
-            # if there's already a questions list for this event, and it doesn't contain the current list:
-            elif not set(questionIdList) <= set(questionIdsPerEvent[eventId]):
-                questionIdsPerEvent[eventId].extend(questionIdList) # extend the new list of questions
-
-            rawDataValues.setdefault(eventId, {}).setdefault(summId, []).append({'workerId':workerId, 'answers':answers})
-            
-    return rawDataValues, questionIdsPerEvent
-
-
-def mapValues(rawDataValues, noAnswerDefaultValue):
-    # Maps the raw data to values for use, also according to the configuration given.
-    # Returns { eventId -> { summId -> [{'workerId':<val> , 'answers':{qId:<0/1>}}] } }.
-
-    # the inner function to map a raw value to a processable value:
-    def mapFunc(sourceVal):
-        if sourceVal == 'p':
-            return 1.0
-        elif sourceVal == 'n':
-            return 0.0
-        elif sourceVal == '':
-            return noAnswerDefaultValue
-
-    # fully copy the raw data:
-    mappedValues = copy.deepcopy(rawDataValues) # { eventId -> { summId -> [{'workerId':<val> , 'answers':{qId:<0/1>}}] } }
-    for eventId in mappedValues:
-        for summId in mappedValues[eventId]:
-            for solution in mappedValues[eventId][summId]:
-                for qId in solution['answers']:
-                    # replace the raw value to the new value:
-                    solution['answers'][qId] = mapFunc(solution['answers'][qId])
-
-    return mappedValues
-    
-def getWorkersToFilter(dataValues, questionIdsPerEvent, workerAgreementThreshold, numFilteringIteration, printToScreen=False):
-    # Gets a list of workerIDs to ignore due to low agreement with others.
-    
-    workersToFilter = []
-    
-    for iter in range(numFilteringIteration):
-        # measure the worker agreements:
-        workerAgreements, workerAssignmentsCount = _measureWorkerAgreement(dataValues, questionIdsPerEvent, workersToFilter)
-        if printToScreen:
-            for workerId in workerAgreements:
-                print '{}\t{}\t{}'.format(workerId, workerAgreements[workerId], workerAssignmentsCount[workerId])
-            
-        # get the workers to filter due to low agreement scores:
-        workersToFilter = _filterWorkersByAgreement(workerAgreements, workerAssignmentsCount, workerAgreementThreshold)
-        if printToScreen:
-            for workerId in workersToFilter:
-                print 'Filtered: {}\t{}\t{}'.format(workerId, workerAgreements[workerId], workerAssignmentsCount[workerId])
-        
-    return workersToFilter
-                    
-def _measureWorkerAgreement(dataValues, questionIdsPerEvent, workerIgnoreList):
-    # Gets the agreement scores of each worker.
-    # Returns workerAgreements {workerId -> overall agreement score} and workerAssignmentsCount {workerId -> # of assignments done}.
-        
-    def calculateAgreement(list1, list2):
-        # get the percentage agreement between the two answer lists:
-        seqenceObj = difflib.SequenceMatcher(None, answers_i, answers_j)
-        agreementScore = seqenceObj.ratio()
-        return agreementScore
-    
-    workerAgreementDict = {} # workerId -> [<agreement values>]
-    workerAssignmentsCount = {} # workerId -> # of assignments done
-    
-    for eventId in dataValues:
-        for summId in dataValues[eventId]:
-            
-            # in the summary, there are several solutions, so go over each pair of solutions (questionnaires) and measure agreement:
-            for i in range(len(dataValues[eventId][summId])):
-                
-                solution_i = dataValues[eventId][summId][i] # i_th solution of the current summary
-                workerId_i = solution_i['workerId']
-                
-                # check whether to ignore this worker:
-                if workerId_i in workerIgnoreList:
-                    continue
-                
-                questionIds = solution_i['answers'].keys()
-                answers_i = [solution_i['answers'][qId] for qId in questionIds]
-                
-                for j in range(i+1, len(dataValues[eventId][summId])):
-                    solution_j = dataValues[eventId][summId][j] # j_th solution of the current summary
-                    workerId_j = solution_j['workerId']
-                    
-                    # check whether to ignore this worker:
-                    if workerId_j in workerIgnoreList:
-                        continue
-                        
-                    # if the two solutions (assignments) have the same question ID sets, 
-                    #   measure the agreement between the two annotators:
-                    if set(solution_i['answers'].keys()) == set(solution_j['answers'].keys()):
-                        answers_j = [solution_j['answers'][qId] for qId in questionIds]
-                        
-                        agreementScore = calculateAgreement(answers_i, answers_j)
-                
-                        # add the agreement score to each of the workers:
-                        workerAgreementDict.setdefault(workerId_i, []).append(agreementScore)
-                        workerAgreementDict.setdefault(workerId_j, []).append(agreementScore)
-                        
-                # keep count of the number of assignments done by the worker:
-                workerAssignmentsCount[workerId_i] = workerAssignmentsCount.get(workerId_i, 0) + 1
-
-    # calculate the average agreement accuracy for each worker:
-    workerAgreements = {} # workerId -> overall agreement score
-    for workerId in workerAgreementDict:
-        workerAgreements[workerId] = round(reduce(lambda x, y: x + y, workerAgreementDict[workerId]) / len(workerAgreementDict[workerId]), 3)
-        
-    return workerAgreements, workerAssignmentsCount
-
-    
-def _filterWorkersByAgreement(workerAgreements, workerAssignmentsCount, workerAgreementThreshold):
-    return [workerId for workerId in workerAgreements if workerAgreements[workerId] < workerAgreementThreshold]
-    
-
-def getEventsToFilter(dataValues, workersToFilter, percentEventsToFilter, printToScreen=False):
-    # Gets a list of events to filter (percentEventsToFilter), ordered from highest disagreeing to least.
-    
-    # measure the event agreements:
-    eventAgreements = _measureEventAgreement(dataValues, workersToFilter)
-    if printToScreen:
-        for eventId in eventAgreements:
-            print '{}\t{}'.format(eventId, eventAgreements[eventId])
-        
-    # get the events to filter due to low agreement scores:
-    eventsToFilter = _filterEventsByAgreement(eventAgreements, percentEventsToFilter)
-    if printToScreen:
-        for eventId in eventsToFilter:
-            print 'Filtered: {}\t{}'.format(eventId, eventAgreements[eventId])
-    
-    return eventsToFilter
-    
-def _measureEventAgreement(dataValues, workersToFilter):
-    MISSING_VALUE_CHAR = '*' # the character signaling an ungiven answer
-    
-    def calculateAgreement(list2d):
-        return krippendorff_alpha(list2d, convert_items=str, missing_items=[MISSING_VALUE_CHAR])
-    
-    eventAgreementDict = {} # eventId -> [<agreement values over systems summaries>]
-    
-    for eventId in dataValues:
-        currentEventAgreementScores = []
-        for summId in dataValues[eventId]:
-            allAnswers = {} # { questionSet -> [<list of q/a dictionaries>] }
-            # in the summary, there are several solutions, so go over each pair of solutions (questionnaires) and measure agreement:
-            for i in range(len(dataValues[eventId][summId])):
-                solution_i = dataValues[eventId][summId][i] # i_th solution of the current summary
-                worker_i = solution_i['workerId']
-                if worker_i in workersToFilter:
-                    continue
-                questionIdsStr = str(solution_i['answers'].keys()) # a string to represent the question set (2 per summary)
-                qaDictCopy = {qId : answer if answer != '' else MISSING_VALUE_CHAR for qId, answer in solution_i['answers'].items()} # replace '' with '*'
-                allAnswers.setdefault(questionIdsStr, []).append(qaDictCopy)
-                
-            # for each question set of this summary, get the agreement score:
-            for qSet in allAnswers:
-                agreementScore = calculateAgreement(allAnswers[qSet])
-                currentEventAgreementScores.append(agreementScore)
-        
-        # keep the average agreement score 
-        eventAgreementDict[eventId] = reduce(lambda x,y:x+y, currentEventAgreementScores) / len(currentEventAgreementScores)
-                
-
-    ## calculate the average agreement accuracy for each event:
-    #eventAgreements = {} # eventId -> overall agreement score
-    #for eventId in eventAgreementDict:
-    #    eventAgreements[eventId] = round(reduce(lambda x, y: x + y, eventAgreementDict[eventId]) / len(eventAgreementDict[eventId]), 3)
-        
-    return eventAgreementDict
-
-def _filterEventsByAgreement(eventAgreements, percentEventsToFilter, baseEventIds=None):
-    # if needed, prepare a list of eventIds to use according to the base list given:
-    if baseEventIds == None:
-        baseEventAgreements = eventAgreements
-    else:
-        baseEventAgreements = {evId:agr for evId, agr in eventAgreements.items() if evId in baseEventIds}
-        
-    # sort the events by agreement:
-    sortedByAgreement = sorted(baseEventAgreements.items(), key=operator.itemgetter(1))
-    # get the number of events to leave out:
-    numEventsToFilter = int(float(len(baseEventAgreements)) * percentEventsToFilter)
-    # get the evemts to leave out (lowest agreement scores):
-    eventIdsToFilter = [eventId for eventId, _ in sortedByAgreement[0:numEventsToFilter]]
-    
-    return eventIdsToFilter
-    
-    
-# Print iterations progress
-def _printProgressBar (iteration, total, prefix = '', suffix = '', decimals = 1, length = 100, fill = '$'):
-    """
-    Call in a loop to create terminal progress bar
-    @params:
-        iteration   - Required  : current iteration (Int)
-        total       - Required  : total iterations (Int)
-        prefix      - Optional  : prefix string (Str)
-        suffix      - Optional  : suffix string (Str)
-        decimals    - Optional  : positive number of decimals in percent complete (Int)
-        length      - Optional  : character length of bar (Int)
-        fill        - Optional  : bar fill character (Str)
-    """
-    percent = ("{0:." + str(decimals) + "f}").format(100 * (iteration / float(total)))
-    filledLength = int(length * iteration // total)
-    bar = fill * filledLength + '-' * (length - filledLength)
-    sys.stdout.write('\r{} |{}| {}% {}'.format(prefix, bar, percent, suffix))
-    # Print New Line on Complete
-    if iteration == total: 
-        print()
-
-### krippendorff_alpha START ###
-
-def nominal_metric(a, b):
-    return a != b
-
-
-def interval_metric(a, b):
-    return (a-b)**2
-
-
-def ratio_metric(a, b):
-    return ((a-b)/(a+b))**2
-
-
-def krippendorff_alpha(data, metric=nominal_metric, force_vecmath=False, convert_items=float, missing_items=None):
-    '''
-    From: https://github.com/grrrr/krippendorff-alpha
-    Calculate Krippendorff's alpha (inter-rater reliability):
-    
-    data is in the format
-    [
-        {unit1:value, unit2:value, ...},  # coder 1
-        {unit1:value, unit3:value, ...},   # coder 2
-        ...                            # more coders
-    ]
-    or 
-    it is a sequence of (masked) sequences (list, numpy.array, numpy.ma.array, e.g.) with rows corresponding to coders and columns to items
-    
-    metric: function calculating the pairwise distance
-    force_vecmath: force vector math for custom metrics (numpy required)
-    convert_items: function for the type conversion of items (default: float)
-    missing_items: indicator for missing items (default: None)
-    '''
-    
-    # number of coders
-    m = len(data)
-    
-    # set of constants identifying missing values
-    if missing_items is None:
-        maskitems = []
-    else:
-        maskitems = list(missing_items)
-    if np is not None:
-        maskitems.append(np.ma.masked_singleton)
-    
-    # convert input data to a dict of items
-    units = {}
-    for d in data:
-        try:
-            # try if d behaves as a dict
-            diter = d.items()
-        except AttributeError:
-            # sequence assumed for d
-            diter = enumerate(d)
-            
-        for it, g in diter:
-            if g not in maskitems:
-                try:
-                    its = units[it]
-                except KeyError:
-                    its = []
-                    units[it] = its
-                its.append(convert_items(g))
-
-
-    units = dict((it, d) for it, d in units.items() if len(d) > 1)  # units with pairable values
-    n = sum(len(pv) for pv in units.values())  # number of pairable values
-    
-    if n == 0:
-        raise ValueError("No items to compare.")
-    
-    np_metric = (np is not None) and ((metric in (interval_metric, nominal_metric, ratio_metric)) or force_vecmath)
-    
-    Do = 0.
-    for grades in units.values():
-        if np_metric:
-            gr = np.asarray(grades)
-            Du = sum(np.sum(metric(gr, gri)) for gri in gr)
-        else:
-            Du = sum(metric(gi, gj) for gi in grades for gj in grades)
-        Do += Du/float(len(grades)-1)
-    Do /= float(n)
-
-    if Do == 0:
-        return 1.
-
-    De = 0.
-    for g1 in units.values():
-        if np_metric:
-            d1 = np.asarray(g1)
-            for g2 in units.values():
-                De += sum(np.sum(metric(d1, gj)) for gj in g2)
-        else:
-            for g2 in units.values():
-                De += sum(metric(gi, gj) for gi in g1 for gj in g2)
-    De /= float(n*(n-1))
-
-    return 1.-Do/De if (Do and De) else 1.
-    
-### krippendorff_alpha END ###
-    
-if __name__ == '__main__':
-    
-    ONLY_SCORES = True
-    if len(sys.argv) > 1:
-        if sys.argv[1] == '-scores':
-            ONLY_SCORES = True
-        elif sys.argv[1] == '-corr':
-            ONLY_SCORES = False
-        else:
-            print('Usage: calculateScores.py [-scores|-corr]')
-            
+def main(mode='-scores'):
+    # Run the given mode (see the OUTPUT_FILE) with the input files and configuration options of the module.
+    ONLY_SCORES = mode != '-corr'
+    STABILITY = mode == '-stability'
+    BUDGET = mode == '-budget'
+    SIGNIFICANCE = mode == '-signif'
     
     # get the raw data from the MTurk batch output:
     rawDataValues, questionIdsPerEvent = getRawData(RESULTS_FILE_INPUT)
     
+    # the significance testing doesn't need the original scores:
+    if SIGNIFICANCE:
+        outputSignificance(rawDataValues, questionIdsPerEvent, OUTPUT_FILE)
+        return
+    
     # get the original manual scores per systemId and eventId from the manual scores file:
-    systemScoresAllOrig = readOriginalScoresData(MANUAL_SCORES_FILE, ROUGE_SCORES_FILE)
+    if ROUGE_PEERS_FOLDER != '' and ROUGE_MODELS_FOLDER != '':
+        rougeScores = computeRougeScores(ROUGE_PEERS_FOLDER, ROUGE_MODELS_FOLDER)
+    else:
+        rougeScores = None
+    systemScoresAllOrig = readOriginalScoresData(MANUAL_SCORES_FILE, ROUGE_SCORES_FILE, rougeScores, SCORE_STORE_FILE, SCORE_STORE_DATASET)
+    
+    # the ranking stability analysis and the budget planning have their own outputs:
+    if STABILITY:
+        outputRankingStability(rawDataValues, questionIdsPerEvent, systemScoresAllOrig, OUTPUT_FILE)
+        return
+    if BUDGET:
+        outputBudgetGrid(rawDataValues, questionIdsPerEvent, systemScoresAllOrig, OUTPUT_FILE)
+        return
     
     # get the number of configurations being tested (just for the progress bar in the CLI):
     numConfigurations = len(ANSWER_AGGREGATION_TYPE) * len(ANSWER_TIE_BREAKER) * len(NO_ANSWER_DEFAULT) * len(NUM_TURKERS_PER_SUMMARY) * len(NUM_QUESTIONS_PER_SUMMARY) * len(WORKER_AGREEMENT_THRESHOLD) * len(AGREEMENT_FILTERING_ITERATIONS) * len(NUM_EVENTS_TO_USE) * len(EVENT_FILTER_PERCENT)
     
+    # the stages before the iterations, shared by all the configurations:
+    stages = ScoringStages(rawDataValues, questionIdsPerEvent)
+    
     # for measuring time:
     startTime = time.time()
     
@@ -923,7 +1146,7 @@ if __name__ == '__main__':
         
         # write out the column names in the first row:
         if not ONLY_SCORES:
-            outF.write('{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{}\n'.format(
+            outF.write(('{},' * 55 + '{}\n').format(
                 'ANSWER_AGGREGATION_TYPE',
                 'ANSWER_TIE_BREAKER',
                 'NO_ANSWER_DEFAULT',
@@ -937,7 +1160,11 @@ if __name__ == '__main__':
                 'pCorrResp', 'pPvalResp', 'sCorrResp', 'sPvalResp',
                 'pCorrR1', 'pPvalR1', 'sCorrR1', 'sPvalR1',
                 'pCorrR2', 'pPvalR2', 'sCorrR2', 'sPvalR2',
-                'pCorrRL', 'pPvalRL', 'sCorrRL', 'sPvalRL'))
+                'pCorrRL', 'pPvalRL', 'sCorrRL', 'sPvalRL',
+                'pWilliamsResp', 'pPermResp', 'sPermResp', 'pWilliamsR1', 'pPermR1', 'sPermR1',
+                'pWilliamsR2', 'pPermR2', 'sPermR2', 'pWilliamsRL', 'pPermRL', 'sPermRL',
+                'kendallTau', 'kendallTauStd', 'pairwiseAcc', 'kCorrResp', 'pairAccResp', 'kCorrR1', 'pairAccR1',
+                'kCorrR2', 'pairAccR2', 'kCorrRL', 'pairAccRL'))
         else:
             outF.write('{},{},{},{},{},{},{},{},{},{},{}\n'.format(
                 'ANSWER_AGGREGATION_TYPE',
@@ -981,8 +1208,8 @@ if __name__ == '__main__':
                                             # get the correlations for the current configuration:
                                             pearsonCorr, pearsonCorrStd, pearsonPVal, spearmanCorr, spearmanCorrStd, spearmanPVal, \
                                                 systemScoresOurs, systemScoresOriginal, \
-                                                pearsonCorrOrig, pearsonPValueOrig, spearmanCorrOrig, spearmanPValueOrig = \
-                                                computeScoresAndCorrelations(rawDataValues, questionIdsPerEvent, systemScoresAllOrig, configuration, ONLY_SCORES)
+                                                pearsonCorrOrig, pearsonPValueOrig, spearmanCorrOrig, spearmanPValueOrig, correlationTests, rankCorrelations = \
+                                                computeScoresAndCorrelations(rawDataValues, questionIdsPerEvent, systemScoresAllOrig, configuration, ONLY_SCORES, stages)
                                             
                                             # show the progress and time after the running on the configuration:
                                             curTime = time.time() - startTime
@@ -991,7 +1218,7 @@ if __name__ == '__main__':
                                             
                                             # write out the configuration paramaters and the correlations:
                                             if not ONLY_SCORES:
-                                                lineToOutput = '{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{},{}\n'.format(
+                                                lineToOutput = ('{},' * 55 + '{}\n').format(
                                                     answerAggregationType,
                                                     answerTieBreaker,
                                                     noAnswerDefaultValue,
@@ -1007,7 +1234,10 @@ if __name__ == '__main__':
                                                     pearsonCorrOrig['resp'], pearsonPValueOrig['resp'], spearmanCorrOrig['resp'], spearmanPValueOrig['resp'],
                                                     pearsonCorrOrig['r1'], pearsonPValueOrig['r1'], spearmanCorrOrig['r1'], spearmanPValueOrig['r1'],
                                                     pearsonCorrOrig['r2'], pearsonPValueOrig['r2'], spearmanCorrOrig['r2'], spearmanPValueOrig['r2'],
-                                                    pearsonCorrOrig['rL'], pearsonPValueOrig['rL'], spearmanCorrOrig['rL'], spearmanPValueOrig['rL'])
+                                                    pearsonCorrOrig['rL'], pearsonPValueOrig['rL'], spearmanCorrOrig['rL'], spearmanPValueOrig['rL'],
+                                                    *([correlationTests[method][testName] for method in ['resp', 'r1', 'r2', 'rL'] for testName in ['pWilliams', 'pPerm', 'sPerm']] +
+                                                      [rankCorrelations['ours'][field] for field in ['kendallTau', 'kendallTauStd', 'pairwiseAccuracy']] +
+                                                      [rankCorrelations[method][field] for method in ['resp', 'r1', 'r2', 'rL'] for field in ['kendallTau', 'pairwiseAccuracy']]))
                                             else:
                                                 lineToOutput = '{},{},{},{},{},{},{},{},{},{},{}\n'.format(
                                                     answerAggregationType,
@@ -1022,4 +1252,11 @@ if __name__ == '__main__':
                                                     ' '.join('{}:{}'.format(sysId, sysScore) for sysId, sysScore in systemScoresOriginal.items()),
                                                     ' '.join('{}:{}'.format(sysId, sysScore) for sysId, sysScore in systemScoresOurs.items()))
                                                     
-                                            outF.write(lineToOutput)
\ No newline at end of file
+                                            outF.write(lineToOutput)
+    
+
+if __name__ == '__main__':
+    MODES = ['-scores', '-corr', '-stability', '-budget', '-signif']
+    if len(sys.argv) > 1 and sys.argv[1] not in MODES:
+        print('Usage: calculateScores.py [-scores|-corr|-stability|-budget|-signif]')
+    main(sys.argv[1] if len(sys.argv) > 1 and sys.argv[1] in MODES else '-scores')
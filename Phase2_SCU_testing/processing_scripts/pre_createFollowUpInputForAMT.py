@@ -0,0 +1,189 @@
+import sys
+import csv
+import ast
+import math
+import numpy as np
+from hitPacker import getHitRows, getPrioritizedQuestionIds, writeHitsCsv, createTaskLayout, TEMPLATE_STATEMENTS_PER_HIT
+
+'''
+Creates a follow-up AMT input file of the system summary evaluation task, that asks for more judgments only on the
+(summary, SCU) items whose answer is still uncertain, instead of giving every HIT the same number of assignments.
+Run: python pre_createFollowUpInputForAMT.py [<path_to_AMT_results_file> ... <path_to_new_output_file>]
+
+The intended use is in rounds: run the first batch (from pre_createInputForAMT.py) with few assignments per HIT (e.g. 3),
+run this script on its results to get the follow-up batch, run the follow-up batch with FOLLOW_UP_ASSIGNMENTS_PER_HIT
+assignments per HIT, and repeat with the results of all the rounds until no item is uncertain.
+
+The answer of an item is estimated from all its answers so far, weighted by the reliability of the workers, which is
+estimated at the same time (EM with a single accuracy per worker):
+    - the log-odds of an item being present is the prior log-odds plus log(accuracy / (1 - accuracy)) of each worker that
+      answered 'p', minus that of each worker that answered 'n' (missing answers are ignored)
+    - the accuracy of a worker is how much the worker agrees with the posteriors of the items it answered (smoothed with
+      a Beta(WORKER_ACCURACY_PRIOR) prior, and kept between 0.5 and MAX_WORKER_ACCURACY, so spammers get no weight)
+An item is uncertain while its posterior is not within UNCERTAINTY_THRESHOLD of 0 or 1, and it has less than
+MAX_ANSWERS_PER_ITEM answers. The number of additional answers it needs is estimated from the average worker accuracy.
+
+The output file has the format of pre_createInputForAMT.py (eventId,summaryId,qIdList,summary_text,statement_1,...), and
+the HITs of a summary hold its uncertain SCUs, completed to STATEMENTS_PER_HIT statements with the most uncertain of its
+other SCUs. The summary texts and SCU texts are taken from the input columns of the results files.
+All the results (of all the rounds) can be written to a single results file (MERGED_RESULTS_FILE) for post_calculateScores.py.
+'''
+
+'''
+The AMT results files of the summary evaluation task so far (the first batch and any previous follow-up batches).
+'''
+RESULTS_FILES = [] # e.g. ['Batch_results.csv', 'Batch_results_followUp1.csv']
+'''
+The path of the follow-up AMT input file to write.
+'''
+OUT_CSV_FILE = '' # e.g. 'AMT_input_followUp1.csv'
+'''
+The path to write all the results files combined into one, to use in post_calculateScores.py (or '' to skip).
+'''
+MERGED_RESULTS_FILE = '' # e.g. 'Batch_results_merged.csv'
+'''
+The number of statements in each follow-up HIT, and the task design layout to write if it is not 16 (see pre_createInputForAMT.py).
+'''
+STATEMENTS_PER_HIT = 16
+OUT_LAYOUT_FILE = '' # e.g. 'task_designLayout_8.html'
+
+### Allocation options:
+# An item is certain once its posterior probability of the other answer is below this:
+UNCERTAINTY_THRESHOLD = 0.05
+# The maximum number of answers an item gets over all the rounds (the NUM_TURKERS_PER_SUMMARY of a uniform batch):
+MAX_ANSWERS_PER_ITEM = 5
+# The number of assignments the follow-up HITs will get (used only for the estimated cost):
+FOLLOW_UP_ASSIGNMENTS_PER_HIT = 2
+# The Beta prior of the worker accuracies (pseudo-counts of agreeing and disagreeing answers), and the maximum accuracy:
+WORKER_ACCURACY_PRIOR = (4.0, 1.0)
+MAX_WORKER_ACCURACY = 0.99
+# The number of EM iterations:
+NUM_EM_ITERATIONS = 20
+
+
+def readResults(resultsFiles):
+    # Read the answers of all the results files, indexed by item (eventId, summaryId, questionId) and worker.
+    # Returns the items [(eventId, summId, qId)], the worker IDs, the answers as arrays (itemIdx, workerIdx, isPresent),
+    # the texts { summId -> summary text } and { (eventId, qId) -> SCU text }, and the rows and fields of all the results files.
+    itemIndices = {} # { (eventId, summId, qId) -> itemIdx }
+    workerIndices = {} # { workerId -> workerIdx }
+    answerItems, answerWorkers, answerValues = [], [], []
+    summaryTexts = {}
+    questionTexts = {}
+    allRows = []
+    allFields = []
+    for resultsFile in resultsFiles:
+        with open(resultsFile, 'r') as inF:
+            csvReader = csv.DictReader(inF)
+            allFields.extend(field for field in csvReader.fieldnames if field not in allFields)
+            for row in csvReader:
+                allRows.append(row)
+                eventId, summId = row['Input.eventId'], row['Input.summaryId']
+                summaryTexts[summId] = row['Input.summary_text']
+                workerIdx = workerIndices.setdefault(row['WorkerId'], len(workerIndices))
+                for qInd, qId in enumerate(ast.literal_eval(row['Input.qIdList'])):
+                    questionTexts[(eventId, qId)] = row['Input.statement_{}'.format(qInd + 1)]
+                    itemIdx = itemIndices.setdefault((eventId, summId, qId), len(itemIndices))
+                    answer = row['Answer.S{}Answer'.format(qInd + 1)]
+                    if answer in ('p', 'n'): # a missing answer gives no information on the item
+                        answerItems.append(itemIdx)
+                        answerWorkers.append(workerIdx)
+                        answerValues.append(answer == 'p')
+
+    items = sorted(itemIndices, key=itemIndices.get)
+    workerIds = sorted(workerIndices, key=workerIndices.get)
+    answers = (np.array(answerItems, dtype=int), np.array(answerWorkers, dtype=int), np.array(answerValues, dtype=bool))
+    return items, workerIds, answers, summaryTexts, questionTexts, allRows, allFields
+
+def estimatePosteriors(numItems, numWorkers, answerItems, answerWorkers, answerValues):
+    # Estimate the posterior log-odds of each item being present, and the accuracy of each worker (EM, on all the answers at once).
+    accuracyAgree, accuracyDisagree = WORKER_ACCURACY_PRIOR
+    answerSigns = np.where(answerValues, 1.0, -1.0)
+    numWorkerAnswers = np.bincount(answerWorkers, minlength=numWorkers)
+    accuracies = np.full(numWorkers, accuracyAgree / (accuracyAgree + accuracyDisagree))
+    presentRate = 0.5
+    for _ in range(NUM_EM_ITERATIONS):
+        # E-step: the posteriors of the items from the weighted answers:
+        workerWeights = np.log(accuracies / (1 - accuracies))
+        logOdds = np.log(presentRate / (1 - presentRate)) + np.bincount(answerItems, weights=workerWeights[answerWorkers] * answerSigns, minlength=numItems)
+        posteriors = 1.0 / (1.0 + np.exp(-logOdds))
+        # M-step: the accuracies of the workers, and the prior of the items:
+        agreements = np.where(answerValues, posteriors[answerItems], 1 - posteriors[answerItems])
+        accuracies = (accuracyAgree + np.bincount(answerWorkers, weights=agreements, minlength=numWorkers)) / \
+            (accuracyAgree + accuracyDisagree + numWorkerAnswers)
+        accuracies = np.clip(accuracies, 0.5, MAX_WORKER_ACCURACY)
+        presentRate = np.clip(posteriors.mean(), 0.01, 0.99)
+    return logOdds, accuracies
+
+def getNeededAnswers(logOdds, numAnswers, accuracies, numWorkerAnswers):
+    # The number of additional answers each item needs to reach the certainty threshold, assuming agreeing answers
+    # of an average worker (weighted by the number of answers of each worker), up to MAX_ANSWERS_PER_ITEM answers.
+    averageAccuracy = np.average(accuracies, weights=numWorkerAnswers) if numWorkerAnswers.sum() > 0 else 0.75
+    averageWeight = math.log(max(averageAccuracy, 0.51) / (1 - max(averageAccuracy, 0.51)))
+    targetLogOdds = math.log((1 - UNCERTAINTY_THRESHOLD) / UNCERTAINTY_THRESHOLD)
+    neededAnswers = np.ceil((targetLogOdds - np.abs(logOdds)) / averageWeight).astype(int)
+    return np.clip(neededAnswers, 0, np.maximum(MAX_ANSWERS_PER_ITEM - numAnswers, 0))
+
+def getFollowUpHitRows(items, neededAnswers, uncertainties, summaryTexts, questionTexts, statementsPerHit):
+    # Get the follow-up HIT rows: for each summary with uncertain items, its uncertain SCUs (most uncertain first),
+    # completed to a multiple of statementsPerHit with its most uncertain other SCUs.
+    summaryItems = {} # { (eventId, summId) -> [itemIdx] }
+    for itemIdx, (eventId, summId, qId) in enumerate(items):
+        summaryItems.setdefault((eventId, summId), []).append(itemIdx)
+
+    hitRows = []
+    for (eventId, summId), itemIndices in summaryItems.items():
+        itemIndices = sorted(itemIndices, key=lambda itemIdx: -uncertainties[itemIdx])
+        questionIds = getPrioritizedQuestionIds([items[itemIdx][2] for itemIdx in itemIndices if neededAnswers[itemIdx] > 0],
+                                                [items[itemIdx][2] for itemIdx in itemIndices if neededAnswers[itemIdx] == 0], statementsPerHit)
+        if len(questionIds) == 0:
+            continue
+        eventQuestions = {qId: questionTexts[(eventId, qId)] for qId in questionIds}
+        hitRows.extend(getHitRows(eventId, summId, summaryTexts[summId], eventQuestions, questionIds, statementsPerHit))
+    return hitRows
+
+def writeMergedResults(mergedResultsFile, allRows, allFields):
+    # Write the rows of all the results files into one results file (with the columns of all of them).
+    with open(mergedResultsFile, 'w') as outF:
+        csvWriter = csv.DictWriter(outF, fieldnames=allFields, restval='', lineterminator='\n')
+        csvWriter.writeheader()
+        csvWriter.writerows(allRows)
+
+
+def main(resultsFiles, outCsvFile, mergedResultsFile='', statementsPerHit=TEMPLATE_STATEMENTS_PER_HIT, outLayoutFile=''):
+    items, workerIds, (answerItems, answerWorkers, answerValues), summaryTexts, questionTexts, allRows, allFields = readResults(resultsFiles)
+    numAnswers = np.bincount(answerItems, minlength=len(items))
+
+    # the posterior of each item and the number of answers it still needs:
+    logOdds, accuracies = estimatePosteriors(len(items), len(workerIds), answerItems, answerWorkers, answerValues)
+    posteriors = 1.0 / (1.0 + np.exp(-logOdds))
+    uncertainties = np.minimum(posteriors, 1 - posteriors)
+    neededAnswers = getNeededAnswers(logOdds, numAnswers, accuracies, np.bincount(answerWorkers, minlength=len(workerIds)))
+
+    hitRows = getFollowUpHitRows(items, neededAnswers, uncertainties, summaryTexts, questionTexts, statementsPerHit)
+    writeHitsCsv(outCsvFile, hitRows, statementsPerHit)
+    if statementsPerHit != TEMPLATE_STATEMENTS_PER_HIT and outLayoutFile != '':
+        createTaskLayout(statementsPerHit, outLayoutFile)
+        print('Use the task design layout in {} (and update the number of statements in the task description).'.format(outLayoutFile))
+    if mergedResultsFile != '':
+        writeMergedResults(mergedResultsFile, allRows, allFields)
+
+    # the allocation compared to giving all the items MAX_ANSWERS_PER_ITEM answers:
+    numUncertain = int((neededAnswers > 0).sum())
+    print('Items: {}, answers so far: {}, workers: {}'.format(len(items), int(numAnswers.sum()), len(workerIds)))
+    print('Certain items: {}, uncertain items: {} (estimated additional answers needed: {})'.format(
+        len(items) - numUncertain, numUncertain, int(neededAnswers.sum())))
+    print('Follow-up HITs: {} ({} judgments with {} assignments per HIT), instead of {} judgments to give all items {} answers'.format(
+        len(hitRows), len(hitRows) * statementsPerHit * FOLLOW_UP_ASSIGNMENTS_PER_HIT, FOLLOW_UP_ASSIGNMENTS_PER_HIT,
+        int(np.maximum(MAX_ANSWERS_PER_ITEM - numAnswers, 0).sum()), MAX_ANSWERS_PER_ITEM))
+    print('Workers with a low estimated accuracy (< 0.6): {}'.format(int((accuracies < 0.6).sum())))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2:
+        RESULTS_FILES = sys.argv[1:-1]
+        OUT_CSV_FILE = sys.argv[-1]
+    elif len(sys.argv) > 1 or len(RESULTS_FILES) == 0:
+        print('Usage: python pre_createFollowUpInputForAMT.py [<path_to_AMT_results_file> ... <path_to_new_output_file>]')
+        sys.exit()
+    main(RESULTS_FILES, OUT_CSV_FILE, MERGED_RESULTS_FILE, STATEMENTS_PER_HIT, OUT_LAYOUT_FILE)
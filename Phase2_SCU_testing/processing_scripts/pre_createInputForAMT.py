@@ -1,6 +1,10 @@
 import os
+import sys
 from random import shuffle
 import csv
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+from summaryCorpus import SummaryCorpus, parseSummaryFilename
+from hitPacker import getEventQuestions, getHitRows, writeHitsCsv, createTaskLayout, cleanText, TEMPLATE_STATEMENTS_PER_HIT
 
 '''
 Creates the input for the MTurk assignment of testing system summaries.
@@ -10,6 +14,8 @@ eventId,summaryId,qIdList,summary_text,statement_1,statement_2,statement_3,state
 
 Since two different batches of 16 SCUs need to be run, create two different AMT input files for this phase,
 one for each SCU batch file from phase 1.
+Alternatively, give both SCU batch files (QUESTIONS_FILE and ADDITIONAL_QUESTIONS_FILES) and set STATEMENTS_PER_HIT,
+to get a single AMT input file with HITs of any number of statements (the header then has that many statement columns).
 '''
 
 '''
@@ -36,55 +42,50 @@ This is the dataset file created in the SCU writing phase with fields:
 eventId, questionId, questionText, answer, author, sourceSummaryId, forUse
 '''
 QUESTIONS_FILE = '' # e.g. '../../Phase1_SCU_writing/processing_scripts/SCUs_batch1.csv'
+'''
+More SCU files to combine with QUESTIONS_FILE, so that the SCUs of all batches are packed together into the HITs.
+'''
+ADDITIONAL_QUESTIONS_FILES = [] # e.g. ['../../Phase1_SCU_writing/processing_scripts/SCUs_batch2.csv']
+'''
+The number of statements in each HIT. The SCUs of each event are split (or combined) into HITs of exactly this many statements.
+If this is not 16, a matching task design layout is written to OUT_LAYOUT_FILE, to be used in AMT instead of the one in the AMT_task folder.
+'''
+STATEMENTS_PER_HIT = 16
+OUT_LAYOUT_FILE = '' # e.g. 'task_designLayout_24.html'
 
 
-# notice that the eventIDs may not have the 'D' prefix, and may need to be added in the questions file eventId column
-
-# get the SCUs to use for all events:
-eventQuestions = {} # { eventId -> { scuID -> SCUtext } }
-eventQuestionsLists = {} # { eventId -> [ scuIDs ] }
-with open(QUESTIONS_FILE, 'r') as inF:
-    csv_reader = csv.DictReader(inF)
-    for row in csv_reader:
-        if row['forUse'] == '1':
-            eventId = row['eventId']
-            qId = row['questionId']
-            qText = row['questionText']
-            eventQuestions.setdefault(eventId, {})[qId] = qText
-            eventQuestionsLists.setdefault(eventId, []).append(qId)
-
-
-csvOutputLines = []
-summFilenames = os.listdir(SUMMARIES_FOLDER)
-for fn in summFilenames:
-    found = False
-    # for the relevant eventIDs and systemIDs, get the texts and SCUs to put in the output file:
-    for eventId in EVENT_IDS:
-        for systemId in SYSTEM_IDS:
-            if fn.startswith(eventId + '.') and fn.endswith('.' + systemId):
-                with open(os.path.join(SUMMARIES_FOLDER, fn), 'r') as fIn:
-                    text = fIn.read()
-                # replace problematic quotation characters:
-                summText = text.replace('\n', ' ').replace('``', '\'\'').replace('"', '\'\'').strip()#.replace(',', '&#44').strip()#'&#44').strip()
-                
-                questionsText = ','.join(['"{}"'.format(eventQuestions[eventId][qId].replace('``', '\'\'').replace('"', '\'\'').strip()) for qId in eventQuestionsLists[eventId]])
-                newLine = '{},{},"{}","{}",{}\n'.format(eventId, fn, str(eventQuestionsLists[eventId]), summText, questionsText)
-                csvOutputLines.append(newLine)
-                
-                found = True
-                break
-        if found:
-            break
-           
-# write out the output:
-shuffle(csvOutputLines)
-with open(OUT_CSV_FILE, 'w') as fOut:
-    fOut.write('eventId,summaryId,qIdList,summary_text,statement_1,statement_2,statement_3,statement_4,statement_5,statement_6,statement_7,statement_8,statement_9,statement_10,statement_11,statement_12,statement_13,statement_14,statement_15,statement_16\n')
-    for outLine in csvOutputLines:
-        fOut.write(outLine)
-        
-        
-for eventId in eventQuestions:
-    print(eventId)
-    for qId in eventQuestions[eventId]:
-        print(eventQuestions[eventId][qId])
\ No newline at end of file
+def main(eventIds, systemIds, summariesFolder, outCsvFile, questionsFiles, statementsPerHit=TEMPLATE_STATEMENTS_PER_HIT, outLayoutFile=''):
+    # notice that the eventIDs may not have the 'D' prefix, and may need to be added in the questions file eventId column
+    
+    # get the SCUs to use for all events:
+    eventQuestions, eventQuestionsLists = getEventQuestions(questionsFiles) # { eventId -> { scuID -> SCUtext } } , { eventId -> [ scuIDs ] }
+    
+    # index the summaries folder (scanned once), and read the relevant summaries in parallel:
+    corpus = SummaryCorpus(summariesFolder)
+    summFilenames = [fn for eventId in eventIds for systemId in systemIds for fn in corpus.getFilenames(eventId, systemId=systemId)]
+    summTexts = corpus.readTexts(summFilenames)
+    
+    csvOutputRows = []
+    for fn in summFilenames:
+        eventId, _, _ = parseSummaryFilename(fn)
+        # for the relevant eventIDs and systemIDs, get the texts and SCUs to put in the output file:
+        summText = cleanText(summTexts[fn])
+        # the HITs of the summary, with the SCUs of the event packed into HITs of statementsPerHit statements:
+        csvOutputRows.extend(getHitRows(eventId, fn, summText, eventQuestions[eventId], eventQuestionsLists[eventId], statementsPerHit))
+               
+    # write out the output:
+    shuffle(csvOutputRows)
+    writeHitsCsv(outCsvFile, csvOutputRows, statementsPerHit)
+    
+    # a task layout with a different number of statements is needed:
+    if statementsPerHit != TEMPLATE_STATEMENTS_PER_HIT and outLayoutFile != '':
+        createTaskLayout(statementsPerHit, outLayoutFile)
+        print('Use the task design layout in {} (and update the number of statements in the task description).'.format(outLayoutFile))
+            
+    for eventId in eventQuestions:
+        print(eventId)
+        for qId in eventQuestions[eventId]:
+            print(eventQuestions[eventId][qId])
+            
+if __name__ == '__main__':
+    main(EVENT_IDS, SYSTEM_IDS, SUMMARIES_FOLDER, OUT_CSV_FILE, [QUESTIONS_FILE] + ADDITIONAL_QUESTIONS_FILES, STATEMENTS_PER_HIT, OUT_LAYOUT_FILE)
\ No newline at end of file
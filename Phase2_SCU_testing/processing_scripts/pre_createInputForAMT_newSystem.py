@@ -2,51 +2,57 @@ import os
 from random import shuffle
 import csv
 import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+from summaryCorpus import SummaryCorpus
+from hitPacker import getEventQuestions, getHitRows, writeHitsCsv, createTaskLayout, cleanText, TEMPLATE_STATEMENTS_PER_HIT
 
 '''
 Creates the input for the MTurk assignment of testing a system summary.
 
 Make sure you have a folder with your system summaries. Each file in the folder contains a system summary, and the name of the file is the event ID.
-Usage: pre_createInputForAMT_newSystem.py <your_system_name> <path_to_summaries_folder> <2005|2006> <path_to_new_output_file_batch1> <path_to_new_output_file_batch2>
-'''
+Usage: pre_createInputForAMT_newSystem.py <your_system_name> <path_to_summaries_folder> <2005|2006> <path_to_new_output_file_batch1> <path_to_new_output_file_batch2> [<statements_per_hit>]
 
-try:
-    SYSTEM_NAME = sys.argv[1]
-    SUMMARIES_FOLDER = sys.argv[2]
-    DUC_YEAR = sys.argv[3]
-    OUT_CSV_FILES = [sys.argv[4], sys.argv[5]]
-except:
-    print('Usage: pre_createInputForAMT_newSystem.py <system_name> <path_to_summaries_folder> <2005|2006> <path_to_new_output_file_batch1> <path_to_new_output_file_batch2>')
-    sys.exit()
+If statements_per_hit is given, the SCUs of both batches are combined and packed into HITs of that many statements,
+and the HITs are split between the two output files. A matching task design layout is then written next to the first output file.
+'''
 
-if DUC_YEAR == '2005':
-    QUESTIONS_FILES = ['Phase1_SCU_writing/dataset/DUC2005/batch1.csv', 'Phase1_SCU_writing/dataset/DUC2005/batch2.csv']
-elif DUC_YEAR == '2006':
-    QUESTIONS_FILES = ['Phase1_SCU_writing/dataset/DUC2006/batch1.csv', 'Phase1_SCU_writing/dataset/DUC2006/batch2.csv']
-else:
-    print('Second argument must be either 2005 or 2006.')
-    sys.exit()
+# the SCU batch files of each DUC year:
+QUESTIONS_FILES = {
+    '2005': ['Phase1_SCU_writing/dataset/DUC2005/batch1.csv', 'Phase1_SCU_writing/dataset/DUC2005/batch2.csv'],
+    '2006': ['Phase1_SCU_writing/dataset/DUC2006/batch1.csv', 'Phase1_SCU_writing/dataset/DUC2006/batch2.csv']}
 
 
 # notice that the eventIDs may not have the 'D' prefix, and may need to be added in the questions file eventId column
 
-# get the SCUs to use for all events:
-for batchNum, questionFile in enumerate(QUESTIONS_FILES):
-    eventQuestions = {} # { eventId -> { scuID -> SCUtext } }
-    eventQuestionsLists = {} # { eventId -> [ scuIDs ] }
-    with open(questionFile, 'r') as inF:
-        csv_reader = csv.DictReader(inF)
-        for row in csv_reader:
-            if row['forUse'] == '1':
-                eventId = row['eventId']
-                qId = row['questionId']
-                qText = row['questionText']
-                eventQuestions.setdefault(eventId, {})[qId] = qText
-                eventQuestionsLists.setdefault(eventId, []).append(qId)
-
+def main(systemName, summariesFolder, ducYear, outCsvFiles, statementsPerHit=None):
+    if ducYear not in QUESTIONS_FILES:
+        print('Second argument must be either 2005 or 2006.')
+        sys.exit()
+    questionsFiles = QUESTIONS_FILES[ducYear]
+    
+    # index the summaries folder (scanned once, and each summary is read once for all batches):
+    corpus = SummaryCorpus(summariesFolder)
+    
+    if statementsPerHit is None:
+        # one output file per SCU batch file, with HITs of 16 statements:
+        for batchNum, questionFile in enumerate(questionsFiles):
+            writeHitsCsv(outCsvFiles[batchNum], getSummariesHitRows(corpus, systemName, [questionFile], TEMPLATE_STATEMENTS_PER_HIT), TEMPLATE_STATEMENTS_PER_HIT)
+    else:
+        # all SCUs packed into HITs of the requested size, split between the output files:
+        csvOutputRows = getSummariesHitRows(corpus, systemName, questionsFiles, statementsPerHit)
+        for batchNum, outCsvFile in enumerate(outCsvFiles):
+            writeHitsCsv(outCsvFile, csvOutputRows[batchNum::len(outCsvFiles)], statementsPerHit)
+        if statementsPerHit != TEMPLATE_STATEMENTS_PER_HIT:
+            outLayoutFile = os.path.splitext(outCsvFiles[0])[0] + '_layout.html'
+            createTaskLayout(statementsPerHit, outLayoutFile)
+            print('Use the task design layout in {} (and update the number of statements in the task description).'.format(outLayoutFile))
 
-    csvOutputLines = []
-    summFilenames = os.listdir(SUMMARIES_FOLDER)
+def getSummariesHitRows(corpus, systemName, questionsFiles, statementsPerHit):
+    # Get the HIT rows of all the summaries, with the SCUs of the given files packed into HITs of statementsPerHit statements.
+    eventQuestions, eventQuestionsLists = getEventQuestions(questionsFiles) # { eventId -> { scuID -> SCUtext } } , { eventId -> [ scuIDs ] }
+    
+    csvOutputRows = []
+    summFilenames = corpus.getAllFilenames()
     for fn in summFilenames:
         # the filename should be the event ID, and it should have SCUs prepared for it:
         eventId = fn
@@ -55,23 +61,22 @@ for batchNum, questionFile in enumerate(QUESTIONS_FILES):
             continue
         
         # get the texts and SCUs to put in the output file:
-        with open(os.path.join(SUMMARIES_FOLDER, fn), 'r') as fIn:
-            text = fIn.read()
-        # replace problematic quotation characters:
-        summText = text.replace('\n', ' ').replace('``', '\'\'').replace('"', '\'\'').strip()#.replace(',', '&#44').strip()#'&#44').strip()
-        
-        questionsText = ','.join(['"{}"'.format(eventQuestions[eventId][qId].replace('``', '\'\'').replace('"', '\'\'').strip()) for qId in eventQuestionsLists[eventId]])
-        newLine = '{},{},"{}","{}",{}\n'.format(eventId, SYSTEM_NAME, str(eventQuestionsLists[eventId]), summText, questionsText)
-        csvOutputLines.append(newLine)
-               
-    # write out the output:
-    shuffle(csvOutputLines)
-    with open(OUT_CSV_FILES[batchNum], 'w') as fOut:
-        fOut.write('eventId,summaryId,qIdList,summary_text,statement_1,statement_2,statement_3,statement_4,statement_5,statement_6,statement_7,statement_8,statement_9,statement_10,statement_11,statement_12,statement_13,statement_14,statement_15,statement_16\n')
-        for outLine in csvOutputLines:
-            fOut.write(outLine)
-            
-    #for eventId in eventQuestions:
-    #    print(eventId)
-    #    for qId in eventQuestions[eventId]:
-    #        print(eventQuestions[eventId][qId])
\ No newline at end of file
+        summText = cleanText(corpus.getText(fn))
+        csvOutputRows.extend(getHitRows(eventId, systemName, summText, eventQuestions[eventId], eventQuestionsLists[eventId], statementsPerHit))
+    
+    shuffle(csvOutputRows)
+    return csvOutputRows
+
+
+if __name__ == '__main__':
+    try:
+        SYSTEM_NAME = sys.argv[1]
+        SUMMARIES_FOLDER = sys.argv[2]
+        DUC_YEAR = sys.argv[3]
+        OUT_CSV_FILES = [sys.argv[4], sys.argv[5]]
+        STATEMENTS_PER_HIT = int(sys.argv[6]) if len(sys.argv) > 6 else None
+    except:
+        print('Usage: pre_createInputForAMT_newSystem.py <system_name> <path_to_summaries_folder> <2005|2006> <path_to_new_output_file_batch1> <path_to_new_output_file_batch2> [<statements_per_hit>]')
+        sys.exit()
+    
+    main(SYSTEM_NAME, SUMMARIES_FOLDER, DUC_YEAR, OUT_CSV_FILES, STATEMENTS_PER_HIT)
@@ -0,0 +1,194 @@
+import os
+import sys
+import csv
+import ast
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+from lexicalOverlap import LexicalScorer
+from hitPacker import getHitRows, getPrioritizedQuestionIds, writeHitsCsv, createTaskLayout, TEMPLATE_STATEMENTS_PER_HIT
+
+'''
+A lexical pre-filter of the system summary evaluation task: the (summary, SCU) pairs where the summary contains the SCU
+almost verbatim are labeled present, and those where they share almost no content words are labeled not present, without
+the crowd. Only the other pairs are sent to AMT.
+Run: python pre_filterByLexicalOverlap.py [-filter|-evaluate]
+    -filter     splits the AMT input file INPUT_CSV_FILE (from pre_createInputForAMT*.py) into an AMT input file of the
+                undecided pairs (OUT_CSV_FILE) and the labels of the decided pairs (AUTO_LABELS_RESULTS_FILE) (default)
+    -evaluate   measures the agreement of the pre-filter labels with the crowd on an existing AMT results file (EVALUATION_RESULTS_FILE)
+
+The measures of a pair are the lemma overlap and the n-gram containment of the SCU in the summary (see common/lexicalOverlap.py):
+    - present:      lemma overlap >= PRESENT_LEMMA_OVERLAP and n-gram containment >= PRESENT_NGRAM_CONTAINMENT
+    - not present:  lemma overlap <= ABSENT_LEMMA_OVERLAP
+Check the thresholds with -evaluate before using -filter on a new dataset.
+
+The labels of the decided pairs are written in the AMT results format, as the answers of a single pseudo-worker
+(PREFILTER_WORKER_ID), so that they can be scored along with the crowd's answers: combine the two results files with
+MERGED_RESULTS_FILE in pre_createFollowUpInputForAMT.py, and use the merged file in post_calculateScores.py.
+(The pseudo-worker's question sets are never those of a crowd HIT, so it is not compared to other workers, neither in the worker
+agreement filtering nor in the event agreement filtering (EVENT_FILTER_PERCENT), which skip the question sets of a single worker.)
+'''
+
+'''
+The AMT input file to filter (-filter), and the AMT input file of the undecided pairs to write.
+'''
+INPUT_CSV_FILE = '' # e.g. 'AMT_input.csv'
+OUT_CSV_FILE = '' # e.g. 'AMT_input_filtered.csv'
+'''
+The AMT results-format file to write the labels of the decided pairs to (-filter).
+'''
+AUTO_LABELS_RESULTS_FILE = '' # e.g. 'Batch_results_prefilter.csv'
+'''
+The number of statements in each HIT of the filtered AMT input file, and the task design layout to write if it is not 16
+(see pre_createInputForAMT.py). The HITs of a summary hold its undecided SCUs, completed with its decided ones.
+'''
+STATEMENTS_PER_HIT = 16
+OUT_LAYOUT_FILE = '' # e.g. 'task_designLayout_8.html'
+'''
+The AMT results file of the task to evaluate the pre-filter on (-evaluate), and an optional CSV file to write the measures,
+the pre-filter label and the crowd label of each pair to (for tuning the thresholds).
+'''
+EVALUATION_RESULTS_FILE = '' # e.g. 'Batch_results.csv'
+EVALUATION_OUTPUT_FILE = '' # e.g. 'prefilter_pairs.csv'
+
+### Pre-filter options:
+# The lemmatizer ('spacy' or 'simple', see common/lexicalOverlap.py) and the size of the n-grams:
+LEMMATIZER = 'spacy'
+NGRAM_SIZE = 2
+# The thresholds of the present and not present labels:
+PRESENT_LEMMA_OVERLAP = 0.9
+PRESENT_NGRAM_CONTAINMENT = 0.6
+ABSENT_LEMMA_OVERLAP = 0.2
+# The worker ID of the pre-filter labels in the results file:
+PREFILTER_WORKER_ID = 'LEXICAL_PREFILTER'
+
+
+def readPairs(inputFile, fieldPrefix=''):
+    # Read the (summary, SCU) pairs of an AMT input file (or, with fieldPrefix 'Input.', of an AMT results file).
+    # Returns { (eventId, summId) -> summary text }, { (eventId, summId) -> [qIds] } and { (eventId, qId) -> SCU text }.
+    summaryTexts = {}
+    summaryQuestionIds = {}
+    questionTexts = {}
+    with open(inputFile, 'r') as inF:
+        for row in csv.DictReader(inF):
+            summaryKey = (row[fieldPrefix + 'eventId'], row[fieldPrefix + 'summaryId'])
+            summaryTexts[summaryKey] = row[fieldPrefix + 'summary_text']
+            questionIds = summaryQuestionIds.setdefault(summaryKey, [])
+            for qInd, qId in enumerate(ast.literal_eval(row[fieldPrefix + 'qIdList'])):
+                questionTexts[(summaryKey[0], qId)] = row['{}statement_{}'.format(fieldPrefix, qInd + 1)]
+                if qId not in questionIds: # the last HIT of a summary may repeat SCUs
+                    questionIds.append(qId)
+    return summaryTexts, summaryQuestionIds, questionTexts
+
+def getPrefilterLabels(summaryTexts, summaryQuestionIds, questionTexts):
+    # Label all the pairs at once: { (eventId, summId, qId) -> ('p'/'n'/'' for undecided, lemmaOverlap, ngramContainment) }
+    pairKeys = [(eventId, summId, qId) for (eventId, summId) in summaryQuestionIds for qId in summaryQuestionIds[(eventId, summId)]]
+    scorer = LexicalScorer(LEMMATIZER, NGRAM_SIZE)
+    overlaps = scorer.getOverlaps([(questionTexts[(eventId, qId)], summaryTexts[(eventId, summId)]) for eventId, summId, qId in pairKeys])
+    labels = {}
+    for pairKey, (lemmaOverlap, ngramContainment) in zip(pairKeys, overlaps):
+        if lemmaOverlap >= PRESENT_LEMMA_OVERLAP and ngramContainment >= PRESENT_NGRAM_CONTAINMENT:
+            label = 'p'
+        elif lemmaOverlap <= ABSENT_LEMMA_OVERLAP:
+            label = 'n'
+        else:
+            label = ''
+        labels[pairKey] = (label, lemmaOverlap, ngramContainment)
+    return labels
+
+def writeAutoLabels(outputFile, labels, summaryTexts, summaryQuestionIds, questionTexts):
+    # Write the labels of the decided pairs as an AMT results file: a row (assignment of the pseudo-worker) per summary.
+    rows = []
+    for hitNum, (eventId, summId) in enumerate(sorted(summaryQuestionIds)):
+        questionIds = [qId for qId in summaryQuestionIds[(eventId, summId)] if labels[(eventId, summId, qId)][0] != '']
+        if len(questionIds) > 0:
+            rows.append((hitNum, eventId, summId, questionIds))
+    maxStatements = max([len(questionIds) for _, _, _, questionIds in rows] + [1])
+    with open(outputFile, 'w') as outF:
+        csvWriter = csv.writer(outF, lineterminator='\n')
+        csvWriter.writerow(['HITId', 'AssignmentId', 'WorkerId', 'AssignmentStatus', 'Input.eventId', 'Input.summaryId', 'Input.qIdList', 'Input.summary_text'] +
+                           ['Input.statement_{}'.format(sNum) for sNum in range(1, maxStatements + 1)] +
+                           ['Answer.S{}Answer'.format(sNum) for sNum in range(1, maxStatements + 1)])
+        for hitNum, eventId, summId, questionIds in rows:
+            padding = [''] * (maxStatements - len(questionIds))
+            csvWriter.writerow(['PREFILTER{:08d}'.format(hitNum + 1), 'PREFILTER{:08d}'.format(hitNum + 1), PREFILTER_WORKER_ID, 'Submitted',
+                                eventId, summId, str(questionIds), summaryTexts[(eventId, summId)]] +
+                               [questionTexts[(eventId, qId)] for qId in questionIds] + padding +
+                               [labels[(eventId, summId, qId)][0] for qId in questionIds] + padding)
+
+def filterInput(inputCsvFile, outCsvFile, autoLabelsResultsFile, statementsPerHit=TEMPLATE_STATEMENTS_PER_HIT, outLayoutFile=''):
+    summaryTexts, summaryQuestionIds, questionTexts = readPairs(inputCsvFile)
+    labels = getPrefilterLabels(summaryTexts, summaryQuestionIds, questionTexts)
+
+    # the HITs of the undecided pairs of each summary:
+    hitRows = []
+    for (eventId, summId), allQuestionIds in summaryQuestionIds.items():
+        questionIds = getPrioritizedQuestionIds([qId for qId in allQuestionIds if labels[(eventId, summId, qId)][0] == ''],
+                                                [qId for qId in allQuestionIds if labels[(eventId, summId, qId)][0] != ''], statementsPerHit)
+        if len(questionIds) > 0:
+            eventQuestions = {qId: questionTexts[(eventId, qId)] for qId in questionIds}
+            hitRows.extend(getHitRows(eventId, summId, summaryTexts[(eventId, summId)], eventQuestions, questionIds, statementsPerHit))
+    writeHitsCsv(outCsvFile, hitRows, statementsPerHit)
+    if statementsPerHit != TEMPLATE_STATEMENTS_PER_HIT and outLayoutFile != '':
+        createTaskLayout(statementsPerHit, outLayoutFile)
+        print('Use the task design layout in {} (and update the number of statements in the task description).'.format(outLayoutFile))
+    writeAutoLabels(autoLabelsResultsFile, labels, summaryTexts, summaryQuestionIds, questionTexts)
+
+    numPresent = len([pairKey for pairKey in labels if labels[pairKey][0] == 'p'])
+    numAbsent = len([pairKey for pairKey in labels if labels[pairKey][0] == 'n'])
+    print('Pairs: {}, labeled present: {}, labeled not present: {}, undecided: {}'.format(
+        len(labels), numPresent, numAbsent, len(labels) - numPresent - numAbsent))
+    print('HITs: {} (of {} statements)'.format(len(hitRows), statementsPerHit))
+
+def evaluatePrefilter(resultsFile, evaluationOutputFile=''):
+    # Compare the pre-filter labels to the majority answer of the crowd on each pair of the results file.
+    summaryTexts, summaryQuestionIds, questionTexts = readPairs(resultsFile, 'Input.')
+    labels = getPrefilterLabels(summaryTexts, summaryQuestionIds, questionTexts)
+
+    # the crowd answers of each pair:
+    crowdAnswers = {} # { (eventId, summId, qId) -> [answers] }
+    with open(resultsFile, 'r') as inF:
+        for row in csv.DictReader(inF):
+            for qInd, qId in enumerate(ast.literal_eval(row['Input.qIdList'])):
+                answer = row['Answer.S{}Answer'.format(qInd + 1)]
+                if answer in ('p', 'n'):
+                    crowdAnswers.setdefault((row['Input.eventId'], row['Input.summaryId'], qId), []).append(answer)
+
+    # the majority label of the crowd ('' for a tie or no answers):
+    crowdLabels = {}
+    for pairKey in labels:
+        answers = crowdAnswers.get(pairKey, [])
+        numPresent = answers.count('p')
+        crowdLabels[pairKey] = 'p' if numPresent * 2 > len(answers) else ('n' if numPresent * 2 < len(answers) else '')
+
+    print('Pairs: {}'.format(len(labels)))
+    for label, labelName in [('p', 'present'), ('n', 'not present')]:
+        pairKeys = [pairKey for pairKey in labels if labels[pairKey][0] == label and crowdLabels[pairKey] != '']
+        numAgree = len([pairKey for pairKey in pairKeys if crowdLabels[pairKey] == label])
+        print('Labeled {}: {} ({:.1%} of the pairs), agreement with the crowd: {}'.format(labelName, len(pairKeys),
+            float(len(pairKeys)) / max(len(labels), 1), float(numAgree) / len(pairKeys) if len(pairKeys) > 0 else '-'))
+    decidedKeys = [pairKey for pairKey in labels if labels[pairKey][0] != '' and crowdLabels[pairKey] != '']
+    print('Judgments saved: {:.1%}, overall agreement with the crowd: {}'.format(
+        float(len([pairKey for pairKey in labels if labels[pairKey][0] != ''])) / max(len(labels), 1),
+        float(len([pairKey for pairKey in decidedKeys if labels[pairKey][0] == crowdLabels[pairKey]])) / len(decidedKeys) if len(decidedKeys) > 0 else '-'))
+
+    if evaluationOutputFile != '':
+        with open(evaluationOutputFile, 'w') as outF:
+            csvWriter = csv.writer(outF, lineterminator='\n')
+            csvWriter.writerow(['eventId', 'summaryId', 'questionId', 'lemmaOverlap', 'ngramContainment', 'prefilterLabel', 'crowdLabel', 'numCrowdAnswers'])
+            for pairKey in sorted(labels):
+                label, lemmaOverlap, ngramContainment = labels[pairKey]
+                csvWriter.writerow(list(pairKey) + [round(lemmaOverlap, 4), round(ngramContainment, 4), label, crowdLabels[pairKey], len(crowdAnswers.get(pairKey, []))])
+
+
+def main(mode='-filter'):
+    if mode == '-evaluate':
+        evaluatePrefilter(EVALUATION_RESULTS_FILE, EVALUATION_OUTPUT_FILE)
+    else:
+        filterInput(INPUT_CSV_FILE, OUT_CSV_FILE, AUTO_LABELS_RESULTS_FILE, STATEMENTS_PER_HIT, OUT_LAYOUT_FILE)
+
+
+if __name__ == '__main__':
+    MODES = ['-filter', '-evaluate']
+    if len(sys.argv) > 1 and sys.argv[1] not in MODES:
+        print('Usage: python pre_filterByLexicalOverlap.py [-filter|-evaluate]')
+        sys.exit()
+    main(sys.argv[1] if len(sys.argv) > 1 else '-filter')
@@ -0,0 +1,210 @@
+import sys
+import json
+import itertools
+import traceback
+try:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+except ImportError:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+from litePyramidScoring import getRawData, computeScores, getConfiguration, ScoringStages, DEFAULT_CONFIGURATION
+import post_calculateScores
+
+'''
+A long-running local scoring server, that loads the datasets once and answers scoring, correlation and sweep queries
+from the in-memory data, instead of running post_calculateScores.py (and re-reading all the files) for every query.
+Run (with python 2 or 3): python scoringServer.py [<datasetName> <path_to_AMT_results_file> [<manual_scores_file> <rouge_scores_file>]]
+(or set the DATASETS variable below to load several datasets)
+
+The server listens on SERVER_HOST:SERVER_PORT (localhost only by default) and handles the requests concurrently, in threads.
+The stages before the iterations (see ScoringStages in litePyramidScoring.py) are kept per dataset and shared by all the requests.
+Requests and responses are JSON:
+    GET  /datasets          { datasetName -> {'numEvents', 'numSummaries', 'hasOriginalScores'} }
+    POST /scores            {'dataset', 'configuration', 'summaryScores' (optional, default false)}
+                            -> {'configuration', 'systemScores': { systemId -> score }, 'summaryScores': { eventId -> { summId -> score } }}
+    POST /correlations      {'dataset', 'configuration'}
+                            -> {'configuration', 'pearsonCorr', 'pearsonCorrStd', 'pearsonPVal', 'spearmanCorr', 'spearmanCorrStd', 'spearmanPVal',
+                                'kendallTau', 'kendallTauStd', 'pairwiseAccuracy',
+                                'systemScores', 'systemScoresOriginal', 'originalCorrelations': { <'resp'/'r1'/'r2'/'rL'> -> {'pearsonCorr', ...,
+                                'differenceTests': {'pWilliams', 'pPerm', 'sPerm'}} }} (see getCorrelationDifferenceTests in post_calculateScores.py)
+    POST /sweep             {'dataset', 'configurations': { PARAMETER -> [values] }, 'correlations' (optional, default false)}
+                            -> {'results': [<the /scores or /correlations response of each configuration in the grid>]}
+A configuration is a dictionary of the configuration parameters (see DEFAULT_CONFIGURATION in litePyramidScoring.py), and
+missing parameters get their default values. The correlations need the original scores of the dataset (the manual scores file
+and the ROUGE scores file, or a score store file, as in post_calculateScores.py).
+Errors are returned with status 400 (or 404 for an unknown path, or 500 for a failure of the scoring itself) as {'error': <message>}.
+'''
+
+'''
+The host and port to listen on.
+'''
+SERVER_HOST = 'localhost'
+SERVER_PORT = 8765
+'''
+The datasets to load: { datasetName -> { setting -> value } } with the settings:
+    RESULTS_FILE_INPUT      the AMT results file (as in post_calculateScores.py)
+    MANUAL_SCORES_FILE      the manual scores file (as in post_calculateScores.py), or '' for no correlations
+    ROUGE_SCORES_FILE       the ROUGE scores file (as in post_calculateScores.py)
+    SCORE_STORE_FILE        instead of the scores files, a score store file (optional)
+    SCORE_STORE_DATASET     the dataset in the score store file (optional)
+e.g. {'2006': {'RESULTS_FILE_INPUT': 'Batch_results.csv', 'MANUAL_SCORES_FILE': '../score_extraction/2006ManualScoresAvg.csv',
+               'ROUGE_SCORES_FILE': '../score_extraction/2006RougeScoresAvg.csv'}}
+'''
+DATASETS = {}
+'''
+Whether to log each request to stderr.
+'''
+LOG_REQUESTS = False
+
+
+class ScoringDataset(object):
+    # The in-memory data of a dataset: the raw judgments, the original scores (if given) and the shared scoring stages.
+
+    def __init__(self, settings):
+        self.rawDataValues, self.questionIdsPerEvent = getRawData(settings['RESULTS_FILE_INPUT'])
+        scoreStoreFile = settings.get('SCORE_STORE_FILE', '')
+        if settings.get('MANUAL_SCORES_FILE', '') != '' or scoreStoreFile != '':
+            self.systemScoresAllOrig = post_calculateScores.readOriginalScoresData(settings.get('MANUAL_SCORES_FILE', ''), settings.get('ROUGE_SCORES_FILE', ''),
+                scoreStoreFile=scoreStoreFile, scoreStoreDataset=settings.get('SCORE_STORE_DATASET', ''))
+        else:
+            self.systemScoresAllOrig = None
+        self.stages = ScoringStages(self.rawDataValues, self.questionIdsPerEvent)
+
+    def getInfo(self):
+        return {'numEvents': len(self.rawDataValues),
+                'numSummaries': sum(len(self.rawDataValues[eventId]) for eventId in self.rawDataValues),
+                'hasOriginalScores': self.systemScoresAllOrig is not None}
+
+    def getScores(self, configuration, withSummaryScores=False):
+        scores = computeScores(self.rawDataValues, self.questionIdsPerEvent, configuration, self.stages, post_calculateScores.getIterationSampler())
+        response = {'configuration': scores.configuration, 'systemScores': scores.systemScores}
+        if withSummaryScores:
+            response['summaryScores'] = scores.summaryScores
+        return response
+
+    def getCorrelations(self, configuration):
+        if self.systemScoresAllOrig is None:
+            raise ValueError('The dataset has no original scores to correlate to')
+        configuration = getConfiguration(configuration)
+        pearsonCorr, pearsonCorrStd, pearsonPVal, spearmanCorr, spearmanCorrStd, spearmanPVal, \
+            systemScoresOurs, systemScoresOriginal, \
+            pearsonCorrOrig, pearsonPValueOrig, spearmanCorrOrig, spearmanPValueOrig, correlationTests, rankCorrelations = \
+            post_calculateScores.computeScoresAndCorrelations(self.rawDataValues, self.questionIdsPerEvent, self.systemScoresAllOrig, configuration, False, self.stages)
+        return {'configuration': configuration,
+                'pearsonCorr': float(pearsonCorr), 'pearsonCorrStd': float(pearsonCorrStd), 'pearsonPVal': float(pearsonPVal),
+                'spearmanCorr': float(spearmanCorr), 'spearmanCorrStd': float(spearmanCorrStd), 'spearmanPVal': float(spearmanPVal),
+                'kendallTau': float(rankCorrelations['ours']['kendallTau']), 'kendallTauStd': float(rankCorrelations['ours']['kendallTauStd']),
+                'pairwiseAccuracy': float(rankCorrelations['ours']['pairwiseAccuracy']),
+                'systemScores': systemScoresOurs, 'systemScoresOriginal': systemScoresOriginal,
+                'originalCorrelations': {method: {'pearsonCorr': float(pearsonCorrOrig[method]), 'pearsonPVal': float(pearsonPValueOrig[method]),
+                                                  'spearmanCorr': float(spearmanCorrOrig[method]), 'spearmanPVal': float(spearmanPValueOrig[method]),
+                                                  'kendallTau': float(rankCorrelations[method]['kendallTau']), 'pairwiseAccuracy': float(rankCorrelations[method]['pairwiseAccuracy']),
+                                                  'differenceTests': {testName: float(pValue) for testName, pValue in correlationTests[method].items()}}
+                                         for method in pearsonCorrOrig}}
+
+    def getSweep(self, configurations, withCorrelations=False):
+        # run each configuration in the grid of the given parameter values:
+        parameterNames = sorted(configurations)
+        results = []
+        for parameterValues in itertools.product(*[configurations[parameterName] for parameterName in parameterNames]):
+            configuration = dict(zip(parameterNames, parameterValues))
+            results.append(self.getCorrelations(configuration) if withCorrelations else self.getScores(configuration))
+        return {'results': results}
+
+
+class ScoringServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, datasets):
+        HTTPServer.__init__(self, address, ScoringRequestHandler)
+        self.datasets = datasets # { datasetName -> ScoringDataset }
+
+
+class ScoringRequestHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path == '/datasets':
+            self._sendJson(200, {datasetName: dataset.getInfo() for datasetName, dataset in self.server.datasets.items()})
+        else:
+            self._sendJson(404, {'error': 'Unknown path: {}'.format(self.path)})
+
+    def do_POST(self):
+        if self.path not in ('/scores', '/correlations', '/sweep'):
+            self._sendJson(404, {'error': 'Unknown path: {}'.format(self.path)})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8'))
+            dataset = self._getDataset(request)
+            if self.path == '/sweep':
+                configurations = request.get('configurations', {})
+                for parameterName in configurations:
+                    _checkParameterName(parameterName)
+                response = dataset.getSweep(configurations, request.get('correlations', False))
+            else:
+                configuration = request.get('configuration', {})
+                for parameterName in configuration:
+                    _checkParameterName(parameterName)
+                if self.path == '/scores':
+                    response = dataset.getScores(configuration, request.get('summaryScores', False))
+                else:
+                    response = dataset.getCorrelations(configuration)
+        except (ValueError, KeyError, TypeError) as e:
+            self._sendJson(400, {'error': str(e)})
+            return
+        except Exception as e:
+            # any other failure of the scoring (e.g. a configuration value it can't work with) fails only this request,
+            # and is also logged to stderr (it may be a bug rather than a bad request):
+            traceback.print_exc()
+            self._sendJson(500, {'error': '{}: {}'.format(type(e).__name__, e)})
+            return
+        self._sendJson(200, response)
+
+    def _getDataset(self, request):
+        datasetName = request.get('dataset')
+        if datasetName not in self.server.datasets:
+            raise ValueError('Unknown dataset: {}'.format(datasetName))
+        return self.server.datasets[datasetName]
+
+    def _sendJson(self, status, content):
+        body = json.dumps(content).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if LOG_REQUESTS:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+def _checkParameterName(parameterName):
+    if parameterName not in DEFAULT_CONFIGURATION:
+        raise ValueError('Unknown configuration parameter: {}'.format(parameterName))
+
+
+def main(datasetsSettings, host, port):
+    # load all the datasets, and serve until interrupted:
+    datasets = {}
+    for datasetName, settings in datasetsSettings.items():
+        print('Loading dataset {}...'.format(datasetName))
+        datasets[datasetName] = ScoringDataset(settings)
+    server = ScoringServer((host, port), datasets)
+    print('Serving {} dataset(s) on http://{}:{}'.format(len(datasets), host, port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2:
+        DATASETS = {sys.argv[1]: {'RESULTS_FILE_INPUT': sys.argv[2],
+                                  'MANUAL_SCORES_FILE': sys.argv[3] if len(sys.argv) > 4 else '',
+                                  'ROUGE_SCORES_FILE': sys.argv[4] if len(sys.argv) > 4 else ''}}
+    elif len(sys.argv) > 1 or len(DATASETS) == 0:
+        print('Usage: python scoringServer.py [<datasetName> <path_to_AMT_results_file> [<manual_scores_file> <rouge_scores_file>]]')
+        sys.exit()
+    main(DATASETS, SERVER_HOST, SERVER_PORT)
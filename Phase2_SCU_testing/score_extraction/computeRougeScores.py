@@ -0,0 +1,253 @@
+import os
+import re
+import sys
+from collections import Counter
+from multiprocessing import Pool
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+from summaryCorpus import SummaryCorpus, parseSummaryFilename
+
+'''
+This script computes ROUGE-1, ROUGE-2 and ROUGE-L scores of system summaries against reference summaries, without the external
+ROUGE Perl toolkit. It outputs the scores to a CSV file in the same format as the getRougeScores.py script (the ROUGE variants
+that are not computed here are left blank), so that it can be used when calculating correlations in the phase2 post-scripts.
+The post-scripts can also call computeRougeScores directly and use the scores in memory.
+
+Provide the system summaries folder (peers), the reference summaries folder (models) and the output file.
+The summary filenames are DUC-style, e.g. "D0601.M.250.A.16" (eventId.M.length.assessorId.systemId). A peer file named only
+by its event ID (like in the newSystem scripts) is given the system ID passed to computeRougeScores.
+
+The scores follow ROUGE-1.5.5 as run in DUC (-f A, alpha 0.5, with jackknifing):
+    - Texts are lowercased and non-alphanumeric characters are replaced by spaces, and words are optionally Porter stemmed.
+    - With several references, the n-gram (or LCS) hits and counts are summed over the references.
+    - A system summary is scored against each subset of all-but-one references, and the scores are averaged.
+      A reference summary (a peer that is also one of the models) is scored against the other references.
+    - ROUGE-L is computed over the whole summary as one sequence (not as the union LCS over sentences).
+Each summary is tokenized once, the n-grams are counted with hashed Counters, and each (peer, reference) pair is compared once
+and reused for all the jackknifing subsets. The events are scored in parallel.
+'''
+
+'''
+The folder of the system summaries to score.
+2006: e.g. '../../../DUC_data/2006/NISTeval/ROUGE/peers'
+'''
+PEERS_FOLDER = ''
+'''
+The folder of the reference summaries.
+2006: e.g. '../../../DUC_data/2006/NISTeval/ROUGE/models'
+'''
+MODELS_FOLDER = ''
+'''
+The file to output to.
+'''
+OUTPUT_CSV_FILE = '' # e.g. '2006RougeScoresComputed.csv'
+'''
+Whether to Porter stem the words (requires nltk, otherwise the words are not stemmed).
+'''
+USE_STEMMING = True
+'''
+The number of words to truncate the summaries to (as with the -l option of ROUGE), or 0 for no truncation.
+'''
+LENGTH_LIMIT_WORDS = 250
+'''
+The number of processes to use for scoring the events.
+'''
+NUM_PROCESSES = 4
+
+
+
+# the ROUGE variants in the getRougeScores.py output, and the ones computed here:
+OUTPUT_ROUGE_VARIANTS = ['ROUGE-1', 'ROUGE-2', 'ROUGE-3', 'ROUGE-4', 'ROUGE-L', 'ROUGE-W-1.2', 'ROUGE-SU4']
+COMPUTED_ROUGE_VARIANTS = ['ROUGE-1', 'ROUGE-2', 'ROUGE-L']
+METRICS = ['recall', 'precision', 'f1']
+
+_stemmer = None
+_tokensCache = {} # { (text, useStemming, lengthLimit) -> [tokens] } within a process
+
+def main(peersFolder, modelsFolder, outputCsvFile):
+    rougeScores = computeRougeScores(peersFolder, modelsFolder, useStemming=USE_STEMMING, lengthLimit=LENGTH_LIMIT_WORDS, numProcesses=NUM_PROCESSES)
+    writeRougeScoresCsv(rougeScores, outputCsvFile)
+
+def computeRougeScores(peersFolder, modelsFolder, eventIds=None, defaultSystemId=None, useStemming=USE_STEMMING,
+                       lengthLimit=LENGTH_LIMIT_WORDS, numProcesses=NUM_PROCESSES):
+    # Score all the peer summaries (of the given events, or all events with references).
+    # Returns { systemId -> { eventId -> { rougeVariant -> (recall, precision, f1) } } }.
+    peersCorpus = SummaryCorpus(peersFolder)
+    modelsCorpus = SummaryCorpus(modelsFolder)
+    if eventIds is None:
+        eventIds = sorted(modelsCorpus.getEventIds())
+
+    # put together the texts of each event (read in parallel):
+    eventTasks = []
+    for eventId in eventIds:
+        modelFilenames = sorted(modelsCorpus.getFilenames(eventId))
+        peerFilenames = sorted(peersCorpus.getFilenames(eventId))
+        if len(modelFilenames) == 0 or len(peerFilenames) == 0:
+            continue
+        modelTexts = modelsCorpus.readTexts(modelFilenames)
+        peerTexts = peersCorpus.readTexts(peerFilenames)
+        models = [(fn, parseSummaryFilename(fn)[2], modelTexts[fn]) for fn in modelFilenames]
+        peers = []
+        for fn in peerFilenames:
+            systemId = parseSummaryFilename(fn)[2]
+            peers.append((fn, systemId if systemId is not None else defaultSystemId, peerTexts[fn]))
+        eventTasks.append((eventId, peers, models, useStemming, lengthLimit))
+
+    # score the events:
+    if numProcesses > 1 and len(eventTasks) > 1:
+        pool = Pool(min(numProcesses, len(eventTasks)))
+        try:
+            eventResults = pool.map(_scoreEvent, eventTasks)
+        finally:
+            pool.close()
+    else:
+        eventResults = [_scoreEvent(eventTask) for eventTask in eventTasks]
+
+    rougeScores = {}
+    for eventId, eventScores in eventResults:
+        for systemId, variantScores in eventScores:
+            rougeScores.setdefault(systemId, {})[eventId] = variantScores
+    return rougeScores
+
+def _scoreEvent(eventTask):
+    # Score the peers of one event against its models. Returns (eventId, [(systemId, { rougeVariant -> (R, P, F) })]).
+    eventId, peers, models, useStemming, lengthLimit = eventTask
+
+    # the n-gram counts and LCS match masks of the references are prepared once for all the peers:
+    modelsStats = []
+    for modelFilename, modelSystemId, modelText in models:
+        tokens = getRougeTokens(modelText, useStemming, lengthLimit)
+        modelsStats.append((modelFilename, modelSystemId, tokens, getNgramCounts(tokens, 1), getNgramCounts(tokens, 2), getLcsMatchMasks(tokens)))
+
+    eventScores = []
+    for peerFilename, systemId, peerText in peers:
+        peerTokens = getRougeTokens(peerText, useStemming, lengthLimit)
+        peerUnigrams = getNgramCounts(peerTokens, 1)
+        peerBigrams = getNgramCounts(peerTokens, 2)
+
+        # the hits and counts against each reference (a reference is not compared to itself):
+        pairStats = [] # [ { rougeVariant -> (hits, modelCount, peerCount) } ]
+        for modelFilename, modelSystemId, modelTokens, modelUnigrams, modelBigrams, modelMasks in modelsStats:
+            if modelFilename == peerFilename or (modelSystemId is not None and modelSystemId == systemId):
+                continue
+            pairStats.append({
+                'ROUGE-1': (getNgramHits(peerUnigrams, modelUnigrams), sum(modelUnigrams.values()), sum(peerUnigrams.values())),
+                'ROUGE-2': (getNgramHits(peerBigrams, modelBigrams), sum(modelBigrams.values()), sum(peerBigrams.values())),
+                'ROUGE-L': (getLcsLength(modelMasks, len(modelTokens), peerTokens), len(modelTokens), len(peerTokens))})
+        if len(pairStats) == 0:
+            continue
+
+        # jackknifing over the references when the peer was compared to all of them:
+        if len(pairStats) == len(modelsStats) and len(pairStats) > 1:
+            referenceSubsets = [pairStats[:i] + pairStats[i + 1:] for i in range(len(pairStats))]
+        else:
+            referenceSubsets = [pairStats]
+
+        variantScores = {}
+        for rougeVariant in COMPUTED_ROUGE_VARIANTS:
+            subsetScores = [getMultiReferenceScore([stats[rougeVariant] for stats in subset]) for subset in referenceSubsets]
+            variantScores[rougeVariant] = tuple(sum(scores[i] for scores in subsetScores) / len(subsetScores) for i in range(3))
+        eventScores.append((systemId, variantScores))
+
+    return eventId, eventScores
+
+def getRougeTokens(text, useStemming=USE_STEMMING, lengthLimit=LENGTH_LIMIT_WORDS):
+    # Tokenize the text like ROUGE: lowercase, non-alphanumeric characters as separators, optionally stemmed and truncated.
+    cacheKey = (text, useStemming, lengthLimit)
+    if cacheKey not in _tokensCache:
+        tokens = re.sub(r'[^a-z0-9]+', ' ', text.lower()).split()
+        if lengthLimit > 0:
+            tokens = tokens[:lengthLimit]
+        if useStemming:
+            stemmer = _getStemmer()
+            if stemmer is not None:
+                tokens = [stemmer.stem(token) if len(token) > 3 else token for token in tokens]
+        _tokensCache[cacheKey] = tokens
+    return _tokensCache[cacheKey]
+
+def getNgramCounts(tokens, n):
+    return Counter(tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+
+def getNgramHits(peerCounts, modelCounts):
+    # the clipped number of n-grams of the peer that are in the model:
+    if len(peerCounts) > len(modelCounts):
+        peerCounts, modelCounts = modelCounts, peerCounts
+    return sum(min(count, modelCounts[ngram]) for ngram, count in peerCounts.items() if ngram in modelCounts)
+
+def getLcsMatchMasks(tokens):
+    # { token -> bitmask of the positions of the token in the sequence }
+    masks = {}
+    for i, token in enumerate(tokens):
+        masks[token] = masks.get(token, 0) | (1 << i)
+    return masks
+
+def getLcsLength(modelMasks, modelLength, peerTokens):
+    # The length of the longest common subsequence with the bit-parallel algorithm (Allison-Dix / Hyyro),
+    # processing a whole row of the dynamic programming table with a few integer operations per peer token.
+    allBits = (1 << modelLength) - 1
+    row = allBits
+    for token in peerTokens:
+        matches = row & modelMasks.get(token, 0)
+        row = ((row + matches) | (row - matches)) & allBits
+    return modelLength - bin(row).count('1')
+
+def getMultiReferenceScore(referenceStats):
+    # Get the (recall, precision, f1) from the [(hits, modelCount, peerCount)] over a set of references.
+    totalHits = sum(hits for hits, _, _ in referenceStats)
+    totalModelCount = sum(modelCount for _, modelCount, _ in referenceStats)
+    totalPeerCount = sum(peerCount for _, _, peerCount in referenceStats)
+    recall = float(totalHits) / totalModelCount if totalModelCount > 0 else 0.0
+    precision = float(totalHits) / totalPeerCount if totalPeerCount > 0 else 0.0
+    f1 = 2 * recall * precision / (recall + precision) if recall + precision > 0 else 0.0
+    return recall, precision, f1
+
+def _getStemmer():
+    global _stemmer
+    if _stemmer is None:
+        try:
+            from nltk.stem.porter import PorterStemmer
+            _stemmer = PorterStemmer()
+        except ImportError:
+            print('WARNING: nltk is not installed, so the words are not stemmed.')
+            _stemmer = False
+    return _stemmer if _stemmer is not False else None
+
+def writeRougeScoresCsv(rougeScores, outputCsvFile):
+    # Write the scores in the format of the getRougeScores.py output (ROUGE variants not computed are left blank).
+    systemIds = sorted(rougeScores.keys())
+    eventIds = sorted(set(eventId for systemId in rougeScores for eventId in rougeScores[systemId]))
+    metricsHeader = ''.join(', {0} {1}'.format(rougeVariant, metric) for rougeVariant in OUTPUT_ROUGE_VARIANTS for metric in METRICS)
+
+    def formatScores(variantScoresList):
+        # the average of each variant/metric over the list of { rougeVariant -> (R, P, F) }:
+        values = []
+        for rougeVariant in OUTPUT_ROUGE_VARIANTS:
+            for metricIdx in range(len(METRICS)):
+                if rougeVariant in COMPUTED_ROUGE_VARIANTS and len(variantScoresList) > 0:
+                    values.append(', {:.5f}'.format(sum(scores[rougeVariant][metricIdx] for scores in variantScoresList) / len(variantScoresList)))
+                else:
+                    values.append(', ')
+        return ''.join(values)
+
+    with open(outputCsvFile, 'w') as outF:
+        # first print the average system scores over all events:
+        outF.write('systemId' + metricsHeader + '\n')
+        for systemId in systemIds:
+            outF.write(systemId + formatScores(list(rougeScores[systemId].values())) + '\n')
+
+        # print the average scores in each event:
+        outF.write('\n\n')
+        outF.write('eventId' + metricsHeader + '\n')
+        for eventId in eventIds:
+            outF.write(eventId + formatScores([rougeScores[systemId][eventId] for systemId in systemIds if eventId in rougeScores[systemId]]) + '\n')
+
+        # print the system scores for each event:
+        outF.write('\n\n')
+        outF.write('systemId, eventId ' + metricsHeader + '\n')
+        for systemId in systemIds:
+            for eventId in eventIds:
+                eventScores = [rougeScores[systemId][eventId]] if eventId in rougeScores[systemId] else []
+                outF.write('{}, {}'.format(systemId, eventId) + formatScores(eventScores) + '\n')
+
+
+if __name__ == '__main__':
+    main(PEERS_FOLDER, MODELS_FOLDER, OUTPUT_CSV_FILE)
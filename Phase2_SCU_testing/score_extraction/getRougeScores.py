@@ -1,8 +1,14 @@
+from multiprocessing import Pool
+
 '''
 This script reads the different ROUGE scores from the DUC 2005 and 2006 scores files.
 It outputs the scores to a CSV file in a format to be used when calaculating correlations in the phase2 post-script.
 
 Provide the input and output files.
+
+The scores file is parsed as a stream: the scores of each (system, ROUGE variant, event) are accumulated as running
+sums and counts while reading, instead of keeping all the per-reference values. The parsing keeps no global state,
+so several scores files (given as lists) are parsed in parallel.
 '''
 
 '''
@@ -15,170 +21,145 @@ ROUGE_SCORES_FILE = ''
 The file to output to.
 '''
 OUTPUT_CSV_FILE = '' # e.g. '2006RougeScoresAvg.csv'
-
+'''
+The number of processes to use when several scores files are given to main.
+'''
+NUM_PROCESSES = 4
 
 
 
 START = 0
 NEWROUGE = 1
 SCORES = 2
-m_lineState = START
 
-m_valuesDict = {}
-m_rougeVariants = []
-m_scoresByEvent = {}
+METRICS = ['recall', 'precision', 'f1']
+AVERAGE_METRICS = {'Average_R:': 'recall', 'Average_P:': 'precision', 'Average_F:': 'f1'}
 
-def main(rougeScoresFile, outputCsvFile):
-    global m_lineState
-    
-    # read in the scores:
+def main(rougeScoresFiles, outputCsvFiles):
+    # parse the scores files (in parallel if there are several) and print out the final scores:
+    if len(rougeScoresFiles) > 1:
+        pool = Pool(min(NUM_PROCESSES, len(rougeScoresFiles)))
+        try:
+            allRougeScores = pool.map(parseRougeScoresFile, rougeScoresFiles)
+        finally:
+            pool.close()
+    else:
+        allRougeScores = [parseRougeScoresFile(rougeScoresFile) for rougeScoresFile in rougeScoresFiles]
+
+    for rougeScores, outputCsvFile in zip(allRougeScores, outputCsvFiles):
+        printStats(rougeScores, outputCsvFile)
+
+def parseRougeScoresFile(rougeScoresFile):
+    # Read the ROUGE jackknifing output file in one pass.
+    # Returns a dictionary with:
+    #   'rougeVariants'  : [rougeVariant] in order of appearance
+    #   'systemIds'      : [systemId] in order of appearance
+    #   'eventIds'       : [eventId] in order of appearance
+    #   'systemAverages' : { systemId -> { rougeVariant -> { metric -> averageValueStr } } }
+    #   'scoreSums'      : { (systemId, rougeVariant, eventId) -> [recallSum, precisionSum, f1Sum, count] } over the references
+    rougeVariants = []
+    systemIds = []
+    eventIds = []
+    systemAverages = {}
+    scoreSums = {}
+
+    lineState = START
     with open(rougeScoresFile, 'r') as inF:
         for line in inF:
-            line = line.strip()
-            
             if line.startswith('---'):
-                m_lineState = NEWROUGE
+                lineState = NEWROUGE
+                continue
             elif line.startswith('...'):
-                m_lineState = SCORES
-            else:
-                if m_lineState == NEWROUGE:
-                    processLineNewRouge(line)
-                elif m_lineState == SCORES:
-                    processLineScores(line)
-    
-    # average the scores:
-    averageAll()
-    # print out the final scores:
-    printStats(outputCsvFile)
-
-def printStats(outputCsvFile):
-    metrics = ['recall', 'precision', 'f1']
+                lineState = SCORES
+                continue
+
+            lineParts = line.split()
+            if lineState == SCORES and len(lineParts) == 7:
+                # e.g. "16 ROUGE-1 Eval D0601.M.250.A.16 R:0.38 P:0.37 F:0.37"
+                systemId, rougeVariant, _, comparedSummIds, recStr, precStr, f1Str = lineParts
+                eventId = comparedSummIds.split('.', 1)[0]
+                key = (systemId, rougeVariant, eventId)
+                sums = scoreSums.get(key)
+                if sums is None:
+                    sums = scoreSums[key] = [0.0, 0.0, 0.0, 0]
+                    if eventId not in eventIds:
+                        eventIds.append(eventId)
+                sums[0] += float(recStr[2:])
+                sums[1] += float(precStr[2:])
+                sums[2] += float(f1Str[2:])
+                sums[3] += 1
+
+            elif lineState == NEWROUGE and len(lineParts) >= 4:
+                # e.g. "16 ROUGE-1 Average_R: 0.38 (95%-conf.int. 0.36 - 0.40)"
+                systemId, rougeVariant, metric, value = lineParts[0:4]
+                metric = AVERAGE_METRICS.get(metric, metric)
+                if systemId not in systemAverages:
+                    systemAverages[systemId] = {}
+                    systemIds.append(systemId)
+                systemAverages[systemId].setdefault(rougeVariant, {})[metric] = value
+                if rougeVariant not in rougeVariants:
+                    rougeVariants.append(rougeVariant)
+
+    return {'rougeVariants': rougeVariants, 'systemIds': systemIds, 'eventIds': eventIds,
+            'systemAverages': systemAverages, 'scoreSums': scoreSums}
+
+def getEventAverages(rougeScores):
+    # Average the scores of all the systems and references in each event.
+    # Returns { eventId -> { rougeVariant -> [recallAvg, precisionAvg, f1Avg] } }.
+    eventSums = {} # { (eventId, rougeVariant) -> [recallSum, precisionSum, f1Sum, count] }
+    for (systemId, rougeVariant, eventId), sums in rougeScores['scoreSums'].items():
+        totals = eventSums.setdefault((eventId, rougeVariant), [0.0, 0.0, 0.0, 0])
+        for i in range(4):
+            totals[i] += sums[i]
+
+    eventAverages = {}
+    for (eventId, rougeVariant), totals in eventSums.items():
+        eventAverages.setdefault(eventId, {})[rougeVariant] = [totals[i] / totals[3] for i in range(3)]
+    return eventAverages
+
+def printStats(rougeScores, outputCsvFile):
+    rougeVariants = rougeScores['rougeVariants']
+    systemAverages = rougeScores['systemAverages']
+    scoreSums = rougeScores['scoreSums']
+    eventAverages = getEventAverages(rougeScores)
+    eventIds = [eventId for eventId in rougeScores['eventIds'] if eventId in eventAverages]
+    metricsHeader = ''.join(', {0} {1}'.format(rougeVariant, metric) for rougeVariant in rougeVariants for metric in METRICS)
+
     with open(outputCsvFile, 'w') as outF:
         # first print the average system scores over all events:
-        outF.write('systemId')
-        for rougeVariant in m_rougeVariants:
-            for metric in metrics:
-                outF.write(', {0} {1}'.format(rougeVariant, metric))
-        outF.write('\n')
-        
-        for systemId in m_valuesDict:
+        outF.write('systemId' + metricsHeader + '\n')
+        for systemId in rougeScores['systemIds']:
             outF.write(systemId)
-            for rougeVariant in m_rougeVariants:
-                for metric in metrics:
-                    outF.write(', ' + m_valuesDict[systemId][rougeVariant][metric]['avg'])
+            for rougeVariant in rougeVariants:
+                for metric in METRICS:
+                    outF.write(', ' + systemAverages[systemId][rougeVariant][metric])
             outF.write('\n')
-            
+
         # print the average scores in each event:
         outF.write('\n\n')
-        outF.write('eventId')
-        for rougeVariant in m_rougeVariants:
-            for metric in metrics:
-                outF.write(', {0} {1}'.format(rougeVariant, metric))
-        outF.write('\n')
-        for eventId in m_scoresByEvent:
+        outF.write('eventId' + metricsHeader + '\n')
+        for eventId in eventIds:
             outF.write(eventId)
-            for rougeVariant in m_rougeVariants:
-                for metric in metrics:
-                    outF.write(', ' + str(m_scoresByEvent[eventId][rougeVariant][metric]['avg']))
+            for rougeVariant in rougeVariants:
+                for metricIdx in range(len(METRICS)):
+                    outF.write(', ' + str(eventAverages[eventId][rougeVariant][metricIdx]))
             outF.write('\n')
-        
+
         # print the system scores for each event:
         outF.write('\n\n')
-        outF.write('systemId, eventId ')
-        for rougeVariant in m_rougeVariants:
-            for metric in metrics:
-                outF.write(', {0} {1}'.format(rougeVariant, metric))
-        for systemId in m_valuesDict:
-            for eventId in m_scoresByEvent:
+        outF.write('systemId, eventId ' + metricsHeader + '\n')
+        for systemId in rougeScores['systemIds']:
+            for eventId in eventIds:
                 outF.write('{}, {}'.format(systemId, eventId))
-                for rougeVariant in m_rougeVariants:
-                    for metric in metrics:
-                        if eventId in m_valuesDict[systemId][rougeVariant][metric]:
-                            outF.write(', {}'.format(m_valuesDict[systemId][rougeVariant][metric][eventId]['avg']))
+                for rougeVariant in rougeVariants:
+                    sums = scoreSums.get((systemId, rougeVariant, eventId))
+                    for metricIdx in range(len(METRICS)):
+                        if sums is not None:
+                            outF.write(', {}'.format(sums[metricIdx] / sums[3]))
                         else:
                             outF.write(', ')
                 outF.write('\n')
-        
-        
-    
-    
-def averageAll():
-    global m_valuesDict
-    global m_scoresByEvent
-    
-    eventIds = {} # keep a list of the eventIds
-    for systemId in m_valuesDict:
-        for rougeVariant in m_valuesDict[systemId]:
-            for metric in m_valuesDict[systemId][rougeVariant]:
-                for eventId in m_valuesDict[systemId][rougeVariant][metric]:
-                    eventIds[eventId] = 1
-                    if eventId != 'avg':
-                        scoresOverReferences = m_valuesDict[systemId][rougeVariant][metric][eventId]['vals']
-                        m_valuesDict[systemId][rougeVariant][metric][eventId]['avg'] = reduce(lambda x, y: x + y, scoresOverReferences) / len(scoresOverReferences)
-                        
-    # get all the scores of each event:
-    m_scoresByEvent = {eventId:{} for eventId in eventIds if eventId != 'avg'}
-    for systemId in m_valuesDict:
-        for rougeVariant in m_valuesDict[systemId]:
-            for metric in m_valuesDict[systemId][rougeVariant]:
-                for eventId in m_valuesDict[systemId][rougeVariant][metric]:
-                    if eventId == 'avg':
-                        continue
-                    if not rougeVariant in m_scoresByEvent[eventId]:
-                        m_scoresByEvent[eventId][rougeVariant] = {}
-                    if not metric in m_scoresByEvent[eventId][rougeVariant]:
-                        m_scoresByEvent[eventId][rougeVariant][metric] = {'vals':[], 'avg':-1}
-                    if eventId != 'avg':
-                        m_scoresByEvent[eventId][rougeVariant][metric]['vals'].extend(m_valuesDict[systemId][rougeVariant][metric][eventId]['vals'])
-    
-    # average the scores for each event:
-    for eventId in m_scoresByEvent:
-        for rougeVariant in m_scoresByEvent[eventId]:
-            for metric in m_scoresByEvent[eventId][rougeVariant]:
-                m_scoresByEvent[eventId][rougeVariant][metric]['avg'] = reduce(lambda x, y: x + y, m_scoresByEvent[eventId][rougeVariant][metric]['vals']) / len(m_scoresByEvent[eventId][rougeVariant][metric]['vals'])
-                        
-def processLineScores(line):
-    global m_valuesDict
-    
-    systemId, rougeVariant, _, comparedSummIds, recStr, precStr, f1Str = line.split()
-    eventId = comparedSummIds.split('.')[0]
-    recVal, precVal, f1Val = recStr.split(':')[1], precStr.split(':')[1], f1Str.split(':')[1]
-    
-    if not eventId in m_valuesDict[systemId][rougeVariant]['recall']:
-        m_valuesDict[systemId][rougeVariant]['recall'][eventId] = {'vals':[], 'avg':-1}
-        m_valuesDict[systemId][rougeVariant]['precision'][eventId] = {'vals':[], 'avg':-1}
-        m_valuesDict[systemId][rougeVariant]['f1'][eventId] = {'vals':[], 'avg':-1}
-    
-    m_valuesDict[systemId][rougeVariant]['recall'][eventId]['vals'].append(float(recVal))
-    m_valuesDict[systemId][rougeVariant]['precision'][eventId]['vals'].append(float(precVal))
-    m_valuesDict[systemId][rougeVariant]['f1'][eventId]['vals'].append(float(f1Val))
-
-def processLineNewRouge(line):
-    global m_valuesDict
-    global m_rougeVariants
-
-    lineParts = line.split()
-    systemId, rougeVariant, metric, value = lineParts[0:4]
-    
-    if metric == 'Average_R:':
-        metric = 'recall'
-    elif metric == 'Average_P:':
-        metric = 'precision'
-    elif metric == 'Average_F:':
-        metric = 'f1'
-    
-    if not systemId in m_valuesDict:
-        m_valuesDict[systemId] = {}
-    if not rougeVariant in m_valuesDict[systemId]:
-        m_valuesDict[systemId][rougeVariant] = {}
-    if not metric in m_valuesDict[systemId][rougeVariant]:
-        m_valuesDict[systemId][rougeVariant][metric] = {}
-        
-    m_valuesDict[systemId][rougeVariant][metric]['avg'] = value
-    
-    if not rougeVariant in m_rougeVariants:
-        m_rougeVariants.append(rougeVariant)
-        
-        
+
+
 if __name__ == '__main__':
-    main(ROUGE_SCORES_FILE, OUTPUT_CSV_FILE)
\ No newline at end of file
+    main([ROUGE_SCORES_FILE], [OUTPUT_CSV_FILE])
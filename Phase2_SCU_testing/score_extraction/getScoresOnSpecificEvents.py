@@ -1,8 +1,13 @@
 import csv
+from scoreStore import ScoreStore
+from scoreQueries import ScoreMatrix, readQueriesFile, writeQueryTable
 
 '''
 This script creates files with scores of specific systems/events (out of a *ManualScoresAvg.csv file).
 Provide the input and output files, the system IDs and the event IDs to use.
+
+Many subsets can be queried in one run with a queries file (see scoreQueries.py): each query line gives a name, a metric
+(e.g. pyramid, responsiveness, or 'ROUGE-2 recall' when using a score store) and the system and event IDs.
 '''
 
 '''
@@ -18,37 +23,50 @@ The input scores file.
 '''
 INPUT_FILE = '' # e.g. '2006ManualScoresAvg.csv'
 '''
+Alternatively, a score store file created with scoreStore.py and the name of the dataset in it (used instead of the INPUT_FILE if given).
+'''
+SCORE_STORE_FILE = '' # e.g. 'scores.db'
+SCORE_STORE_DATASET = '' # e.g. '2006'
+'''
 The output scores file.
 '''
 OUTPUT_FILE = '' # e.g. '2006ManualScoresPartial.csv'
+'''
+A CSV file of queries to run instead of the single SYSTEM_IDS/EVENT_IDS subset (or '' for the single subset).
+The fields are (IDs separated by semicolons, and empty for all):
+    query,metric,systemIds,eventIds
+The output file then has the fields:
+    query,metric,systemId,score,numEvents
+'''
+QUERIES_FILE = '' # e.g. 'eventSubsetQueries.csv'
+
+
 
+def main(systemIds, eventIds, inputFile, scoreStoreFile, scoreStoreDataset, outputFile, queriesFile):
+    # get the individual system summary scores in a score store:
+    if scoreStoreFile != '':
+        store = ScoreStore(scoreStoreFile)
+    else:
+        store = ScoreStore()
+        store.loadManualScoresFile(scoreStoreDataset, inputFile)
 
+    if queriesFile != '':
+        # answer all the queries together and output the results table:
+        queries = readQueriesFile(queriesFile)
+        scoreMatrix = ScoreMatrix.fromStore(store, scoreStoreDataset, sorted(set(metric for _, metric, _, _ in queries)))
+        writeQueryTable(scoreMatrix.querySubsetMeans(queries), outputFile)
+    else:
+        # average the scores for the systems (on the specified events only):
+        scoreMatrix = ScoreMatrix.fromStore(store, scoreStoreDataset, ['pyramid'], systemIds, eventIds)
+        finalSysScores = {systemId : score for _, _, systemId, score, _ in scoreMatrix.querySubsetMeans([('subset', 'pyramid', systemIds, eventIds)])}
+        # output to file:
+        with open(outputFile, 'w') as fOut:
+            fOut.write('Events: {}\n\n'.format(';'.join(eventIds)))
+            fOut.write('systemId, pyramid\n')
+            for sysId in systemIds:
+                fOut.write('{}, {}\n'.format(sysId, finalSysScores[sysId]))
+    store.close()
+
 
-# read in the individual system summary scores:
-systemScores = {sysId:[] for sysId in SYSTEM_IDS}
-with open(INPUT_FILE, 'r') as fIn:
-    startRead = False
-    for row in fIn:
-        row = row.strip()
-        if not startRead:
-            if row == 'systemId, eventId, pyramid, responsiveness':
-                startRead = True
-        elif row != '':
-            parts = row.split(',')
-            systemId = parts[0].strip()
-            eventId = parts[1].strip()
-            pyrScore = float(parts[2].strip())
-            
-            if systemId in SYSTEM_IDS and eventId in EVENT_IDS:
-                systemScores[systemId].append(pyrScore)
-
-#print(systemScores)
-          
-# average the scores for the systems:          
-finalSysScores = {sysId : reduce(lambda x, y: x + y, systemScores[sysId]) / len(systemScores[sysId]) for sysId in SYSTEM_IDS}
-# output to file:
-with open(OUTPUT_FILE, 'w') as fOut:
-    fOut.write('Events: {}\n\n'.format(';'.join(EVENT_IDS)))
-    fOut.write('systemId, pyramid\n')
-    for sysId in SYSTEM_IDS:
-        fOut.write('{}, {}\n'.format(sysId, finalSysScores[sysId]))
\ No newline at end of file
+if __name__ == '__main__':
+    main(SYSTEM_IDS, EVENT_IDS, INPUT_FILE, SCORE_STORE_FILE, SCORE_STORE_DATASET, OUTPUT_FILE, QUERIES_FILE)
@@ -0,0 +1,116 @@
+import csv
+import numpy as np
+
+'''
+Batched queries of average scores over subsets of systems and events.
+
+The scores of each metric are kept in a systems-by-events matrix (NaN where a system has no summary on an event).
+A query is a (metric, system subset, event subset), and a subset is given as a list of IDs, a boolean mask over the
+matrix's systems/events, or None for all of them. All the queries on a metric are answered together: the event subsets
+are stacked into a mask matrix, and the sums and counts of every (system, query) are two matrix products.
+
+The result is a table with a row per (query, system): the average score of the system over the events of the query
+subset that it has scores on (as in getScoresOnSpecificEvents.py).
+'''
+
+QUERY_TABLE_FIELDS = ['query', 'metric', 'systemId', 'score', 'numEvents']
+
+class ScoreMatrix(object):
+
+    def __init__(self, systemIds, eventIds, values):
+        self.systemIds = list(systemIds) # the rows
+        self.eventIds = list(eventIds) # the columns
+        self.values = values # { metric -> np.array(len(systemIds), len(eventIds)) } with NaN for missing scores
+        self.systemIdx = {systemId: i for i, systemId in enumerate(self.systemIds)}
+        self.eventIdx = {eventId: i for i, eventId in enumerate(self.eventIds)}
+
+    @classmethod
+    def fromScores(cls, scoresPerMetric, systemIds=None, eventIds=None):
+        # Create the matrix from { metric -> { systemId -> { eventId -> score } } } (e.g. from ScoreStore.getScores).
+        if systemIds is None:
+            systemIds = sorted(set(systemId for scores in scoresPerMetric.values() for systemId in scores))
+        if eventIds is None:
+            eventIds = sorted(set(eventId for scores in scoresPerMetric.values() for systemId in scores for eventId in scores[systemId]))
+        eventIdx = {eventId: i for i, eventId in enumerate(eventIds)}
+        values = {}
+        for metric, scores in scoresPerMetric.items():
+            matrix = np.full((len(systemIds), len(eventIds)), np.nan)
+            for i, systemId in enumerate(systemIds):
+                for eventId, score in scores.get(systemId, {}).items():
+                    if eventId in eventIdx:
+                        matrix[i, eventIdx[eventId]] = score
+            values[metric] = matrix
+        return cls(systemIds, eventIds, values)
+
+    @classmethod
+    def fromStore(cls, store, dataset, metrics, systemIds=None, eventIds=None):
+        # Create the matrix of the given metrics from a ScoreStore.
+        return cls.fromScores({metric: store.getScores(dataset, metric, systemIds, eventIds) for metric in metrics}, systemIds, eventIds)
+
+    def getSystemMask(self, systemSubset):
+        return _getMask(systemSubset, self.systemIdx, len(self.systemIds))
+
+    def getEventMask(self, eventSubset):
+        return _getMask(eventSubset, self.eventIdx, len(self.eventIds))
+
+    def querySubsetMeans(self, queries):
+        # Answer the queries: [(queryName, metric, systemSubset, eventSubset)]
+        # Returns a table of [queryName, metric, systemId, score, numEvents] rows (score is NaN if the system has no scores on the events).
+        queriesPerMetric = {} # { metric -> [queryIndices] }
+        for queryIdx, (_, metric, _, _) in enumerate(queries):
+            queriesPerMetric.setdefault(metric, []).append(queryIdx)
+
+        resultsPerQuery = {} # { queryIdx -> (systemMask, scores per system, counts per system) }
+        for metric, queryIndices in queriesPerMetric.items():
+            matrix = self.values[metric]
+            hasScore = ~np.isnan(matrix)
+            scores = np.where(hasScore, matrix, 0.0)
+            # the event subsets of all the queries as columns of one mask matrix:
+            eventMasks = np.stack([self.getEventMask(queries[queryIdx][3]) for queryIdx in queryIndices], axis=1).astype(float)
+            sums = scores.dot(eventMasks) # systems x queries
+            counts = hasScore.astype(float).dot(eventMasks) # systems x queries
+            with np.errstate(invalid='ignore', divide='ignore'):
+                means = sums / counts
+            for col, queryIdx in enumerate(queryIndices):
+                resultsPerQuery[queryIdx] = (self.getSystemMask(queries[queryIdx][2]), means[:, col], counts[:, col])
+
+        table = []
+        for queryIdx, (queryName, metric, _, _) in enumerate(queries):
+            systemMask, means, counts = resultsPerQuery[queryIdx]
+            for i in np.flatnonzero(systemMask):
+                table.append([queryName, metric, self.systemIds[i], float(means[i]), int(counts[i])])
+        return table
+
+
+def _getMask(subset, idxById, size):
+    # A boolean mask from a list of IDs, a boolean mask, or None (all).
+    if subset is None:
+        return np.ones(size, dtype=bool)
+    subset = list(subset) if isinstance(subset, (set, frozenset)) else subset
+    if len(subset) > 0 and np.asarray(subset).dtype == bool:
+        if len(subset) != size:
+            raise ValueError('A boolean mask of size {} is needed, got {}'.format(size, len(subset)))
+        return np.asarray(subset)
+    mask = np.zeros(size, dtype=bool)
+    for idVal in subset:
+        if idVal not in idxById:
+            raise ValueError('Unknown ID in subset: {}'.format(idVal))
+        mask[idxById[idVal]] = True
+    return mask
+
+def readQueriesFile(queriesFile):
+    # Read queries from a CSV with the columns: query,metric,systemIds,eventIds
+    # where the IDs are separated by semicolons (empty for all). Returns [(queryName, metric, systemIds, eventIds)].
+    queries = []
+    with open(queriesFile, 'r') as inF:
+        for row in csv.DictReader(inF):
+            systemIds = [idVal.strip() for idVal in row['systemIds'].split(';')] if row['systemIds'].strip() != '' else None
+            eventIds = [idVal.strip() for idVal in row['eventIds'].split(';')] if row['eventIds'].strip() != '' else None
+            queries.append((row['query'], row['metric'], systemIds, eventIds))
+    return queries
+
+def writeQueryTable(table, outputFile):
+    with open(outputFile, 'w') as outF:
+        csvWriter = csv.writer(outF, lineterminator='\n')
+        csvWriter.writerow(QUERY_TABLE_FIELDS)
+        csvWriter.writerows(table)
@@ -0,0 +1,200 @@
+import os
+import sys
+import sqlite3
+
+'''
+A SQLite store of the summary scores of systems on events, keyed by (dataset, metric, systemId, eventId).
+It holds the original manual scores (Pyramid and Responsiveness), the ROUGE scores and the Lite-Pyramid scores in one indexed table,
+so that the post-scripts can query the scores of any subset of systems and events without re-parsing the CSV files.
+
+Bulk loaders read the files created by getManualScores.py, getRougeScores.py and computeRougeScores.py. The sections of these files are
+found by their column names (not by an exact header line), and a file without a (systemId, eventId) section raises an error instead of
+silently loading nothing.
+
+Run this script to build a store file from the scores files of a dataset, or to add ROUGE scores computed with computeRougeScores.py
+to it (set the variables below). This is the only step that writes to a store file: the post-scripts that read the original scores
+from a store file don't change it.
+'''
+
+'''
+The SQLite file of the score store (created if it doesn't exist).
+'''
+SCORE_STORE_FILE = '' # e.g. 'scores.db'
+'''
+The name of the dataset the scores belong to.
+'''
+DATASET = '' # e.g. '2006'
+'''
+The manual scores file as created by getManualScores.py (or '' to skip).
+'''
+MANUAL_SCORES_FILE = '' # e.g. '2006ManualScoresAvg.csv'
+'''
+The ROUGE scores file as created by getRougeScores.py or computeRougeScores.py (or '' to skip).
+'''
+ROUGE_SCORES_FILE = '' # e.g. '2006RougeScoresAvg.csv'
+'''
+Instead of the ROUGE_SCORES_FILE, the folders of the system summaries and reference summaries to compute the ROUGE scores from
+with computeRougeScores.py (or '' to skip).
+'''
+ROUGE_PEERS_FOLDER = '' # e.g. '../../../DUC_data/2006/NISTeval/ROUGE/peers'
+ROUGE_MODELS_FOLDER = '' # e.g. '../../../DUC_data/2006/NISTeval/ROUGE/models'
+
+
+
+# the metric names of the manual scores columns:
+MANUAL_METRICS = {'pyramid': 'pyramid', 'responsiveness': 'responsiveness'}
+# the default metric name of the Lite-Pyramid scores:
+LITEPYRAMID_METRIC = 'litepyramid'
+# the most IDs to pass as SQL parameters in one query (larger lists go through a temporary table):
+MAX_SQL_PARAMETERS = 500
+
+class ScoreStore(object):
+
+    def __init__(self, dbPath=':memory:'):
+        self.dbPath = dbPath
+        self.connection = sqlite3.connect(dbPath)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS scores (dataset TEXT NOT NULL, metric TEXT NOT NULL, systemId TEXT NOT NULL, '
+                                'eventId TEXT NOT NULL, value REAL, PRIMARY KEY (dataset, metric, systemId, eventId))')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS scores_by_event ON scores (dataset, metric, eventId, systemId)')
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def addScores(self, dataset, metric, scoreRows):
+        # Bulk insert (or replace) the (systemId, eventId, value) rows of a metric in one transaction.
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO scores (dataset, metric, systemId, eventId, value) VALUES (?, ?, ?, ?, ?)',
+                                        ((dataset, metric, systemId, eventId, value) for systemId, eventId, value in scoreRows))
+
+    def loadManualScoresFile(self, dataset, manualScoresFile):
+        # Load the Pyramid and Responsiveness scores from a getManualScores.py output file.
+        header, rows = readSystemEventSection(manualScoresFile)
+        for columnName, metric in MANUAL_METRICS.items():
+            if columnName in header:
+                self.addScores(dataset, metric, _getColumnRows(header, rows, columnName))
+
+    def loadRougeScoresFile(self, dataset, rougeScoresFile):
+        # Load all the ROUGE scores (e.g. metric 'ROUGE-1 recall') from a getRougeScores.py or computeRougeScores.py output file.
+        header, rows = readSystemEventSection(rougeScoresFile)
+        for columnName in header[2:]:
+            if columnName.startswith('ROUGE'):
+                self.addScores(dataset, columnName, _getColumnRows(header, rows, columnName))
+
+    def loadRougeScores(self, dataset, rougeScores):
+        # Load the in-memory scores of computeRougeScores.py: { systemId -> { eventId -> { rougeVariant -> (R, P, F) } } }
+        metricNames = ['recall', 'precision', 'f1']
+        scoreRowsPerMetric = {}
+        for systemId in rougeScores:
+            for eventId in rougeScores[systemId]:
+                for rougeVariant, scores in rougeScores[systemId][eventId].items():
+                    for metricName, value in zip(metricNames, scores):
+                        scoreRowsPerMetric.setdefault('{} {}'.format(rougeVariant, metricName), []).append((systemId, eventId, value))
+        for metric, scoreRows in scoreRowsPerMetric.items():
+            self.addScores(dataset, metric, scoreRows)
+
+    def loadLitePyramidScores(self, dataset, summaryScores, metric=LITEPYRAMID_METRIC):
+        # Load Lite-Pyramid summary scores: { systemId -> { eventId -> score } }
+        self.addScores(dataset, metric, ((systemId, eventId, summaryScores[systemId][eventId])
+                                         for systemId in summaryScores for eventId in summaryScores[systemId]))
+
+    def getDatasets(self):
+        return [row[0] for row in self.connection.execute('SELECT DISTINCT dataset FROM scores ORDER BY dataset')]
+
+    def getMetrics(self, dataset):
+        return [row[0] for row in self.connection.execute('SELECT DISTINCT metric FROM scores WHERE dataset = ? ORDER BY metric', (dataset,))]
+
+    def getSystemIds(self, dataset, metric):
+        return [row[0] for row in self.connection.execute('SELECT DISTINCT systemId FROM scores WHERE dataset = ? AND metric = ?', (dataset, metric))]
+
+    def getEventIds(self, dataset, metric):
+        return [row[0] for row in self.connection.execute('SELECT DISTINCT eventId FROM scores WHERE dataset = ? AND metric = ?', (dataset, metric))]
+
+    def getScores(self, dataset, metric, systemIds=None, eventIds=None):
+        # Get the scores of a metric (optionally only of the given systems and events): { systemId -> { eventId -> value } }
+        scores = {}
+        for systemId, eventId, value in self._select('systemId, eventId, value', dataset, metric, systemIds, eventIds):
+            scores.setdefault(systemId, {})[eventId] = value
+        return scores
+
+    def getSystemAverages(self, dataset, metric, systemIds=None, eventIds=None):
+        # Get the average score of each system over the (given) events: { systemId -> average }
+        return dict(self._select('systemId, AVG(value)', dataset, metric, systemIds, eventIds, groupBy='systemId'))
+
+    def getEventAverages(self, dataset, metric, systemIds=None, eventIds=None):
+        # Get the average score on each event over the (given) systems: { eventId -> average }
+        return dict(self._select('eventId, AVG(value)', dataset, metric, systemIds, eventIds, groupBy='eventId'))
+
+    def _select(self, columns, dataset, metric, systemIds, eventIds, groupBy=None):
+        # Select from the scores of a metric, restricted to the given system and event IDs (if not None).
+        query = 'SELECT {} FROM scores WHERE dataset = ? AND metric = ?'.format(columns)
+        params = [dataset, metric]
+        tempTables = []
+        for columnName, ids in [('systemId', systemIds), ('eventId', eventIds)]:
+            if ids is None:
+                continue
+            ids = list(set(ids))
+            if len(ids) <= MAX_SQL_PARAMETERS:
+                query += ' AND {} IN ({})'.format(columnName, ', '.join('?' * len(ids)))
+                params.extend(ids)
+            else:
+                # too many IDs for query parameters:
+                tempTable = 'temp_{}s'.format(columnName)
+                self.connection.execute('CREATE TEMP TABLE IF NOT EXISTS {} (id TEXT PRIMARY KEY)'.format(tempTable))
+                self.connection.execute('DELETE FROM {}'.format(tempTable))
+                self.connection.executemany('INSERT INTO {} (id) VALUES (?)'.format(tempTable), ((idVal,) for idVal in ids))
+                query += ' AND {} IN (SELECT id FROM {})'.format(columnName, tempTable)
+                tempTables.append(tempTable)
+        if groupBy is not None:
+            query += ' GROUP BY {}'.format(groupBy)
+        results = self.connection.execute(query, params).fetchall()
+        for tempTable in tempTables:
+            self.connection.execute('DELETE FROM {}'.format(tempTable))
+        return results
+
+
+def readSections(scoresFile):
+    # Read a file of blank-line separated CSV sections. Returns a list of (headerFields, [rowFields]) with stripped fields.
+    sections = []
+    curSection = None
+    with open(scoresFile, 'r') as inF:
+        for line in inF:
+            line = line.strip()
+            if line == '':
+                curSection = None
+            elif curSection is None:
+                curSection = ([field.strip() for field in line.split(',')], [])
+                sections.append(curSection)
+            else:
+                curSection[1].append([field.strip() for field in line.split(',')])
+    return sections
+
+def readSystemEventSection(scoresFile):
+    # Get the (headerFields, [rowFields]) of the section with the scores per system and event (its first columns are systemId and eventId).
+    for header, rows in readSections(scoresFile):
+        if len(header) > 2 and header[0] == 'systemId' and header[1] == 'eventId':
+            return header, [row for row in rows if len(row) == len(header)]
+    raise ValueError('No section with "systemId, eventId, ..." columns found in {}'.format(scoresFile))
+
+def _getColumnRows(header, rows, columnName):
+    # The (systemId, eventId, value) of a column, skipping empty values:
+    columnIdx = header.index(columnName)
+    return [(row[0], row[1], float(row[columnIdx])) for row in rows if row[columnIdx] != '']
+
+
+def main(scoreStoreFile, dataset, manualScoresFile, rougeScoresFile, rougePeersFolder='', rougeModelsFolder=''):
+    store = ScoreStore(scoreStoreFile)
+    if manualScoresFile != '':
+        store.loadManualScoresFile(dataset, manualScoresFile)
+    if rougePeersFolder != '' and rougeModelsFolder != '':
+        sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+        from computeRougeScores import computeRougeScores
+        store.loadRougeScores(dataset, computeRougeScores(rougePeersFolder, rougeModelsFolder))
+    elif rougeScoresFile != '':
+        store.loadRougeScoresFile(dataset, rougeScoresFile)
+    for metric in store.getMetrics(dataset):
+        print('{}\t{}: {} systems, {} events'.format(dataset, metric, len(store.getSystemIds(dataset, metric)), len(store.getEventIds(dataset, metric))))
+    store.close()
+
+if __name__ == '__main__':
+    main(SCORE_STORE_FILE, DATASET, MANUAL_SCORES_FILE, ROUGE_SCORES_FILE, ROUGE_PEERS_FOLDER, ROUGE_MODELS_FOLDER)
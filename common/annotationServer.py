@@ -0,0 +1,332 @@
+import os
+import re
+import sys
+import csv
+import json
+import time
+import uuid
+import threading
+try:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qs
+except ImportError:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs
+
+'''
+A local annotation server for running the crowdsourcing tasks of both phases with in-house annotators, instead of on AMT.
+Run: python common/annotationServer.py [-serve|-export]
+    -serve      serves the HITs of the INPUT_CSV_FILES with the LAYOUT_FILE until interrupted (default)
+    -export     writes the submitted answers to OUTPUT_RESULTS_FILE in the AMT batch results format
+
+The HITs are the rows of the input CSV files created by the pre_createInputForAMT*.py scripts, and are shown with the same
+AMT task design layout (Phase1_SCU_writing/AMT_task/task_designLayout.html or Phase2_SCU_testing/AMT_task/task_designLayout.html,
+or the layout created for packed HITs), where each ${field} is replaced with the value of the field in the row.
+An annotator opens http://<SERVER_HOST>:<SERVER_PORT>/?workerId=<id> and gets the next HIT that still needs assignments and
+that they have not done, up to ASSIGNMENTS_PER_HIT assignments per HIT. An assignment that is not submitted within
+ASSIGNMENT_DURATION_SECONDS is given to another annotator. GET /status returns the progress as JSON.
+
+Each submitted assignment is appended as a JSON line to the ANSWER_LOG_FILE (which is also read when the server starts, to
+continue where it stopped). The HIT IDs are given by the order of the rows in the input files, so keep the same INPUT_CSV_FILES
+for the same log. The exported results file has the columns of an AMT batch results file (Input.<field> for each input field and
+Answer.<name> for each answer field of the layout), so it can be used as is by post_selectSCUsFromAMT.py (phase 1) and
+post_calculateScores*.py (phase 2).
+'''
+
+'''
+The AMT task design layout of the HITs.
+'''
+LAYOUT_FILE = '' # e.g. 'Phase2_SCU_testing/AMT_task/task_designLayout.html'
+'''
+The AMT task properties file, for the title, description, keywords and reward in the exported results (or '' to leave them empty).
+'''
+TASK_PROPERTIES_FILE = '' # e.g. 'Phase2_SCU_testing/AMT_task/task_properties.txt'
+'''
+The input CSV files of the HITs (as uploaded to AMT).
+'''
+INPUT_CSV_FILES = [] # e.g. ['batch1.csv', 'batch2.csv']
+'''
+The number of assignments (different annotators) per HIT.
+'''
+ASSIGNMENTS_PER_HIT = 5
+'''
+The time in seconds an annotator has to submit an assignment, before the HIT is given to another annotator.
+'''
+ASSIGNMENT_DURATION_SECONDS = 90 * 60
+'''
+The append-only log file of the submitted assignments (JSON lines).
+'''
+ANSWER_LOG_FILE = '' # e.g. 'answers.jsonl'
+'''
+The CSV file to export the results to (in the AMT batch results format).
+'''
+OUTPUT_RESULTS_FILE = '' # e.g. 'Batch_local_batch_results.csv'
+'''
+The host and port to listen on.
+'''
+SERVER_HOST = 'localhost'
+SERVER_PORT = 8080
+
+
+# the columns of the AMT batch results file before the Input fields (and after them, the Answer fields and these last columns):
+AMT_RESULT_FIELDS = ['HITId', 'HITTypeId', 'Title', 'Description', 'Keywords', 'Reward', 'CreationTime', 'MaxAssignments',
+                     'RequesterAnnotation', 'AssignmentDurationInSeconds', 'AutoApprovalDelayInSeconds', 'Expiration',
+                     'NumberOfSimilarHITs', 'LifetimeInSeconds', 'AssignmentId', 'WorkerId', 'AssignmentStatus', 'AcceptTime',
+                     'SubmitTime', 'AutoApprovalTime', 'ApprovalTime', 'RejectionTime', 'RequesterFeedback', 'WorkTimeInSeconds',
+                     'LifetimeApprovalRate', 'Last30DaysApprovalRate', 'Last7DaysApprovalRate']
+AMT_RESULT_LAST_FIELDS = ['Approve', 'Reject']
+# the task properties (as in task_properties.txt) of the exported columns:
+TASK_PROPERTY_FIELDS = {'Title': 'Title', 'Description': 'Description', 'Keywords': 'Keywords', 'Reward per assignment': 'Reward'}
+# the time format of AMT results:
+AMT_TIME_FORMAT = '%a %b %d %H:%M:%S %Z %Y'
+
+PAGE_TEMPLATE = '''<!DOCTYPE html>
+<html><head><meta charset="utf-8" /><title>{title}</title></head>
+<body>
+<form method="post" action="/submit">
+<input type="hidden" name="assignmentId" value="{assignmentId}" />
+<input type="hidden" name="workerId" value="{workerId}" />
+{layout}
+<p style="text-align:center"><input type="submit" class="btn btn-primary" value="Submit" /></p>
+</form>
+</body></html>
+'''
+MESSAGE_PAGE_TEMPLATE = '''<!DOCTYPE html>
+<html><head><meta charset="utf-8" /><title>{title}</title></head>
+<body><p>{message}</p>
+<form method="get" action="/"><label>Worker ID: <input type="text" name="workerId" value="{workerId}" /></label> <input type="submit" value="Get a HIT" /></form>
+</body></html>
+'''
+
+
+class AnnotationTask(object):
+    # The HITs of the input files, the assignments given and submitted so far, and the answer log.
+
+    def __init__(self, layoutFile, inputCsvFiles, assignmentsPerHit, answerLogFile, taskProperties=None, assignmentDuration=ASSIGNMENT_DURATION_SECONDS):
+        with open(layoutFile, 'r') as inF:
+            self.layout = inF.read()
+        self.answerFields = getLayoutAnswerFields(self.layout)
+        self.taskProperties = taskProperties or {}
+        self.assignmentsPerHit = assignmentsPerHit
+        self.assignmentDuration = assignmentDuration
+        self.answerLogFile = answerLogFile
+
+        # the HITs in the order of the input files:
+        self.hitIds = [] # [hitIds]
+        self.hitInputs = {} # { hitId -> { inputField -> value } }
+        self.inputFields = [] # all the input fields, in order of appearance
+        for inputCsvFile in inputCsvFiles:
+            with open(inputCsvFile, 'r') as inF:
+                csvReader = csv.DictReader(inF)
+                self.inputFields.extend(field for field in csvReader.fieldnames if field not in self.inputFields)
+                for row in csvReader:
+                    hitId = 'HIT{:06d}'.format(len(self.hitIds) + 1)
+                    self.hitIds.append(hitId)
+                    self.hitInputs[hitId] = row
+
+        self.submitted = {} # { hitId -> [submitted assignments: {'assignmentId', 'hitId', 'workerId', 'acceptTime', 'submitTime', 'answers'}] }
+        self.pending = {} # { assignmentId -> {'assignmentId', 'hitId', 'workerId', 'acceptTime'} }
+        self.lock = threading.Lock()
+
+        # continue from the assignments already in the log:
+        if os.path.exists(answerLogFile):
+            with open(answerLogFile, 'r') as inF:
+                for line in inF:
+                    if line.strip() != '':
+                        assignment = json.loads(line)
+                        self.submitted.setdefault(assignment['hitId'], []).append(assignment)
+
+    def assignHit(self, workerId):
+        # Get an assignment for the worker: (assignmentId, hitId), or (None, None) if there's no HIT left for the worker.
+        with self.lock:
+            now = time.time()
+            for assignmentId in [assignmentId for assignmentId, assignment in self.pending.items() if now - assignment['acceptTime'] > self.assignmentDuration]:
+                del self.pending[assignmentId]
+            pendingPerHit = {} # { hitId -> [workerIds] }
+            for assignment in self.pending.values():
+                # the worker gets the same assignment until it is submitted (e.g. when reloading the page):
+                if assignment['workerId'] == workerId:
+                    return assignment['assignmentId'], assignment['hitId']
+                pendingPerHit.setdefault(assignment['hitId'], []).append(assignment['workerId'])
+
+            for hitId in self.hitIds:
+                workerIds = [assignment['workerId'] for assignment in self.submitted.get(hitId, [])] + pendingPerHit.get(hitId, [])
+                if len(workerIds) < self.assignmentsPerHit and workerId not in workerIds:
+                    assignmentId = 'A' + uuid.uuid4().hex[:19].upper()
+                    self.pending[assignmentId] = {'assignmentId': assignmentId, 'hitId': hitId, 'workerId': workerId, 'acceptTime': now}
+                    return assignmentId, hitId
+        return None, None
+
+    def submitAssignment(self, assignmentId, workerId, answers):
+        # Keep the answers of a pending assignment in the log ({ answerField -> value }).
+        with self.lock:
+            if assignmentId not in self.pending or self.pending[assignmentId]['workerId'] != workerId:
+                raise ValueError('Unknown (or expired) assignment: {}'.format(assignmentId))
+            assignment = self.pending.pop(assignmentId)
+            assignment['submitTime'] = time.time()
+            assignment['answers'] = {field: answers.get(field, '') for field in self.answerFields}
+            with open(self.answerLogFile, 'a') as outF:
+                outF.write(json.dumps(assignment) + '\n')
+                outF.flush()
+                os.fsync(outF.fileno())
+            self.submitted.setdefault(assignment['hitId'], []).append(assignment)
+
+    def renderHit(self, assignmentId, hitId, workerId):
+        # The page of the HIT, with its input values in the layout:
+        hitInputs = self.hitInputs[hitId]
+        layout = re.sub(r'\$\{(\w+)\}', lambda match: hitInputs.get(match.group(1), match.group(0)), self.layout)
+        return PAGE_TEMPLATE.format(title=self.taskProperties.get('Title', hitId), assignmentId=assignmentId, workerId=_escape(_toStr(workerId)), layout=layout)
+
+    def getStatus(self):
+        with self.lock:
+            numSubmitted = sum(len(self.submitted.get(hitId, [])) for hitId in self.hitIds)
+            return {'numHits': len(self.hitIds), 'assignmentsPerHit': self.assignmentsPerHit, 'numSubmitted': numSubmitted,
+                    'numPending': len(self.pending), 'numRemaining': len(self.hitIds) * self.assignmentsPerHit - numSubmitted,
+                    'numCompleteHits': sum(1 for hitId in self.hitIds if len(self.submitted.get(hitId, [])) >= self.assignmentsPerHit)}
+
+    def exportResults(self, outputFile):
+        # Write all the submitted assignments in the AMT batch results format.
+        answerFields = sorted(self.answerFields) # AMT orders the answer columns by name
+        with open(outputFile, 'w') as outF:
+            csvWriter = csv.writer(outF, lineterminator='\n')
+            csvWriter.writerow(AMT_RESULT_FIELDS + ['Input.' + field for field in self.inputFields] +
+                               ['Answer.' + field for field in answerFields] + AMT_RESULT_LAST_FIELDS)
+            for hitId in self.hitIds:
+                for assignment in self.submitted.get(hitId, []):
+                    amtValues = {
+                        'HITId': hitId,
+                        'MaxAssignments': self.assignmentsPerHit,
+                        'AssignmentDurationInSeconds': self.assignmentDuration,
+                        'AssignmentId': assignment['assignmentId'],
+                        'WorkerId': assignment['workerId'],
+                        'AssignmentStatus': 'Submitted',
+                        'AcceptTime': _formatTime(assignment['acceptTime']),
+                        'SubmitTime': _formatTime(assignment['submitTime']),
+                        'WorkTimeInSeconds': int(assignment['submitTime'] - assignment['acceptTime'])}
+                    for propertyName, field in TASK_PROPERTY_FIELDS.items():
+                        amtValues[field] = self.taskProperties.get(propertyName, '')
+                    csvWriter.writerow([_toStr(amtValues.get(field, '')) for field in AMT_RESULT_FIELDS] +
+                                       [_toStr(self.hitInputs[hitId].get(field, '')) for field in self.inputFields] +
+                                       [_toStr(assignment['answers'].get(field, '')) for field in answerFields] +
+                                       ['' for field in AMT_RESULT_LAST_FIELDS])
+
+
+def getLayoutAnswerFields(layout):
+    # The names of the answer fields (inputs, textareas and selects) in the layout, in order of appearance:
+    answerFields = []
+    for name in re.findall(r'<(?:input|textarea|select)\b[^>]*\bname="([^"]+)"', layout):
+        if name not in answerFields:
+            answerFields.append(name)
+    return answerFields
+
+def readTaskProperties(taskPropertiesFile):
+    # The "<property>: <value>" lines of an AMT task properties file: { property -> value }
+    taskProperties = {}
+    with open(taskPropertiesFile, 'r') as inF:
+        for line in inF:
+            if ':' in line:
+                propertyName, value = line.split(':', 1)
+                taskProperties[propertyName.strip()] = value.strip()
+    return taskProperties
+
+def _formatTime(timestamp):
+    return time.strftime(AMT_TIME_FORMAT, time.localtime(timestamp))
+
+def _escape(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
+
+def _toStr(value):
+    # the JSON log gives unicode strings in python 2, which the csv module writes as utf-8:
+    if sys.version_info[0] < 3 and isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+def _toBytes(text):
+    return text if isinstance(text, bytes) else text.encode('utf-8')
+
+
+class AnnotationServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, task):
+        HTTPServer.__init__(self, address, AnnotationRequestHandler)
+        self.task = task
+
+
+class AnnotationRequestHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == '/status':
+            self._send(200, 'application/json', json.dumps(self.server.task.getStatus()))
+        elif url.path == '/':
+            workerId = query.get('workerId', [''])[0].strip()
+            if workerId == '':
+                self._sendMessage('Enter your worker ID to start.', '')
+                return
+            assignmentId, hitId = self.server.task.assignHit(workerId)
+            if assignmentId is None:
+                self._sendMessage('There are no more HITs for you. Thanks!', workerId)
+            else:
+                self._send(200, 'text/html; charset=utf-8', self.server.task.renderHit(assignmentId, hitId, workerId))
+        else:
+            self._send(404, 'text/plain', 'Not found')
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/submit':
+            self._send(404, 'text/plain', 'Not found')
+            return
+        form = parse_qs(self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8'), keep_blank_values=True)
+        answers = {field: values[0] for field, values in form.items()}
+        workerId = answers.pop('workerId', '')
+        try:
+            self.server.task.submitAssignment(answers.pop('assignmentId', ''), workerId, answers)
+        except ValueError as e:
+            self._sendMessage(str(e), workerId, 400)
+            return
+        # continue to the next HIT of the worker:
+        self.send_response(303)
+        self.send_header('Location', '/?workerId={}'.format(workerId))
+        self.end_headers()
+
+    def _sendMessage(self, message, workerId, status=200):
+        self._send(status, 'text/html; charset=utf-8', MESSAGE_PAGE_TEMPLATE.format(title='Annotation', message=_escape(message), workerId=_escape(_toStr(workerId))))
+
+    def _send(self, status, contentType, content):
+        body = _toBytes(content)
+        self.send_response(status)
+        self.send_header('Content-Type', contentType)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main(mode='-serve'):
+    taskProperties = readTaskProperties(TASK_PROPERTIES_FILE) if TASK_PROPERTIES_FILE != '' else {}
+    task = AnnotationTask(LAYOUT_FILE, INPUT_CSV_FILES, ASSIGNMENTS_PER_HIT, ANSWER_LOG_FILE, taskProperties, ASSIGNMENT_DURATION_SECONDS)
+    if mode == '-export':
+        task.exportResults(OUTPUT_RESULTS_FILE)
+        print('Exported {} assignments to {}'.format(task.getStatus()['numSubmitted'], OUTPUT_RESULTS_FILE))
+        return
+
+    server = AnnotationServer((SERVER_HOST, SERVER_PORT), task)
+    print('Serving {} HITs on http://{}:{}/?workerId=<id>'.format(len(task.hitIds), SERVER_HOST, SERVER_PORT))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+
+if __name__ == '__main__':
+    MODES = ['-serve', '-export']
+    if len(sys.argv) > 1 and sys.argv[1] not in MODES:
+        print('Usage: python annotationServer.py [-serve|-export]')
+        sys.exit()
+    main(sys.argv[1] if len(sys.argv) > 1 else '-serve')
@@ -0,0 +1,248 @@
+import os
+import re
+import ast
+import sys
+import csv
+import numpy as np
+from lexicalOverlap import getSentences
+
+'''
+A simulated crowd, for testing the pipeline end-to-end (and at scale) without running a real AMT batch.
+Run: python common/crowdSimulator.py [-simulate|-evaluate]
+    -simulate   creates an AMT batch results file for the HITs of INPUT_CSV_FILE (default)
+    -evaluate   compares the workers filtered by the agreement filtering of the scoring to the simulated spammers
+
+The input is an AMT input CSV file of phase 1 (as created by Phase1_SCU_writing/processing_scripts/pre_createInputForAMT.py)
+or phase 2 (as created by the Phase2_SCU_testing/processing_scripts/pre_createInputForAMT*.py scripts), and the output has the
+columns of an AMT batch results file, so it can be used as is by post_selectSCUsFromAMT.py or post_calculateScores*.py.
+
+The workers are drawn from a population model:
+    - a SPAMMER_FRACTION of the workers are spammers, who answer without reading (phase 2: 'p' with probability SPAMMER_PRESENT_RATE,
+      phase 1: statements that repeat the first words of the text)
+    - the other workers answer correctly with their own accuracy, drawn from Beta(ACCURACY_ALPHA, ACCURACY_BETA)
+      (phase 1: each statement is taken from a random sentence of the text, and is wrong (a truncated sentence) with 1 - accuracy)
+    - each answer is missing (left empty) with probability MISSING_ANSWER_RATE
+    - the work time of an assignment is log-normal around WORK_TIME_MEDIAN_SECONDS (times SPAMMER_WORK_TIME_FACTOR for spammers)
+In phase 2, each statement of a HIT is truly present in the summary with probability PRESENT_RATE.
+
+All the random draws are done at once for all the assignments (as numpy arrays), and only the writing of the CSV rows is done
+row by row, so millions of assignments can be simulated. To simulate more HITs than in the input file, set NUM_COPIES: each copy
+of the HITs gets the event IDs with a "-<copyNum>" suffix (after the first copy).
+
+The ground truth is written to GROUND_TRUTH_WORKERS_FILE (workerId, isSpammer, accuracy) and, in phase 2,
+GROUND_TRUTH_ANSWERS_FILE (HITId, eventId, summaryId, questionId, present).
+'''
+
+'''
+The AMT input CSV file of phase 1 or phase 2 (the phase is found by its columns).
+'''
+INPUT_CSV_FILE = '' # e.g. 'batch1.csv'
+'''
+The CSV file to write the simulated AMT batch results to.
+'''
+OUTPUT_RESULTS_FILE = '' # e.g. 'Batch_simulated_batch_results.csv'
+'''
+The CSV files to write the ground truth to (or '' to skip).
+'''
+GROUND_TRUTH_WORKERS_FILE = '' # e.g. 'simulated_workers.csv'
+GROUND_TRUTH_ANSWERS_FILE = '' # e.g. 'simulated_answers.csv'
+
+### Crowd model options:
+# The number of workers in the population, and the number of assignments (different workers) per HIT:
+NUM_WORKERS = 200
+ASSIGNMENTS_PER_HIT = 5
+# The fraction of spammers in the population, and the probability a spammer answers 'p' (phase 2):
+SPAMMER_FRACTION = 0.1
+SPAMMER_PRESENT_RATE = 0.5
+# The accuracy of the other workers is drawn from Beta(ACCURACY_ALPHA, ACCURACY_BETA) (the mean is 0.8 for 8 and 2):
+ACCURACY_ALPHA = 8.0
+ACCURACY_BETA = 2.0
+# The probability that an answer is left empty:
+MISSING_ANSWER_RATE = 0.02
+# The probability that a statement is truly present in the summary (phase 2):
+PRESENT_RATE = 0.5
+# The work time of an assignment: log-normal with this median and sigma (the spammers' median is multiplied by the factor):
+WORK_TIME_MEDIAN_SECONDS = 300
+WORK_TIME_SIGMA = 0.5
+SPAMMER_WORK_TIME_FACTOR = 0.3
+# The number of copies of the input HITs to simulate:
+NUM_COPIES = 1
+# The seed of the random draws:
+RANDOM_SEED = 0
+# The agreement threshold of the worker filtering to evaluate (-evaluate):
+EVALUATION_WORKER_AGREEMENT_THRESHOLD = 0.5
+
+
+# the number of statements a worker writes in phase 1 (Answer.s1 ... Answer.s8):
+NUM_PHASE1_STATEMENTS = 8
+# the number of words of a wrong (truncated) statement in phase 1:
+NUM_WRONG_STATEMENT_WORDS = 4
+# the columns of the AMT batch results file before the Input fields (the Answer fields come after them):
+AMT_RESULT_FIELDS = ['HITId', 'AssignmentId', 'WorkerId', 'AssignmentStatus', 'WorkTimeInSeconds']
+# the number of rows to write at once:
+WRITE_CHUNK_SIZE = 10000
+
+
+class CrowdSimulator(object):
+    # The simulated worker population, and the simulation of the assignments of a list of HITs.
+
+    def __init__(self, numWorkers, spammerFraction, accuracyAlpha, accuracyBeta, seed=None):
+        self.random = np.random.RandomState(seed)
+        self.numWorkers = numWorkers
+        self.workerIds = np.array(['SIMW{:06d}'.format(workerNum) for workerNum in range(numWorkers)])
+        self.isSpammer = self.random.rand(numWorkers) < spammerFraction
+        self.accuracy = np.where(self.isSpammer, 0.5, self.random.beta(accuracyAlpha, accuracyBeta, numWorkers))
+
+    def getHitWorkers(self, numHits, assignmentsPerHit):
+        # Draw different workers for the assignments of each HIT: [numHits, assignmentsPerHit] worker indices.
+        # The workers of a HIT are at increasing random offsets (of at most numWorkers / assignmentsPerHit) from a random first worker.
+        if assignmentsPerHit > self.numWorkers:
+            raise ValueError('Not enough workers ({}) for {} assignments per HIT'.format(self.numWorkers, assignmentsPerHit))
+        maxStep = self.numWorkers // assignmentsPerHit
+        steps = self.random.randint(1, maxStep + 1, (numHits, assignmentsPerHit))
+        steps[:, 0] = self.random.randint(0, self.numWorkers, numHits)
+        return np.cumsum(steps, axis=1) % self.numWorkers
+
+    def getWorkTimes(self, workers):
+        medians = np.where(self.isSpammer[workers], WORK_TIME_MEDIAN_SECONDS * SPAMMER_WORK_TIME_FACTOR, WORK_TIME_MEDIAN_SECONDS)
+        return np.maximum(1, np.round(medians * np.exp(self.random.randn(*workers.shape) * WORK_TIME_SIGMA))).astype(int)
+
+    def simulatePhase2(self, numHits, numStatements, assignmentsPerHit):
+        # Simulate the answers of the phase 2 HITs.
+        # Returns the workers [hit, assignment], the answers [hit, assignment, statement] as 'p'/'n'/'', the truth [hit, statement] and the work times.
+        workers = self.getHitWorkers(numHits, assignmentsPerHit)
+        truth = self.random.rand(numHits, numStatements) < PRESENT_RATE
+        isCorrect = self.random.rand(numHits, assignmentsPerHit, numStatements) < self.accuracy[workers][:, :, None]
+        answersPresent = np.where(isCorrect, truth[:, None, :], ~truth[:, None, :])
+        spammerAnswers = self.random.rand(numHits, assignmentsPerHit, numStatements) < SPAMMER_PRESENT_RATE
+        answersPresent = np.where(self.isSpammer[workers][:, :, None], spammerAnswers, answersPresent)
+        answerCodes = answersPresent.astype(int) # 0='n', 1='p', 2=''
+        answerCodes[self.random.rand(numHits, assignmentsPerHit, numStatements) < MISSING_ANSWER_RATE] = 2
+        answers = np.array(['n', 'p', ''])[answerCodes]
+        return workers, answers, truth, self.getWorkTimes(workers)
+
+    def simulatePhase1(self, texts, assignmentsPerHit):
+        # Simulate the statements written for the phase 1 HITs (one text per HIT).
+        # Returns the workers [hit, assignment], the statements [hit, assignment, statement] and the work times.
+        numHits = len(texts)
+        sentences = [getSentences(text) for text in texts]
+        numSentences = np.array([len(textSentences) for textSentences in sentences])
+        workers = self.getHitWorkers(numHits, assignmentsPerHit)
+        shape = (numHits, assignmentsPerHit, NUM_PHASE1_STATEMENTS)
+        sentenceIndices = (self.random.rand(*shape) * numSentences[:, None, None]).astype(int)
+        isCorrect = self.random.rand(*shape) < self.accuracy[workers][:, :, None]
+        # 0=the sentence, 1=a truncated sentence, 2=the first words of the text (spammers), 3=missing:
+        statementKinds = np.where(isCorrect, 0, 1)
+        statementKinds[np.broadcast_to(self.isSpammer[workers][:, :, None], shape)] = 2
+        statementKinds[self.random.rand(*shape) < MISSING_ANSWER_RATE] = 3
+
+        statements = np.empty(shape, dtype=object)
+        for hitIdx, assignmentIdx, statementIdx in zip(*np.nonzero(statementKinds < 3)):
+            sentence = sentences[hitIdx][sentenceIndices[hitIdx, assignmentIdx, statementIdx]]
+            kind = statementKinds[hitIdx, assignmentIdx, statementIdx]
+            if kind == 0:
+                statements[hitIdx, assignmentIdx, statementIdx] = sentence
+            elif kind == 1:
+                statements[hitIdx, assignmentIdx, statementIdx] = ' '.join(sentence.split()[:NUM_WRONG_STATEMENT_WORDS])
+            else:
+                statements[hitIdx, assignmentIdx, statementIdx] = ' '.join(texts[hitIdx].split()[:NUM_WRONG_STATEMENT_WORDS])
+        statements[statementKinds == 3] = ''
+        return workers, statements, self.getWorkTimes(workers)
+
+
+def readInputHits(inputCsvFile, numCopies=1):
+    # The input fields and the rows of the HITs (with numCopies copies of all the rows).
+    with open(inputCsvFile, 'r') as inF:
+        csvReader = csv.DictReader(inF)
+        inputFields = csvReader.fieldnames
+        rows = list(csvReader)
+    hitRows = []
+    for copyNum in range(numCopies):
+        for row in rows:
+            if copyNum > 0:
+                row = dict(row, eventId='{}-{}'.format(row['eventId'], copyNum + 1))
+            hitRows.append(row)
+    return inputFields, hitRows
+
+def writeResults(outputFile, inputFields, answerFields, hitRows, workerIds, answers, workTimes):
+    # Write the AMT batch results file: a row per assignment, with the input fields of its HIT and its answers
+    # (answers is [hit, assignment, answerField]).
+    numHits, assignmentsPerHit = workerIds.shape
+    with open(outputFile, 'w') as outF:
+        csvWriter = csv.writer(outF, lineterminator='\n')
+        csvWriter.writerow(AMT_RESULT_FIELDS + ['Input.' + field for field in inputFields] + ['Answer.' + field for field in answerFields])
+        rows = []
+        for hitIdx in range(numHits):
+            inputValues = [hitRows[hitIdx][field] for field in inputFields]
+            hitAnswers = answers[hitIdx].tolist()
+            for assignmentIdx in range(assignmentsPerHit):
+                rows.append(['SIMHIT{:08d}'.format(hitIdx + 1), 'SIMA{:010d}'.format(hitIdx * assignmentsPerHit + assignmentIdx + 1),
+                             workerIds[hitIdx, assignmentIdx], 'Submitted', workTimes[hitIdx, assignmentIdx]] + inputValues + hitAnswers[assignmentIdx])
+            if len(rows) >= WRITE_CHUNK_SIZE:
+                csvWriter.writerows(rows)
+                rows = []
+        csvWriter.writerows(rows)
+
+def simulate(inputCsvFile, outputFile, groundTruthWorkersFile='', groundTruthAnswersFile=''):
+    inputFields, hitRows = readInputHits(inputCsvFile, NUM_COPIES)
+    simulator = CrowdSimulator(NUM_WORKERS, SPAMMER_FRACTION, ACCURACY_ALPHA, ACCURACY_BETA, RANDOM_SEED)
+
+    if 'qIdList' in inputFields:
+        # phase 2: the statements of each HIT are in the statement_<n> columns, and answered in the S<n>Answer fields:
+        numStatements = len([field for field in inputFields if re.match(r'statement_\d+$', field)])
+        answerFields = ['S{}Answer'.format(statementNum) for statementNum in range(1, numStatements + 1)]
+        workers, answers, truth, workTimes = simulator.simulatePhase2(len(hitRows), numStatements, ASSIGNMENTS_PER_HIT)
+        if groundTruthAnswersFile != '':
+            with open(groundTruthAnswersFile, 'w') as outF:
+                csvWriter = csv.writer(outF, lineterminator='\n')
+                csvWriter.writerow(['HITId', 'eventId', 'summaryId', 'questionId', 'present'])
+                for hitIdx, row in enumerate(hitRows):
+                    # (the qIdList is the repr of the list of questionIds, as read by getRawData in litePyramidScoring.py):
+                    questionIds = ast.literal_eval(row['qIdList'])
+                    for statementIdx, questionId in enumerate(questionIds):
+                        csvWriter.writerow(['SIMHIT{:08d}'.format(hitIdx + 1), row['eventId'], row['summaryId'], questionId, int(truth[hitIdx, statementIdx])])
+    else:
+        # phase 1: the statements written for the text are in the s1...s8 fields:
+        answerFields = ['s{}'.format(statementNum) for statementNum in range(1, NUM_PHASE1_STATEMENTS + 1)]
+        workers, answers, workTimes = simulator.simulatePhase1([row['summary_text'] for row in hitRows], ASSIGNMENTS_PER_HIT)
+
+    writeResults(outputFile, inputFields, answerFields, hitRows, simulator.workerIds[workers], answers, workTimes)
+    if groundTruthWorkersFile != '':
+        with open(groundTruthWorkersFile, 'w') as outF:
+            csvWriter = csv.writer(outF, lineterminator='\n')
+            csvWriter.writerow(['workerId', 'isSpammer', 'accuracy'])
+            for workerIdx in range(simulator.numWorkers):
+                csvWriter.writerow([simulator.workerIds[workerIdx], int(simulator.isSpammer[workerIdx]), round(simulator.accuracy[workerIdx], 4)])
+    print('Simulated {} assignments of {} HITs to {}'.format(workers.size, len(hitRows), outputFile))
+
+def evaluateWorkerFiltering(resultsFile, groundTruthWorkersFile, workerAgreementThreshold):
+    # Compare the workers filtered by the agreement filtering of the scoring (phase 2) to the simulated spammers.
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Phase2_SCU_testing', 'processing_scripts'))
+    from litePyramidScoring import getRawData, mapValues, getWorkersToFilter
+
+    with open(groundTruthWorkersFile, 'r') as inF:
+        spammerIds = set(row['workerId'] for row in csv.DictReader(inF) if row['isSpammer'] == '1')
+    rawDataValues, questionIdsPerEvent = getRawData(resultsFile)
+    workersToFilter = set(getWorkersToFilter(mapValues(rawDataValues, 1.0), questionIdsPerEvent, workerAgreementThreshold, 1))
+    workerIds = set(solution['workerId'] for eventId in rawDataValues for summId in rawDataValues[eventId] for solution in rawDataValues[eventId][summId])
+    spammerIds &= workerIds
+
+    numCorrect = len(workersToFilter & spammerIds)
+    print('Workers: {}, spammers: {}, filtered: {}'.format(len(workerIds), len(spammerIds), len(workersToFilter)))
+    print('Precision: {}'.format(float(numCorrect) / len(workersToFilter) if len(workersToFilter) > 0 else 0.0))
+    print('Recall: {}'.format(float(numCorrect) / len(spammerIds) if len(spammerIds) > 0 else 0.0))
+
+
+def main(mode='-simulate'):
+    if mode == '-evaluate':
+        evaluateWorkerFiltering(OUTPUT_RESULTS_FILE, GROUND_TRUTH_WORKERS_FILE, EVALUATION_WORKER_AGREEMENT_THRESHOLD)
+    else:
+        simulate(INPUT_CSV_FILE, OUTPUT_RESULTS_FILE, GROUND_TRUTH_WORKERS_FILE, GROUND_TRUTH_ANSWERS_FILE)
+
+
+if __name__ == '__main__':
+    MODES = ['-simulate', '-evaluate']
+    if len(sys.argv) > 1 and sys.argv[1] not in MODES:
+        print('Usage: python crowdSimulator.py [-simulate|-evaluate]')
+        sys.exit()
+    main(sys.argv[1] if len(sys.argv) > 1 else '-simulate')
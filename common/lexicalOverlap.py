@@ -0,0 +1,137 @@
+import re
+import numpy as np
+try:
+    unicode
+except NameError: # python 3
+    unicode = str
+
+'''
+Lexical overlap between short statements (SCUs) and the texts they may be found in (summaries), on content lemmas.
+Used to pre-label the (summary, SCU) pairs that are decidable without the crowd.
+
+The texts are lemmatized in batch, each distinct text only once (a summary is usually checked against tens of SCUs):
+    - 'spacy': the lemmas of the spaCy pipeline (without stop words and punctuation), as in the SCU similarity of
+      Phase1_SCU_writing/processing_scripts/post_selectSCUsFromAMT.py
+    - 'simple': lower-cased word tokens without stop words, with a light suffix stripping (fast, and without dependencies)
+The measures of a statement against a text are:
+    - the lemma overlap: the fraction of the statement's distinct content lemmas that are in the text
+    - the n-gram containment: the fraction of the statement's content lemma n-grams that are in the text
+Texts can also be compared by the cosine similarity of their vectors: the average of the static word embeddings of their
+content lemmas (from a word2vec/GloVe text file, as EMBEDDINGS_FILE in post_selectSCUsFromAMT.py).
+'''
+
+# the stop words of the 'simple' lemmatizer:
+STOP_WORDS = set('''a about above after again against all also am an and any are as at be because been before being below between both
+but by can could did do does doing down during each few for from further had has have having he her here hers herself him himself his
+how i if in into is it its itself just me more most my myself no nor not now of off on once only or other our ours ourselves out over own
+same she should so some such than that the their theirs them themselves then there these they this those through to too under until up
+very was we were what when where which while who whom why will with would you your yours yourself yourselves'''.split())
+# the suffixes stripped by the 'simple' lemmatizer: (suffix, replacement, minimum word length)
+# (the first matching suffix is used, so 'ss' keeps words like 'class' from losing their last 's')
+SIMPLE_SUFFIXES = [('ies', 'y', 5), ('sses', 'ss', 5), ('ss', 'ss', 3), ('ing', '', 6), ('ed', '', 5), ('s', '', 4)]
+# the spaCy model of the 'spacy' lemmatizer:
+SPACY_MODEL = 'en_core_web_sm'
+
+nlp = None # the spaCy pipeline, loaded when first needed (spaCy is slow to import and load)
+
+
+class LexicalScorer(object):
+    # Computes the overlap measures of statements against texts, keeping the content lemmas of each distinct text.
+
+    def __init__(self, lemmatizer='spacy', ngramSize=2):
+        self.lemmatizer = lemmatizer
+        self.ngramSize = ngramSize
+        self.lemmasCache = {} # { text -> [content lemmas] }
+
+    def addTexts(self, texts):
+        # Lemmatize all the texts not seen yet, in one batch.
+        newTexts = list(set(text for text in texts if text not in self.lemmasCache))
+        for text, lemmas in zip(newTexts, getContentLemmas(newTexts, self.lemmatizer)):
+            self.lemmasCache[text] = lemmas
+
+    def getLemmas(self, text):
+        if text not in self.lemmasCache:
+            self.addTexts([text])
+        return self.lemmasCache[text]
+
+    def getOverlaps(self, pairs):
+        # The overlap measures of each (statement, text) pair: [(lemmaOverlap, ngramContainment)].
+        # The lemma and n-gram sets of each distinct text are built once for all its pairs.
+        self.addTexts([text for pair in pairs for text in pair])
+        textSets = {} # { text -> (set of lemmas, set of n-grams) }
+        for text in set(text for pair in pairs for text in pair):
+            lemmas = self.lemmasCache[text]
+            textSets[text] = (set(lemmas), set(getNgrams(lemmas, self.ngramSize)))
+        overlaps = []
+        for statement, text in pairs:
+            statementLemmas, statementNgrams = textSets[statement]
+            textLemmas, textNgrams = textSets[text]
+            overlaps.append((getContainment(statementLemmas, textLemmas), getContainment(statementNgrams, textNgrams)))
+        return overlaps
+
+
+def getContentLemmas(texts, lemmatizer='spacy'):
+    # The content lemmas of each of the texts (in order, lower-cased): [[lemmas]]
+    if lemmatizer == 'spacy':
+        nlp = _getNlp()
+        return [[token.lemma_.lower() for token in doc if not token.is_stop and not token.is_punct and not token.is_space]
+                for doc in nlp.pipe([unicode(text) for text in texts])]
+    elif lemmatizer == 'simple':
+        return [[_getSimpleLemma(word) for word in re.findall(r'[a-z0-9]+', text.lower()) if word not in STOP_WORDS] for text in texts]
+    raise ValueError('Unknown lemmatizer: {}'.format(lemmatizer))
+
+def getSentences(text):
+    # the sentences of a text (split after '.', '!' or '?'):
+    sentences = [sentence.strip() for sentence in re.split(r'(?<=[.!?])\s+', text) if sentence.strip() != '']
+    return sentences if len(sentences) > 0 else [text]
+
+def getNgrams(lemmas, ngramSize):
+    # The n-grams of the lemmas (a single shorter n-gram if there are less than ngramSize lemmas).
+    if len(lemmas) < ngramSize:
+        return [tuple(lemmas)] if len(lemmas) > 0 else []
+    return [tuple(lemmas[i:i + ngramSize]) for i in range(len(lemmas) - ngramSize + 1)]
+
+def getContainment(statementSet, textSet):
+    # The fraction of the statement's set that is in the text's set (0 for an empty statement).
+    if len(statementSet) == 0:
+        return 0.0
+    return float(len(statementSet & textSet)) / len(statementSet)
+
+def readStaticEmbeddings(embeddingsFile):
+    # Read the word vectors of a word2vec/GloVe text file (a word and then its vector values on each line): { word -> vector }
+    embeddings = {}
+    with open(embeddingsFile, 'r') as inF:
+        for line in inF:
+            parts = line.rstrip().split(' ')
+            # skip the header line of word2vec files (<numWords> <dimension>):
+            if len(parts) <= 2:
+                continue
+            embeddings[parts[0]] = np.array(parts[1:], dtype=np.float32)
+    return embeddings
+
+def getTextVectors(lemmaLists, embeddings):
+    # The L2-normalized average vector of the known lemmas of each text, as the rows of one matrix (a zero row for a text
+    # without any known lemma), so that the dot product of two rows is their cosine similarity.
+    dim = len(next(iter(embeddings.values())))
+    vectors = np.zeros((len(lemmaLists), dim), dtype=np.float32)
+    for textIdx, lemmas in enumerate(lemmaLists):
+        lemmaVectors = [embeddings[lemma] for lemma in lemmas if lemma in embeddings]
+        if len(lemmaVectors) > 0:
+            vectors[textIdx] = np.mean(lemmaVectors, axis=0)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def _getSimpleLemma(word):
+    for suffix, replacement, minLength in SIMPLE_SUFFIXES:
+        if len(word) >= minLength and word.endswith(suffix):
+            return word[:-len(suffix)] + replacement
+    return word
+
+def _getNlp():
+    # Load the spaCy pipeline (only once), without the parser and entity recognizer that the lemmas don't need.
+    global nlp
+    if nlp is None:
+        import spacy
+        nlp = spacy.load(SPACY_MODEL, disable=['parser', 'ner'])
+    return nlp
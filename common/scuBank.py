@@ -0,0 +1,87 @@
+import csv
+import numpy as np
+from lexicalOverlap import LexicalScorer, getNgrams, getContainment, getSentences, readStaticEmbeddings, getTextVectors
+
+'''
+A bank of existing SCUs (e.g. the DUC 2005/2006 SCU files in Phase1_SCU_writing/dataset), indexed for retrieving the SCUs
+that a new text (e.g. a new reference summary) entails.
+
+The SCUs are read from SCU files (eventId,questionId,questionText,answer,author,sourceSummaryId,forUse), each SCU once,
+and their content lemmas (see common/lexicalOverlap.py) are put in an inverted index { lemma -> [SCU indices] }.
+A text is matched only against the SCUs that share a lemma with it: the number of shared lemmas of all these SCUs is
+counted at once from the index, and the SCUs with a high enough lemma overlap are then checked for their n-gram containment
+in the text, and optionally for the cosine similarity of their vector to the vector of the most similar sentence of the text.
+'''
+
+class ScuBank(object):
+
+    def __init__(self, questionsFiles, lemmatizer='spacy', ngramSize=2, embeddingsFile=''):
+        self.scus = [] # [{'eventId', 'questionId', 'questionText', 'author', 'sourceSummaryId'}]
+        seenScus = set()
+        for questionsFile in questionsFiles:
+            with open(questionsFile, 'r') as inF:
+                for row in csv.DictReader(inF):
+                    # the batch files of a dataset hold the same SCUs (with different forUse marks):
+                    scuKey = (row['eventId'], row['questionId'], row['questionText'])
+                    if scuKey not in seenScus:
+                        seenScus.add(scuKey)
+                        self.scus.append({field: row[field] for field in ['eventId', 'questionId', 'questionText', 'author', 'sourceSummaryId']})
+
+        # the content lemmas of all the SCUs (lemmatized in one batch), and the inverted index:
+        self.scorer = LexicalScorer(lemmatizer, ngramSize)
+        self.scorer.addTexts([scu['questionText'] for scu in self.scus])
+        scuLemmas = [self.scorer.getLemmas(scu['questionText']) for scu in self.scus]
+        self.scuLemmaSets = [set(lemmas) for lemmas in scuLemmas]
+        self.scuNgramSets = [set(getNgrams(lemmas, ngramSize)) for lemmas in scuLemmas]
+        self.numScuLemmas = np.array([len(lemmaSet) for lemmaSet in self.scuLemmaSets])
+        lemmaIndex = {} # { lemma -> [SCU indices] }
+        for scuIdx, lemmaSet in enumerate(self.scuLemmaSets):
+            for lemma in lemmaSet:
+                lemmaIndex.setdefault(lemma, []).append(scuIdx)
+        self.lemmaIndex = {lemma: np.array(scuIndices) for lemma, scuIndices in lemmaIndex.items()}
+
+        # the SCU vectors (optional):
+        if embeddingsFile != '':
+            self.embeddings = readStaticEmbeddings(embeddingsFile)
+            self.scuVectors = getTextVectors(scuLemmas, self.embeddings)
+        else:
+            self.embeddings = None
+            self.scuVectors = None
+
+    def retrieve(self, text, minLemmaOverlap, minNgramContainment, minCosine=0.0):
+        # Get the SCUs entailed by the text: [(scuIdx, lemmaOverlap, ngramContainment, cosine)], best first
+        # (the cosine is None when the bank has no vectors).
+        textLemmas = self.scorer.getLemmas(text)
+        textLemmaSet = set(textLemmas)
+        textNgramSet = set(getNgrams(textLemmas, self.scorer.ngramSize))
+
+        # count the shared lemmas of all the SCUs that share any lemma with the text:
+        postings = [self.lemmaIndex[lemma] for lemma in textLemmaSet if lemma in self.lemmaIndex]
+        if len(postings) == 0:
+            return []
+        sharedCounts = np.bincount(np.concatenate(postings), minlength=len(self.scus))
+        lemmaOverlaps = sharedCounts / np.maximum(self.numScuLemmas, 1).astype(float)
+        candidates = np.nonzero((lemmaOverlaps >= minLemmaOverlap) & (sharedCounts > 0))[0]
+
+        # the n-gram containment of the candidates:
+        ngramContainments = np.array([getContainment(self.scuNgramSets[scuIdx], textNgramSet) for scuIdx in candidates])
+        isEntailed = ngramContainments >= minNgramContainment
+
+        # the cosine similarity of the candidates to the most similar sentence of the text:
+        if self.scuVectors is not None and len(candidates) > 0:
+            sentences = getSentences(text)
+            self.scorer.addTexts(sentences)
+            sentenceVectors = getTextVectors([self.scorer.getLemmas(sentence) for sentence in sentences], self.embeddings)
+            cosines = self.scuVectors[candidates].dot(sentenceVectors.T).max(axis=1)
+            isEntailed &= cosines >= minCosine
+        else:
+            cosines = [None] * len(candidates)
+
+        retrieved = [(int(scuIdx), float(lemmaOverlaps[scuIdx]), float(ngramContainment), None if cosine is None else float(cosine))
+                     for scuIdx, ngramContainment, cosine, entailed in zip(candidates, ngramContainments, cosines, isEntailed) if entailed]
+        return sorted(retrieved, key=lambda scuMatch: (-scuMatch[1], -scuMatch[2]))
+
+    def retrieveAll(self, texts, minLemmaOverlap, minNgramContainment, minCosine=0.0):
+        # Retrieve the SCUs entailed by each of the texts (lemmatized in one batch): [[(scuIdx, lemmaOverlap, ngramContainment, cosine)]]
+        self.scorer.addTexts(texts)
+        return [self.retrieve(text, minLemmaOverlap, minNgramContainment, minCosine) for text in texts]
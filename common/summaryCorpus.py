@@ -0,0 +1,106 @@
+import os
+import bisect
+from multiprocessing.pool import ThreadPool
+
+'''
+An index over a folder of summaries (reference or system summaries), used by the AMT input creation scripts.
+The folder is scanned once, and the summary files are then found with dictionary lookups instead of
+matching every filename against every event/system.
+
+DUC-style filenames like "D0601.M.250.A.16" (eventId.manual.lengthInWords.assessorID.systemID) are keyed by
+their eventId, assessorId and systemId. A filename without dots (e.g. "D0601") is keyed by the eventId only.
+The summaries of an event are all the files whose name starts with the eventId (e.g. also "D0601A_1.txt"), as the
+reference summaries only need to be named with the topic ID first.
+The texts are read lazily on demand (and kept), or in parallel for a list of files with readTexts.
+'''
+
+class SummaryCorpus(object):
+
+    def __init__(self, summariesFolder, numReadThreads=8):
+        self.summariesFolder = summariesFolder
+        self.numReadThreads = numReadThreads
+        self.filenames = [] # all the summary filenames in the folder
+        self.filenamesByEvent = {} # { eventId -> [filenames] }
+        self.filenamesByEventSystem = {} # { (eventId, systemId) -> [filenames] }
+        self.filenamesByEventAssessor = {} # { (eventId, assessorId) -> [filenames] }
+        self.texts = {} # { filename -> text } of the files read so far
+        self.fileIndices = {} # { filename -> index in self.filenames }
+
+        # scan the folder once:
+        for entry in _scanFolder(summariesFolder):
+            self.fileIndices[entry] = len(self.filenames)
+            self.filenames.append(entry)
+            eventId, assessorId, systemId = parseSummaryFilename(entry)
+            self.filenamesByEvent.setdefault(eventId, []).append(entry)
+            if systemId is not None:
+                self.filenamesByEventSystem.setdefault((eventId, systemId), []).append(entry)
+            if assessorId is not None:
+                self.filenamesByEventAssessor.setdefault((eventId, assessorId), []).append(entry)
+        # the sorted eventId keys, where the keys starting with an eventId are consecutive:
+        self.sortedEventKeys = sorted(self.filenamesByEvent)
+
+    def getFilenames(self, eventId, systemId=None, assessorId=None):
+        # Get the filenames of the summaries of the event (optionally of a specific system or assessor).
+        if systemId is not None:
+            filenames = self.filenamesByEventSystem.get((eventId, systemId), [])
+            if assessorId is not None:
+                filenames = [fn for fn in filenames if fn in self.filenamesByEventAssessor.get((eventId, assessorId), [])]
+        elif assessorId is not None:
+            filenames = self.filenamesByEventAssessor.get((eventId, assessorId), [])
+        else:
+            # all the files with a name starting with the eventId (not only those keyed by exactly the eventId), in the folder order:
+            eventKeys = []
+            keyIdx = bisect.bisect_left(self.sortedEventKeys, eventId)
+            while keyIdx < len(self.sortedEventKeys) and self.sortedEventKeys[keyIdx].startswith(eventId):
+                eventKeys.append(self.sortedEventKeys[keyIdx])
+                keyIdx += 1
+            if eventKeys == [eventId]:
+                filenames = self.filenamesByEvent[eventId]
+            else:
+                filenames = sorted((fn for eventKey in eventKeys for fn in self.filenamesByEvent[eventKey]), key=self.fileIndices.get)
+        return list(filenames)
+
+    def getAllFilenames(self):
+        return list(self.filenames)
+
+    def getEventIds(self):
+        return list(self.filenamesByEvent.keys())
+
+    def getText(self, filename):
+        # Get the text of the summary file (read from disk on first use only).
+        if filename not in self.texts:
+            self.texts[filename] = self._readFile(filename)
+        return self.texts[filename]
+
+    def readTexts(self, filenames):
+        # Read the given summary files in parallel (those not read yet). Returns { filename -> text }.
+        filenamesToRead = [fn for fn in set(filenames) if fn not in self.texts]
+        if len(filenamesToRead) > 0:
+            pool = ThreadPool(max(1, min(self.numReadThreads, len(filenamesToRead))))
+            try:
+                for filename, text in zip(filenamesToRead, pool.map(self._readFile, filenamesToRead)):
+                    self.texts[filename] = text
+            finally:
+                pool.close()
+        return {fn: self.texts[fn] for fn in filenames}
+
+    def _readFile(self, filename):
+        with open(os.path.join(self.summariesFolder, filename), 'r') as fIn:
+            return fIn.read()
+
+
+def parseSummaryFilename(filename):
+    # Get the (eventId, assessorId, systemId) of a summary filename. The IDs that are not in the filename are None.
+    # e.g. "D0601.M.250.A.16" -> ("D0601", "A", "16"), "D0601.M.250.A.A" -> ("D0601", "A", "A"), "D0601" -> ("D0601", None, None)
+    parts = filename.split('.')
+    eventId = parts[0]
+    assessorId = parts[3] if len(parts) == 5 else None
+    systemId = parts[-1] if len(parts) > 1 else None
+    return eventId, assessorId, systemId
+
+def _scanFolder(folder):
+    # the names of the files in the folder (os.scandir avoids a stat call per file where available):
+    if hasattr(os, 'scandir'):
+        return [entry.name for entry in os.scandir(folder) if entry.is_file()]
+    else:
+        return [fn for fn in os.listdir(folder) if os.path.isfile(os.path.join(folder, fn))]
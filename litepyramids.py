@@ -0,0 +1,242 @@
+import os
+import sys
+import json
+import argparse
+import importlib
+
+'''
+The command line interface to the Lite-Pyramid scripts of both phases and the score extraction.
+Run: python litepyramids.py <subcommand> [options] [--config <config.json>]
+     python litepyramids.py -h                  lists the subcommands
+     python litepyramids.py <subcommand> -h     lists the options of a subcommand
+
+Each subcommand runs one script (see the script for the meaning of its settings). The script is imported only when its
+subcommand is run, so heavy dependencies (scipy, spacy, nltk) are loaded only by the subcommands that need them.
+
+The settings of a script are the upper-case variables at its top. They are taken from (in order of precedence):
+    1. the command line options of the subcommand
+    2. the --config JSON file: { SETTING_NAME -> value }, optionally with a section per subcommand { subcommand -> { SETTING_NAME -> value } }
+       (the top-level settings are shared by all the subcommands, so each subcommand uses only those its script has,
+       while an unknown setting in the subcommand's own section is an error)
+    3. the values in the script itself
+e.g. a config file for phase2-scores:
+    {"RESULTS_FILE_INPUT": "Batch_results.csv", "phase2-scores": {"ANSWER_AGGREGATION_TYPE": [0, 1, 2], "NUM_ITERATION_ON_CONFIGURATION": 100}}
+'''
+
+ROOT_FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+# the argparse arguments of each kind of option:
+OPTION_KINDS = {
+    'str': {},
+    'int': {'type': int},
+    'float': {'type': float},
+    'list': {'nargs': '+'},
+    'flag': {'action': 'store_const', 'const': True},
+}
+
+# { subcommand -> (script path, description, [(option, SETTING_NAME, kind)], run function (module, settings)) }
+# The run functions mirror the __main__ block of each script.
+SUBCOMMANDS = {
+    'phase1-create-hits': (
+        'Phase1_SCU_writing/processing_scripts/pre_createInputForAMT.py',
+        'Create the AMT input of the SCU writing task from reference summaries.',
+        [('--ref-summ-folder', 'REF_SUMM_FOLDER', 'str'), ('--event-ids', 'EVENT_IDS', 'list'),
+         ('--output-file', 'OUTPUT_FILE', 'str'), ('--num-refs-per-event', 'NUM_REFS_PER_EVENT', 'int')],
+        lambda module, settings: module.main(settings['REF_SUMM_FOLDER'], settings['EVENT_IDS'], settings['OUTPUT_FILE'], settings['NUM_REFS_PER_EVENT'])),
+    'phase1-reuse-bank-scus': (
+        'Phase1_SCU_writing/processing_scripts/pre_reuseBankSCUs.py',
+        'Retrieve the existing SCUs that new reference summaries entail, and create the AMT input only for the uncovered summaries.',
+        [('--bank-files', 'BANK_QUESTIONS_FILES', 'list'), ('--ref-summ-folder', 'REF_SUMM_FOLDER', 'str'), ('--event-ids', 'EVENT_IDS', 'list'),
+         ('--output-file', 'OUTPUT_QUESTIONS_FILE', 'str'), ('--amt-input-file', 'OUTPUT_AMT_INPUT_FILE', 'str'),
+         ('--report-file', 'OUTPUT_REPORT_FILE', 'str'), ('--num-scus-per-ref', 'NUM_SCUS_PER_REF', 'int'),
+         ('--lemmatizer', 'LEMMATIZER', 'str'), ('--embeddings-file', 'EMBEDDINGS_FILE', 'str')],
+        lambda module, settings: module.main(settings['BANK_QUESTIONS_FILES'], settings['REF_SUMM_FOLDER'], settings['EVENT_IDS'],
+                                             settings['OUTPUT_QUESTIONS_FILE'], settings['OUTPUT_AMT_INPUT_FILE'], settings['OUTPUT_REPORT_FILE'])),
+    'phase1-select-scus': (
+        'Phase1_SCU_writing/processing_scripts/post_selectSCUsFromAMT.py',
+        'Select the SCUs to use from the AMT results of the SCU writing task.',
+        [('--results-file', 'SCUS_RESULTS_CSV', 'str'), ('--output-file', 'OUTPUT_CSV_PATH', 'str'),
+         ('--num-scus-to-sample', 'NUM_SCUS_TO_SAMPLE', 'int'), ('--similarity-type', 'SIMILARITY_TYPE', 'str'),
+         ('--embeddings-file', 'EMBEDDINGS_FILE', 'str'), ('--streaming', 'STREAMING_MODE', 'flag')],
+        lambda module, settings: (module.mainStreaming if settings['STREAMING_MODE'] else module.main)(settings['SCUS_RESULTS_CSV'], settings['OUTPUT_CSV_PATH'])),
+    'phase1-create-batches': (
+        'Phase1_SCU_writing/processing_scripts/post_createSCUBatches.py',
+        'Split the selected SCUs into disjoint SCU batches.',
+        [('--input-file', 'INPUT_QUESTIONS_CSV_PATH', 'str'), ('--output-files', 'OUTPUT_QUESTIONS_CSV_PATHS', 'list'),
+         ('--report-file', 'REPORT_CSV_PATH', 'str'), ('--num-scus-per-ref', 'NUM_SCUS_PER_REF', 'int'),
+         ('--keep-input-as-first-batch', 'KEEP_INPUT_AS_FIRST_BATCH', 'flag')],
+        lambda module, settings: module.main(settings['INPUT_QUESTIONS_CSV_PATH'], settings['OUTPUT_QUESTIONS_CSV_PATHS'], settings['REPORT_CSV_PATH'])),
+    'phase1-use-other-scus': (
+        'Phase1_SCU_writing/processing_scripts/post_useOtherSCUs.py',
+        'Create an SCU batch with SCUs not used in another batch.',
+        [('--input-file', 'INPUT_QUESTIONS_CSV_PATH', 'str'), ('--output-file', 'OUTPUT_QUESTIONS_CSV_PATH', 'str'),
+         ('--num-scus-per-ref', 'NUM_SCUS_PER_REF', 'int')],
+        lambda module, settings: module.main(settings['INPUT_QUESTIONS_CSV_PATH'], settings['OUTPUT_QUESTIONS_CSV_PATH'])),
+    'phase2-create-hits': (
+        'Phase2_SCU_testing/processing_scripts/pre_createInputForAMT.py',
+        'Create the AMT input of the system summary evaluation task.',
+        [('--event-ids', 'EVENT_IDS', 'list'), ('--system-ids', 'SYSTEM_IDS', 'list'), ('--summaries-folder', 'SUMMARIES_FOLDER', 'str'),
+         ('--output-file', 'OUT_CSV_FILE', 'str'), ('--questions-file', 'QUESTIONS_FILE', 'str'),
+         ('--additional-questions-files', 'ADDITIONAL_QUESTIONS_FILES', 'list'), ('--statements-per-hit', 'STATEMENTS_PER_HIT', 'int'),
+         ('--layout-file', 'OUT_LAYOUT_FILE', 'str')],
+        lambda module, settings: module.main(settings['EVENT_IDS'], settings['SYSTEM_IDS'], settings['SUMMARIES_FOLDER'], settings['OUT_CSV_FILE'],
+                                             [settings['QUESTIONS_FILE']] + settings['ADDITIONAL_QUESTIONS_FILES'], settings['STATEMENTS_PER_HIT'], settings['OUT_LAYOUT_FILE'])),
+    'phase2-create-follow-up-hits': (
+        'Phase2_SCU_testing/processing_scripts/pre_createFollowUpInputForAMT.py',
+        'Create a follow-up AMT input of the evaluation task with only the SCUs whose answers are still uncertain.',
+        [('--results-files', 'RESULTS_FILES', 'list'), ('--output-file', 'OUT_CSV_FILE', 'str'), ('--merged-results-file', 'MERGED_RESULTS_FILE', 'str'),
+         ('--statements-per-hit', 'STATEMENTS_PER_HIT', 'int'), ('--layout-file', 'OUT_LAYOUT_FILE', 'str'),
+         ('--uncertainty-threshold', 'UNCERTAINTY_THRESHOLD', 'float'), ('--max-answers-per-item', 'MAX_ANSWERS_PER_ITEM', 'int')],
+        lambda module, settings: module.main(settings['RESULTS_FILES'], settings['OUT_CSV_FILE'], settings['MERGED_RESULTS_FILE'],
+                                             settings['STATEMENTS_PER_HIT'], settings['OUT_LAYOUT_FILE'])),
+    'phase2-prefilter': (
+        'Phase2_SCU_testing/processing_scripts/pre_filterByLexicalOverlap.py',
+        'Label the (summary, SCU) pairs decidable by lexical overlap, and keep only the others in the AMT input (or evaluate the labels on AMT results).',
+        [('--mode', 'MODE', 'str'), ('--input-file', 'INPUT_CSV_FILE', 'str'), ('--output-file', 'OUT_CSV_FILE', 'str'),
+         ('--auto-labels-file', 'AUTO_LABELS_RESULTS_FILE', 'str'), ('--statements-per-hit', 'STATEMENTS_PER_HIT', 'int'),
+         ('--layout-file', 'OUT_LAYOUT_FILE', 'str'), ('--evaluation-results-file', 'EVALUATION_RESULTS_FILE', 'str'),
+         ('--evaluation-output-file', 'EVALUATION_OUTPUT_FILE', 'str'), ('--lemmatizer', 'LEMMATIZER', 'str')],
+        lambda module, settings: module.main('-' + (settings['MODE'] or 'filter'))),
+    'phase2-create-hits-new-system': (
+        'Phase2_SCU_testing/processing_scripts/pre_createInputForAMT_newSystem.py',
+        'Create the AMT input of the evaluation task for a new system\'s summaries.',
+        [('--system-name', 'SYSTEM_NAME', 'str'), ('--summaries-folder', 'SUMMARIES_FOLDER', 'str'), ('--duc-year', 'DUC_YEAR', 'str'),
+         ('--output-files', 'OUT_CSV_FILES', 'list'), ('--statements-per-hit', 'STATEMENTS_PER_HIT', 'int')],
+        lambda module, settings: module.main(settings['SYSTEM_NAME'], settings['SUMMARIES_FOLDER'], settings['DUC_YEAR'], settings['OUT_CSV_FILES'],
+                                             settings['STATEMENTS_PER_HIT'])),
+    'phase2-scores': (
+        'Phase2_SCU_testing/processing_scripts/post_calculateScores.py',
+        'Get the Lite-Pyramid scores (and correlations, ranking stability, budget grid or significance clusters) from the AMT results.',
+        [('--mode', 'MODE', 'str'), ('--results-file', 'RESULTS_FILE_INPUT', 'str'), ('--output-file', 'OUTPUT_FILE', 'str'),
+         ('--manual-scores-file', 'MANUAL_SCORES_FILE', 'str'), ('--rouge-scores-file', 'ROUGE_SCORES_FILE', 'str'),
+         ('--rouge-peers-folder', 'ROUGE_PEERS_FOLDER', 'str'), ('--rouge-models-folder', 'ROUGE_MODELS_FOLDER', 'str'),
+         ('--score-store-file', 'SCORE_STORE_FILE', 'str'), ('--score-store-dataset', 'SCORE_STORE_DATASET', 'str'),
+         ('--num-iterations', 'NUM_ITERATION_ON_CONFIGURATION', 'int')],
+        lambda module, settings: module.main('-' + (settings['MODE'] or 'scores'))),
+    'phase2-scores-new-system': (
+        'Phase2_SCU_testing/processing_scripts/post_calculateScores_newSystem.py',
+        'Get the Lite-Pyramid score of a new system from the AMT results.',
+        [('--results-file', 'RESULTS_FILE_INPUT', 'str'), ('--summaries-folder', 'SUMMARIES_FOLDER', 'str'),
+         ('--reference-summaries-folder', 'REFERENCE_SUMMARIES_FOLDER', 'str'), ('--score-store-file', 'SCORE_STORE_FILE', 'str'),
+         ('--score-store-dataset', 'SCORE_STORE_DATASET', 'str'), ('--system-id', 'SCORE_STORE_SYSTEM_ID', 'str'),
+         ('--report-file', 'REPORT_FILE', 'str')],
+        lambda module, settings: module.main()),
+    'annotation-server': (
+        'common/annotationServer.py',
+        'Serve the HITs of AMT input files to in-house annotators, or export their answers in the AMT results format.',
+        [('--mode', 'MODE', 'str'), ('--layout-file', 'LAYOUT_FILE', 'str'), ('--task-properties-file', 'TASK_PROPERTIES_FILE', 'str'),
+         ('--input-files', 'INPUT_CSV_FILES', 'list'), ('--assignments-per-hit', 'ASSIGNMENTS_PER_HIT', 'int'),
+         ('--answer-log-file', 'ANSWER_LOG_FILE', 'str'), ('--output-file', 'OUTPUT_RESULTS_FILE', 'str'),
+         ('--host', 'SERVER_HOST', 'str'), ('--port', 'SERVER_PORT', 'int')],
+        lambda module, settings: module.main('-' + (settings['MODE'] or 'serve'))),
+    'crowd-simulator': (
+        'common/crowdSimulator.py',
+        'Simulate the AMT results of a batch with a modeled crowd, or evaluate the worker filtering on the simulated spammers.',
+        [('--mode', 'MODE', 'str'), ('--input-file', 'INPUT_CSV_FILE', 'str'), ('--output-file', 'OUTPUT_RESULTS_FILE', 'str'),
+         ('--workers-file', 'GROUND_TRUTH_WORKERS_FILE', 'str'), ('--answers-file', 'GROUND_TRUTH_ANSWERS_FILE', 'str'),
+         ('--num-workers', 'NUM_WORKERS', 'int'), ('--assignments-per-hit', 'ASSIGNMENTS_PER_HIT', 'int'),
+         ('--spammer-fraction', 'SPAMMER_FRACTION', 'float'), ('--num-copies', 'NUM_COPIES', 'int'), ('--seed', 'RANDOM_SEED', 'int')],
+        lambda module, settings: module.main('-' + (settings['MODE'] or 'simulate'))),
+    'scoring-server': (
+        'Phase2_SCU_testing/processing_scripts/scoringServer.py',
+        'Serve scoring, correlation and sweep queries on datasets loaded once (set DATASETS in the config file).',
+        [('--host', 'SERVER_HOST', 'str'), ('--port', 'SERVER_PORT', 'int'), ('--log-requests', 'LOG_REQUESTS', 'flag')],
+        lambda module, settings: module.main(module.DATASETS, settings['SERVER_HOST'], settings['SERVER_PORT'])),
+    'extract-manual-scores': (
+        'Phase2_SCU_testing/score_extraction/getManualScores.py',
+        'Extract the Pyramid and Responsiveness scores from the DUC scores files.',
+        [('--scores-file', 'SCORES_FILE', 'str'), ('--output-file', 'OUTPUT_CSV_FILE', 'str'), ('--columns', 'COLUMNS', 'list')],
+        lambda module, settings: module.main(settings['SCORES_FILE'], settings['OUTPUT_CSV_FILE'])),
+    'extract-rouge-scores': (
+        'Phase2_SCU_testing/score_extraction/getRougeScores.py',
+        'Extract the ROUGE scores from the DUC ROUGE jackknifing output files.',
+        [('--rouge-scores-file', 'ROUGE_SCORES_FILE', 'str'), ('--output-file', 'OUTPUT_CSV_FILE', 'str')],
+        lambda module, settings: module.main([settings['ROUGE_SCORES_FILE']], [settings['OUTPUT_CSV_FILE']])),
+    'compute-rouge-scores': (
+        'Phase2_SCU_testing/score_extraction/computeRougeScores.py',
+        'Compute the ROUGE-1, ROUGE-2 and ROUGE-L scores of system summaries.',
+        [('--peers-folder', 'PEERS_FOLDER', 'str'), ('--models-folder', 'MODELS_FOLDER', 'str'), ('--output-file', 'OUTPUT_CSV_FILE', 'str'),
+         ('--length-limit', 'LENGTH_LIMIT_WORDS', 'int'), ('--num-processes', 'NUM_PROCESSES', 'int')],
+        lambda module, settings: module.main(settings['PEERS_FOLDER'], settings['MODELS_FOLDER'], settings['OUTPUT_CSV_FILE'])),
+    'build-score-store': (
+        'Phase2_SCU_testing/score_extraction/scoreStore.py',
+        'Build a score store file from the scores files of a dataset (or add computed ROUGE scores to it).',
+        [('--score-store-file', 'SCORE_STORE_FILE', 'str'), ('--dataset', 'DATASET', 'str'),
+         ('--manual-scores-file', 'MANUAL_SCORES_FILE', 'str'), ('--rouge-scores-file', 'ROUGE_SCORES_FILE', 'str'),
+         ('--rouge-peers-folder', 'ROUGE_PEERS_FOLDER', 'str'), ('--rouge-models-folder', 'ROUGE_MODELS_FOLDER', 'str')],
+        lambda module, settings: module.main(settings['SCORE_STORE_FILE'], settings['DATASET'], settings['MANUAL_SCORES_FILE'], settings['ROUGE_SCORES_FILE'],
+                                             settings['ROUGE_PEERS_FOLDER'], settings['ROUGE_MODELS_FOLDER'])),
+    'query-scores': (
+        'Phase2_SCU_testing/score_extraction/getScoresOnSpecificEvents.py',
+        'Get the average scores of systems on subsets of events.',
+        [('--system-ids', 'SYSTEM_IDS', 'list'), ('--event-ids', 'EVENT_IDS', 'list'), ('--input-file', 'INPUT_FILE', 'str'),
+         ('--score-store-file', 'SCORE_STORE_FILE', 'str'), ('--score-store-dataset', 'SCORE_STORE_DATASET', 'str'),
+         ('--output-file', 'OUTPUT_FILE', 'str'), ('--queries-file', 'QUERIES_FILE', 'str')],
+        lambda module, settings: module.main(settings['SYSTEM_IDS'], settings['EVENT_IDS'], settings['INPUT_FILE'], settings['SCORE_STORE_FILE'],
+                                             settings['SCORE_STORE_DATASET'], settings['OUTPUT_FILE'], settings['QUERIES_FILE'])),
+}
+
+
+def getArgumentParser():
+    parser = argparse.ArgumentParser(description='The Lite-Pyramid scripts.')
+    subparsers = parser.add_subparsers(dest='subcommand', metavar='<subcommand>')
+    for subcommand in sorted(SUBCOMMANDS):
+        scriptPath, description, options, _ = SUBCOMMANDS[subcommand]
+        subparser = subparsers.add_parser(subcommand, help=description, description='{} (runs {})'.format(description, scriptPath))
+        subparser.add_argument('--config', default='', help='a JSON file of settings')
+        for option, settingName, kind in options:
+            subparser.add_argument(option, dest=settingName, default=None, help='sets ' + settingName, **OPTION_KINDS[kind])
+    return parser
+
+def loadScript(scriptPath):
+    # Import a script of the repository as a module (its folder is added to the path, like when running it).
+    folder, filename = os.path.split(os.path.join(ROOT_FOLDER, scriptPath))
+    sys.path.insert(0, folder)
+    return importlib.import_module(os.path.splitext(filename)[0])
+
+def readConfigFile(configFile, subcommand):
+    # Get the settings of the subcommand from a JSON config file: the top-level settings, and those of the subcommand's section.
+    with open(configFile, 'r') as inF:
+        config = json.load(inF)
+    sharedSettings = {name: value for name, value in config.items() if name not in SUBCOMMANDS}
+    return sharedSettings, config.get(subcommand, {})
+
+def getSettings(module, options, sharedConfigSettings, subcommandConfigSettings, args):
+    # Merge the script's values, the config file and the command line options: { SETTING_NAME -> value }
+    # The shared (top-level) config settings that the subcommand doesn't have are skipped.
+    optionSettingNames = [settingName for _, settingName, _ in options]
+    isKnownSetting = lambda settingName: settingName in optionSettingNames or (settingName.isupper() and hasattr(module, settingName))
+    for settingName in subcommandConfigSettings:
+        if not isKnownSetting(settingName):
+            raise ValueError('Unknown setting in the config file: {}'.format(settingName))
+    settings = {settingName: getattr(module, settingName, None) for settingName in optionSettingNames}
+    settings.update({settingName: value for settingName, value in sharedConfigSettings.items() if isKnownSetting(settingName)})
+    settings.update(subcommandConfigSettings)
+    for settingName in optionSettingNames:
+        if getattr(args, settingName) is not None:
+            settings[settingName] = getattr(args, settingName)
+    return settings
+
+def main(argv):
+    parser = getArgumentParser()
+    args = parser.parse_args(argv)
+    if args.subcommand is None:
+        parser.print_help()
+        return
+    scriptPath, _, options, runFunction = SUBCOMMANDS[args.subcommand]
+    sharedConfigSettings, subcommandConfigSettings = readConfigFile(args.config, args.subcommand) if args.config != '' else ({}, {})
+
+    # import the script only now, and set its settings (the script's functions read some of them as module variables):
+    module = loadScript(scriptPath)
+    try:
+        settings = getSettings(module, options, sharedConfigSettings, subcommandConfigSettings, args)
+    except ValueError as e:
+        parser.error(str(e))
+    for settingName, value in settings.items():
+        if hasattr(module, settingName):
+            setattr(module, settingName, value)
+    runFunction(module, settings)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])